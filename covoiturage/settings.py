@@ -48,17 +48,26 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En premier pour mesurer toute la chaîne ; inactif si INSTRUMENTATION_SAMPLE_RATE vaut 0
+    'rides.middleware.RequestInstrumentationMiddleware',
+    'rides.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'rides.middleware.UserRolesMiddleware',
+    # Inactif si PROFILING_DIR est vide
+    'rides.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'covoiturage.urls'
 
+# Permissions lues via le cache des rôles (rides.roles) plutôt qu'à chaque requête
+AUTHENTICATION_BACKENDS = ['rides.backends.CachedPermissionBackend']
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -80,11 +89,64 @@ WSGI_APPLICATION = 'covoiturage.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# SQLite par défaut ; DB_ENGINE=mysql pour MySQL (mysqlclient, réglages DB_* du .env).
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+# Réglages de chaque connexion SQLite (voir rides.database et rides.sqlite3).
+# Comportement historique : SQLITE_JOURNAL_MODE=DELETE, SQLITE_SYNCHRONOUS=FULL,
+# SQLITE_BUSY_TIMEOUT=5, SQLITE_MMAP_SIZE=0, SQLITE_TRANSACTION_MODE=DEFERRED
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+# Attente maximale du verrou d'écriture, en secondes
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Blocs atomic() ouverts par BEGIN IMMEDIATE : le verrou d'écriture est attendu
+# au début de la transaction au lieu d'échouer en cours de route
+SQLITE_TRANSACTION_MODE = os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE')
+
+if DB_ENGINE == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('DB_NAME', 'covoiturage_db'),
+            'USER': os.getenv('DB_USER', 'root'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '3306'),
+            # Connexions persistantes (secondes, 0 : une par requête), vérifiées
+            # avant d'être réutilisées par une nouvelle requête
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'isolation_level': 'read committed',
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'rides.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT, 'transaction_mode': SQLITE_TRANSACTION_MODE},
+            # Base de test sur disque : en mémoire partagée, SQLite renvoie
+            # « table is locked » au lieu d'attendre le verrou, ce qui rend
+            # impossibles les tests d'accès concurrents
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
 
-DATABASES = {
+
+# Cache
+# En production avec plusieurs processus, utiliser un cache partagé (Memcached,
+# Redis ou FileBasedCache) : les versions d'invalidation y sont stockées.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
     }
 }
 
@@ -146,9 +208,11 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
+# Les emails métier passent par la file EmailOutbox, vidée par la commande
+# process_outbox (à lancer avec --loop ou périodiquement)
 EMAIL_HOST_USER = 'othmaneabidi71@gmail.com'  # À remplacer par votre email
 EMAIL_HOST_PASSWORD = 'wvxt vjni upnk ylef'  # À remplacer par votre mot de passe d'application
 
@@ -165,3 +229,69 @@ ACCOUNT_VERIFICATION_TIMEOUT_DAYS = 1
 
 # Google Maps API Key
 GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', '')
+
+# Matrice binaire des distances entre localités (voir compile_distance_matrix)
+DISTANCE_MATRIX_PATH = Path(os.getenv('DISTANCE_MATRIX_PATH', BASE_DIR / 'data' / 'distances.bin'))
+
+# Fournisseur d'itinéraires : 'rides.routing.StaticRoutingBackend' (tables locales)
+# ou 'rides.routing.HTTPRoutingBackend' (API compatible Google Distance Matrix)
+ROUTING_BACKEND = os.getenv('ROUTING_BACKEND', 'rides.routing.StaticRoutingBackend')
+ROUTING_URL = os.getenv('ROUTING_URL', 'https://maps.googleapis.com/maps/api/distancematrix/json')
+ROUTING_TIMEOUT = float(os.getenv('ROUTING_TIMEOUT', '3'))
+
+# Jetons des partenaires autorisés sur l'API de devis groupés (séparés par des virgules),
+# envoyés dans l'en-tête « Authorization: Bearer <jeton> »
+QUOTE_API_TOKENS = [token for token in os.getenv('QUOTE_API_TOKENS', '').split(',') if token]
+
+# Instrumentation des requêtes (rides.middleware.RequestInstrumentationMiddleware) :
+# proportion des requêtes mesurées (0 = désactivée, 0.01 = une sur cent), seuil de
+# répétition d'une même requête SQL signalé comme N+1, et journal JSON tournant
+INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('INSTRUMENTATION_SAMPLE_RATE', '0'))
+INSTRUMENTATION_DUPLICATE_THRESHOLD = int(os.getenv('INSTRUMENTATION_DUPLICATE_THRESHOLD', '3'))
+INSTRUMENTATION_LOG = Path(os.getenv('INSTRUMENTATION_LOG', BASE_DIR / 'logs' / 'requests.jsonl'))
+
+# Journaux des recalculs de prix lancés depuis l'administration
+REPRICE_LOG_DIR = Path(os.getenv('REPRICE_LOG_DIR', BASE_DIR / 'logs'))
+
+# Répertoire partagé par les processus (workers gunicorn, commandes) pour les
+# métriques exposées sur /metrics ; vide : métriques du seul processus courant.
+# À vider au démarrage de chaque déploiement.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+# Accès à /metrics : adresses autorisées (séparées par des virgules ; derrière un
+# proxy, REMOTE_ADDR est celle du proxy, d'où la boucle locale seulement en DEBUG),
+# jeton envoyé par le collecteur (Authorization: Bearer <jeton>), et membres du staff
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1' if DEBUG else '').split(',') if ip]
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Profilage cProfile (rides.middleware.RequestProfilerMiddleware) : répertoire des
+# piles repliées (vide = désactivé), proportion des requêtes profilées, et en-tête
+# permettant à un membre du staff de profiler une requête précise
+PROFILING_DIR = os.getenv('PROFILING_DIR', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_HEADER = 'X-Profile'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'raw': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'instrumentation': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': INSTRUMENTATION_LOG,
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'raw',
+        },
+    },
+    'loggers': {
+        'rides.instrumentation': {
+            'handlers': ['instrumentation'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
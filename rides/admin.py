@@ -1,5 +1,12 @@
-from django.contrib import admin
-from .models import Ride, RideRequest
+import os
+import subprocess
+import sys
+import threading
+from django.conf import settings
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import Ride, RideRequest, PricingSettings, EmailOutbox
+from .pricing import acquire_reprice_lock, release_reprice_lock
 
 @admin.register(Ride)
 class RideAdmin(admin.ModelAdmin):
@@ -12,4 +19,66 @@ class RideAdmin(admin.ModelAdmin):
 class RideRequestAdmin(admin.ModelAdmin):
     list_display = ('ride', 'passenger', 'number_of_seats', 'status', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('passenger__username', 'ride__departure_city', 'ride__arrival_city') 
\ No newline at end of file
+    search_fields = ('passenger__username', 'ride__departure_city', 'ride__arrival_city')
+
+@admin.register(PricingSettings)
+class PricingSettingsAdmin(admin.ModelAdmin):
+    list_display = ('base_price_per_km', 'min_price', 'driver_profit_percentage', 'admin_profit_percentage', 'updated_at')
+    readonly_fields = ('admin_profit_percentage',)
+    actions = ['reprice_future_rides']
+
+    @admin.action(description='Recalculer le prix des trajets à venir (paramètres actifs)')
+    def reprice_future_rides(self, request, queryset):
+        # Le recalcul applique toujours les paramètres actifs (les derniers modifiés)
+        active = PricingSettings.objects.order_by('-updated_at', '-pk').first()
+        if active is None or not queryset.filter(pk=active.pk).exists():
+            self.message_user(
+                request,
+                'Sélectionnez les paramètres actifs (les derniers modifiés) : ce sont eux que le recalcul applique.',
+                messages.ERROR,
+            )
+            return
+        if not acquire_reprice_lock(f'admin:{request.user.pk}'):
+            self.message_user(request, 'Un recalcul des prix est déjà en cours.', messages.WARNING)
+            return
+        try:
+            log_name = self.start_reprice_job()
+        except OSError:
+            release_reprice_lock()
+            raise
+        self.message_user(
+            request,
+            f'Recalcul lancé en arrière-plan. Progression et dernier id traité : journal {log_name} '
+            f'(répertoire REPRICE_LOG_DIR) ; reprise avec « manage.py reprice_rides --start-after <id> » '
+            f'en cas d\'interruption.'
+        )
+
+    def start_reprice_job(self):
+        """
+        Lance la commande reprice_rides hors de la requête HTTP, verrou déjà pris ;
+        un thread attend la fin du processus puis libère le verrou. Renvoie le nom du journal.
+        """
+        log_dir = settings.REPRICE_LOG_DIR
+        log_dir.mkdir(parents=True, exist_ok=True)
+        log_name = f'reprice-{timezone.now():%Y%m%d-%H%M%S}.log'
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        with open(log_dir / log_name, 'a') as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'django', 'reprice_rides', '--lock-held'],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+            )
+
+        def wait():
+            try:
+                process.wait()
+            finally:
+                release_reprice_lock()
+        threading.Thread(target=wait, daemon=True).start()
+        return log_name
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('claim_token', 'locked_until', 'last_error', 'sent_at')
@@ -2,4 +2,23 @@ from django.apps import AppConfig
 
 class RidesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'rides' 
\ No newline at end of file
+    name = 'rides' 
+
+    def ready(self):
+        # Calcul des plus courts chemins une fois pour toutes au démarrage
+        from .services import city_graph
+        city_graph()
+        # Enregistre les signaux d'invalidation des paramètres de tarification
+        from . import pricing  # noqa: F401
+        # Enregistre la mise à jour des moyennes lors de la suppression d'une évaluation
+        from . import ratings  # noqa: F401
+        # Enregistre l'invalidation du cache des rôles lors d'un changement de groupe
+        from . import roles  # noqa: F401
+        # Enregistre le suivi des évaluations données dans les statistiques
+        from . import stats  # noqa: F401
+        # Enregistre l'invalidation des recherches en cache lors d'une modification de trajet
+        from . import search_cache  # noqa: F401
+        # Enregistre l'invalidation des cartes de trajet lors d'une modification de profil
+        from . import fragments  # noqa: F401
+        # Enregistre les réglages des connexions SQLite (WAL, attente des verrous)
+        from . import database  # noqa: F401
@@ -0,0 +1,17 @@
+from django.contrib.auth.backends import ModelBackend
+from .roles import get_user_roles
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend dont les permissions viennent de get_user_roles : has_perm
+    et @permission_required ne coûtent aucune requête sur une requête chaude.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            # Toutes les permissions, comme ModelBackend (les rôles ne gardent que celles accordées)
+            return super().get_all_permissions(user_obj, obj)
+        return set(get_user_roles(user_obj).permissions)
@@ -0,0 +1,145 @@
+"""
+Banc de mesure des vues principales. Chaque scénario est joué par le client
+de test Django sur un jeu de données généré (rides.dataset), cache vidé et
+dans une transaction annulée à chaque itération : toutes les itérations
+partent du même état. La latence est mesurée sans tracemalloc, qui ralentit
+l'exécution ; nombre de requêtes SQL et pic de mémoire sont relevés sur un
+passage supplémentaire.
+"""
+import math
+import time
+import tracemalloc
+from collections import namedtuple
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from .models import Booking, Ride
+
+User = get_user_model()
+
+BenchmarkResult = namedtuple(
+    'BenchmarkResult', ['view', 'iterations', 'p50_ms', 'p90_ms', 'p99_ms', 'mean_ms', 'queries', 'peak_kb']
+)
+
+# Métriques comparées à la référence : une hausse relative au-delà du seuil est une régression
+LATENCY_METRICS = ('p50_ms', 'p90_ms', 'peak_kb')
+
+# Nom du scénario -> (utilisateur connecté, requête)
+SCENARIOS = {
+    'ride_list': (None, lambda client, data: client.get(reverse('rides:ride_list'))),
+    'ride_detail': ('driver', lambda client, data: client.get(reverse('rides:ride_detail', args=[data['ride']]))),
+    'my_rides': ('driver', lambda client, data: client.get(reverse('rides:my_rides'))),
+    'profile_view': ('driver', lambda client, data: client.get(reverse('rides:profile'))),
+    'booking_action': (
+        'booking_driver',
+        lambda client, data: client.get(reverse('rides:booking_action', args=[data['booking'], 'confirm'])),
+    ),
+}
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def benchmark_data():
+    """Objets utilisés par les scénarios : le conducteur le plus actif, un de ses trajets, une réservation en attente"""
+    driver_id = (
+        Ride.objects.values('driver_id').annotate(n=Count('id')).order_by('-n', 'driver_id')
+        .values_list('driver_id', flat=True).first()
+    )
+    if driver_id is None:
+        raise ValueError('Aucun trajet : générer un jeu de données avant les mesures')
+    ride_id = (
+        Ride.objects.filter(driver_id=driver_id).annotate(n=Count('bookings')).order_by('-n', 'pk')
+        .values_list('pk', flat=True).first()
+    )
+    booking = (
+        Booking.objects.filter(status='pending', ride__status='confirmed', ride__available_seats__gte=2,
+                               ride__departure_date__gte=timezone.localdate())
+        .order_by('pk').values_list('pk', 'ride__driver_id').first()
+    )
+    if booking is None:
+        raise ValueError('Aucune réservation en attente dans le jeu de données')
+    return {'driver': driver_id, 'ride': ride_id, 'booking': booking[0], 'booking_driver': booking[1]}
+
+
+def _percentile(values, q):
+    # Rang le plus proche, sur des valeurs triées
+    return values[max(0, min(len(values) - 1, math.ceil(q * len(values)) - 1))]
+
+
+def _run_once(client, request, data):
+    cache.clear()
+    with transaction.atomic():
+        start = time.perf_counter()
+        response = request(client, data)
+        elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    if response.status_code >= 400:
+        raise ValueError(f'Réponse {response.status_code} pour {response.request["PATH_INFO"]}')
+    return elapsed
+
+
+def benchmark_view(name, iterations=50, warmup=2, data=None):
+    """Mesure un scénario de SCENARIOS ; renvoie un BenchmarkResult"""
+    data = data or benchmark_data()
+    user, request = SCENARIOS[name]
+    client = Client()
+    if user:
+        client.force_login(User.objects.get(pk=data[user]))
+
+    for _ in range(warmup):
+        _run_once(client, request, data)
+    timings = sorted(_run_once(client, request, data) * 1000 for _ in range(iterations))
+
+    queries = _QueryCounter()
+    tracemalloc.start()
+    try:
+        with connection.execute_wrapper(queries):
+            _run_once(client, request, data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        name, iterations,
+        round(_percentile(timings, 0.5), 3), round(_percentile(timings, 0.9), 3),
+        round(_percentile(timings, 0.99), 3), round(sum(timings) / len(timings), 3),
+        queries.count, round(peak / 1024, 1),
+    )
+
+
+def run_benchmarks(views=None, iterations=50, warmup=2):
+    """Mesure chaque vue demandée (toutes par défaut) ; produit un BenchmarkResult par vue"""
+    data = benchmark_data()
+    for name in views or SCENARIOS:
+        yield benchmark_view(name, iterations, warmup, data)
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Compare deux résultats sérialisés ({vue: {métrique: valeur}}). Renvoie la
+    liste des régressions (vue, métrique, référence, actuel) : hausse relative
+    au-delà de `threshold` pour LATENCY_METRICS, toute hausse du nombre de
+    requêtes SQL.
+    """
+    regressions = []
+    for view, result in current.items():
+        reference = baseline.get(view)
+        if reference is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if reference[metric] and (result[metric] - reference[metric]) / reference[metric] > threshold:
+                regressions.append((view, metric, reference[metric], result[metric]))
+        if result['queries'] > reference['queries']:
+            regressions.append((view, 'queries', reference['queries'], result['queries']))
+    return regressions
@@ -1,33 +1,41 @@
-MOROCCAN_CITIES = [
-    "Casablanca",
-    "Rabat",
-    "Fès",
-    "Tanger",
-    "Marrakech",
-    "Agadir",
-    "Meknès",
-    "Oujda",
-    "Kénitra",
-    "Tétouan",
-    "El Jadida",
-    "Safi",
-    "Mohammedia",
-    "Khouribga",
-    "Béni Mellal",
-    "Nador",
-    "Taza",
-    "Settat",
-    "Berrechid",
-    "Khémisset",
-    "Larache",
-    "Ksar El Kébir",
-    "Essaouira",
-    "Ouarzazate",
-    "Chefchaouen"
+from django.utils.text import slugify
+from .graph import DistanceTable
+
+# Registre canonique des villes. L'identifiant d'une ville est sa position
+# dans cette liste : (nom, latitude, longitude, variantes orthographiques).
+# Les variantes d'accents et de casse sont absorbées par normalize_city.
+CITY_REGISTRY = [
+    ("Casablanca", 33.5731, -7.5898, ("Casa", "Dar El Beida")),
+    ("Rabat", 34.0209, -6.8416, ()),
+    ("Fès", 34.0181, -5.0078, ("Fez",)),
+    ("Tanger", 35.7595, -5.8340, ("Tangier", "Tanja")),
+    ("Marrakech", 31.6295, -7.9811, ("Marrakesh",)),
+    ("Agadir", 30.4278, -9.5981, ()),
+    ("Meknès", 33.8935, -5.5473, ()),
+    ("Oujda", 34.6814, -1.9086, ()),
+    ("Kénitra", 34.2610, -6.5802, ()),
+    ("Tétouan", 35.5889, -5.3626, ("Tetuan",)),
+    ("El Jadida", 33.2316, -8.5007, ("Mazagan",)),
+    ("Safi", 32.2994, -9.2372, ()),
+    ("Mohammedia", 33.6866, -7.3830, ()),
+    ("Khouribga", 32.8811, -6.9063, ()),
+    ("Béni Mellal", 32.3373, -6.3498, ()),
+    ("Nador", 35.1681, -2.9335, ()),
+    ("Taza", 34.2100, -4.0100, ()),
+    ("Settat", 33.0011, -7.6166, ()),
+    ("Berrechid", 33.2655, -7.5875, ()),
+    ("Khémisset", 33.8241, -6.0663, ()),
+    ("Larache", 35.1932, -6.1557, ()),
+    ("Ksar El Kébir", 35.0017, -5.9053, ()),
+    ("Essaouira", 31.5085, -9.7595, ("Mogador",)),
+    ("Ouarzazate", 30.9189, -6.8934, ()),
+    ("Chefchaouen", 35.1688, -5.2636, ("Chaouen",)),
 ]
 
+MOROCCAN_CITIES = [name for name, *_ in CITY_REGISTRY]
+
 # Distances approximatives entre les principales villes (en km)
-CITY_DISTANCES = {
+CITY_DISTANCES = DistanceTable({
     ('Casablanca', 'Rabat'): 87,
     ('Casablanca', 'Marrakech'): 238,
     ('Casablanca', 'Agadir'): 460,
@@ -47,35 +55,28 @@ CITY_DISTANCES = {
     ('Agadir', 'Essaouira'): 173,
     ('Fès', 'Oujda'): 360,
     ('Rabat', 'Meknès'): 148,
-    ('Marrakech', 'Ouarzazate'): 195
-}
-
-def get_distance(city1, city2):
-    """
-    Retourne la distance entre deux villes.
-    Si la distance directe n'existe pas, essaie de la calculer via des villes intermédiaires.
-    """
-    # Normaliser les noms des villes
-    city1 = city1.title()
-    city2 = city2.title()
-    
-    # Vérifier la distance directe
-    if (city1, city2) in CITY_DISTANCES:
-        return CITY_DISTANCES[(city1, city2)]
-    elif (city2, city1) in CITY_DISTANCES:
-        return CITY_DISTANCES[(city2, city1)]
-    
-    return None
+    ('Marrakech', 'Ouarzazate'): 195,
+    ('El Jadida', 'Safi'): 145,
+    ('Marrakech', 'Safi'): 157,
+    ('Casablanca', 'Berrechid'): 38,
+    ('Berrechid', 'Settat'): 35,
+    ('Casablanca', 'Khouribga'): 125,
+    ('Khouribga', 'Béni Mellal'): 105,
+    ('Marrakech', 'Béni Mellal'): 195,
+    ('Oujda', 'Nador'): 120,
+    ('Taza', 'Nador'): 200,
+    ('Rabat', 'Khémisset'): 83,
+    ('Khémisset', 'Meknès'): 57,
+    ('Tanger', 'Larache'): 87,
+    ('Kénitra', 'Larache'): 130,
+    ('Larache', 'Ksar El Kébir'): 36,
+    ('Tétouan', 'Chefchaouen'): 62,
+    ('Ksar El Kébir', 'Chefchaouen'): 95
+})
 
-def calculate_price(distance):
+def normalize_city(name):
     """
-    Calcule le prix du trajet en fonction de la distance.
-    Prix = 0.5 DH/km avec un minimum de 20 DH
+    Forme normalisée d'un nom de ville (sans accents, minuscules) :
+    "Fès", "FES" et "fes" donnent tous "fes".
     """
-    if distance is None:
-        return None
-        
-    base_price = distance * 0.5  # 0.5 DH par kilomètre
-    min_price = 20  # Prix minimum de 20 DH
-    
-    return max(base_price, min_price) 
\ No newline at end of file
+    return slugify(name or '')
@@ -0,0 +1,104 @@
+"""
+Banc d'écritures concurrentes (voir la commande benchmark_contention) :
+plusieurs threads enchaînent les écritures du tunnel de réservation, chacune
+dans sa transaction comme dans les vues — confirmation (booking_action),
+paiement (initiate_payment), validation (validate_payment), puis évaluation
+(Rating.save) — et l'on compte les erreurs « database is locked ».
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from .models import Booking, Rating, Ride
+from .outbox import enqueue_email
+from .payment_models import PaymentTransaction
+from .reservations import confirm_booking
+
+User = get_user_model()
+
+PREFIX = 'contention-'
+
+ContentionResult = namedtuple(
+    'ContentionResult', ['threads', 'operations', 'seconds', 'ops_per_s', 'errors', 'p50_ms', 'p99_ms']
+)
+
+
+def _seed(threads, operations):
+    """Un passager par thread et un trajet par opération, d'un même conducteur"""
+    User.objects.filter(username__startswith=PREFIX).delete()
+    User.objects.bulk_create(
+        [User(username=f'{PREFIX}driver', password=make_password(None))]
+        + [User(username=f'{PREFIX}passenger{i}', password=make_password(None)) for i in range(threads)]
+    )
+    driver = User.objects.get(username=f'{PREFIX}driver')
+    passengers = list(User.objects.filter(username__startswith=f'{PREFIX}passenger').order_by('pk'))
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    Ride.objects.bulk_create([
+        Ride(
+            driver=driver, departure_city='Casablanca', arrival_city='Rabat', departure_date=tomorrow,
+            departure_time='10:00', price=Decimal('50.00'), available_seats=2, status='confirmed',
+        )
+        for _ in range(threads * operations)
+    ])
+    rides = list(Ride.objects.filter(driver=driver).select_related('driver').order_by('pk'))
+    return [(passenger, rides[i * operations:(i + 1) * operations]) for i, passenger in enumerate(passengers)]
+
+
+def _book_pay_and_rate(passenger, ride):
+    booking = Booking.objects.create(passenger=passenger, ride=ride, number_of_seats=1)
+    with transaction.atomic():
+        confirm_booking(booking)
+        enqueue_email('Réservation confirmée', 'Réservation confirmée.', [passenger.email])
+    with transaction.atomic():
+        payment, _ = PaymentTransaction.objects.get_or_create(booking=booking, defaults={'amount': ride.price})
+        code = payment.generate_validation_code()
+        enqueue_email('Code de validation', code, [passenger.email])
+    with transaction.atomic():
+        payment.validate_payment(code)
+    Rating.objects.create(from_user=passenger, to_user=ride.driver, ride=ride, rating=5)
+
+
+def _percentile(values, q):
+    return values[max(0, min(len(values) - 1, math.ceil(q * len(values)) - 1))] if values else 0.0
+
+
+def run_contention(threads=8, operations=25):
+    """Lance `threads` écrivains de `operations` opérations chacun ; renvoie un ContentionResult"""
+    work = _seed(threads, operations)
+    timings, errors = [], []
+    lock = threading.Lock()
+
+    def writer(passenger, rides):
+        try:
+            for ride in rides:
+                start = time.perf_counter()
+                try:
+                    _book_pay_and_rate(passenger, ride)
+                except OperationalError:
+                    with lock:
+                        errors.append(ride.pk)
+                    continue
+                with lock:
+                    timings.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=writer, args=item) for item in work]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    timings = sorted(value * 1000 for value in timings)
+    return ContentionResult(
+        threads, threads * operations, round(seconds, 3), round(len(timings) / seconds, 1), len(errors),
+        round(_percentile(timings, 0.5), 2), round(_percentile(timings, 0.99), 2),
+    )
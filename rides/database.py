@@ -0,0 +1,31 @@
+"""
+Réglages appliqués à chaque nouvelle connexion SQLite (signal
+connection_created), d'après les réglages SQLITE_* :
+- journal WAL : les lecteurs ne bloquent plus l'écrivain ni l'inverse ;
+- synchronous NORMAL : sûr en WAL, sans fsync à chaque validation ;
+- busy_timeout : attente du verrou d'écriture au lieu d'une erreur
+  « database is locked » immédiate ;
+- mmap_size : lectures par projection mémoire.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def sqlite_pragmas():
+    """Pragmas (nom, valeur) appliqués aux connexions SQLite"""
+    return [
+        ('journal_mode', settings.SQLITE_JOURNAL_MODE),
+        ('synchronous', settings.SQLITE_SYNCHRONOUS),
+        ('busy_timeout', int(settings.SQLITE_BUSY_TIMEOUT * 1000)),
+        ('mmap_size', settings.SQLITE_MMAP_SIZE),
+    ]
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Connexion sqlite3 brute : ces pragmas ne comptent pas parmi les requêtes de la page
+    for name, value in sqlite_pragmas():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,255 @@
+"""
+Jeu de données synthétique pour les mesures de charge et les benchmarks :
+utilisateurs, véhicules, trajets entre les villes de MOROCCAN_CITIES,
+réservations, paiements, évaluations sur tous les critères et signalements.
+Pour une graine et des volumes donnés, le contenu est toujours le même (les
+dates sont relatives au jour de génération).
+
+Les lignes sont insérées par bulk_create, lot par lot. Les tables
+dépendantes sont remplies en relisant les lignes créées par identifiant
+croissant : rien ne suppose que la base renvoie les clés créées (MySQL).
+"""
+import random
+from collections import namedtuple
+from datetime import time, timedelta
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .cities import MOROCCAN_CITIES, normalize_city
+from .models import Booking, Profile, Rating, Ride, RideReport, Vehicle
+from .payment_models import DriverTransaction, PaymentTransaction, PlatformTransaction
+from .pricing import get_pricing_settings, quote_prices, split_amount
+from .ratings import rebuild_rating_aggregates
+from .roles import DRIVER_GROUP, PASSENGER_GROUP
+from .search_cache import invalidate_all_searches
+from .services import calculate_distances
+from .stats import rebuild_user_stats
+
+DatasetProgress = namedtuple('DatasetProgress', ['step', 'done', 'total'])
+
+PASSWORD = 'dataset123'
+DRIVER_SHARE = 0.2
+PAST_DAYS = 365
+FUTURE_DAYS = 60
+
+FIRST_NAMES = [
+    'Mohamed', 'Youssef', 'Amine', 'Hamza', 'Omar', 'Mehdi', 'Karim', 'Anas', 'Ayoub', 'Reda',
+    'Fatima', 'Khadija', 'Salma', 'Imane', 'Meryem', 'Sara', 'Hajar', 'Nadia', 'Zineb', 'Loubna',
+]
+LAST_NAMES = [
+    'Alaoui', 'Benali', 'Bennani', 'Berrada', 'Chraibi', 'El Amrani', 'El Fassi', 'Idrissi',
+    'Lahlou', 'Mansouri', 'Ouazzani', 'Tazi', 'Tahiri', 'Zerouali', 'Kettani', 'Naciri',
+]
+VEHICLES = [
+    ('Dacia', 'Logan'), ('Dacia', 'Sandero'), ('Renault', 'Clio'), ('Peugeot', '208'),
+    ('Peugeot', '301'), ('Hyundai', 'Accent'), ('Toyota', 'Corolla'), ('Volkswagen', 'Golf'),
+    ('Kia', 'Picanto'), ('Fiat', 'Tipo'),
+]
+COLORS = ['Blanc', 'Gris', 'Noir', 'Bleu', 'Rouge', 'Beige']
+RATING_WEIGHTS = [2, 3, 10, 35, 50]
+
+
+def _insert(model, rows, chunk_size):
+    """bulk_create par lots d'un itérable ; produit le nombre de lignes écrites après chaque lot"""
+    batch, created = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+            yield created
+    if batch:
+        model.objects.bulk_create(batch)
+        yield created + len(batch)
+
+
+def _max_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def _users(rng, prefix, count):
+    password = make_password(PASSWORD)
+    now = timezone.now()
+    for i in range(count):
+        yield User(
+            username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=password,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            date_joined=now - timedelta(days=rng.randint(PAST_DAYS, 3 * PAST_DAYS)),
+        )
+
+
+def _vehicle(rng, driver_id):
+    brand, model = rng.choice(VEHICLES)
+    return Vehicle(
+        driver_id=driver_id, brand=brand, model=model, color=rng.choice(COLORS),
+        license_plate=f'{rng.randint(1, 99999)}-A-{rng.randint(1, 89)}',
+        number_of_seats=rng.choice((4, 5, 5, 7)),
+    )
+
+
+def _routes():
+    """Itinéraires possibles, devis et poids cumulés (les grandes villes d'abord dans le registre)"""
+    weights = {city: 1 / (rank + 1) for rank, city in enumerate(MOROCCAN_CITIES)}
+    routes = [(a, b) for a in MOROCCAN_CITIES for b in MOROCCAN_CITIES if a != b]
+    quotes = quote_prices(calculate_distances(routes), get_pricing_settings())
+    routes = [(route, quote) for route, quote in zip(routes, quotes) if quote is not None]
+    return routes, list(accumulate(weights[a] * weights[b] for (a, b), _ in routes))
+
+
+def _rides(rng, count, drivers, vehicles):
+    routes, cum_weights = _routes()
+    slugs = {city: normalize_city(city) for city in MOROCCAN_CITIES}
+    today = timezone.localdate()
+    for index in rng.choices(range(len(routes)), cum_weights=cum_weights, k=count):
+        (departure, arrival), quote = routes[index]
+        day = rng.randint(-PAST_DAYS, FUTURE_DAYS)
+        if day < 0:
+            status = rng.choices(('completed', 'cancelled'), (9, 1))[0]
+        else:
+            status = rng.choices(('confirmed', 'pending', 'draft', 'cancelled'), (85, 7, 5, 3))[0]
+        driver_id = rng.choice(drivers)
+        yield Ride(
+            driver_id=driver_id, vehicle_id=vehicles.get(driver_id),
+            departure_city=departure, arrival_city=arrival,
+            departure_slug=slugs[departure], arrival_slug=slugs[arrival],
+            departure_date=today + timedelta(days=day),
+            departure_time=time(rng.randint(5, 22), rng.choice((0, 15, 30, 45))),
+            distance_km=quote.distance_km, price=quote.price,
+            driver_profit=quote.driver_profit, admin_profit=quote.admin_profit,
+            available_seats=rng.randint(0, 4), status=status,
+        )
+
+
+def _booking_status(rng, ride_status):
+    if ride_status == 'completed':
+        return rng.choices(('completed', 'cancelled_by_passenger'), (92, 8))[0]
+    if ride_status == 'cancelled':
+        return 'cancelled_by_driver'
+    return rng.choices(('confirmed', 'pending', 'rejected', 'cancelled_by_passenger'), (60, 25, 10, 5))[0]
+
+
+def _fill_rides(rng, rides, passengers, pricing):
+    """Réservations, paiements, évaluations et signalements d'un lot de trajets"""
+    bookings = []
+    for ride_id, driver_id, status in rides:
+        if status in ('draft', 'pending'):
+            continue
+        count = rng.choices((0, 1, 2, 3), (30, 35, 25, 10))[0]
+        for passenger_id in rng.sample(passengers, min(count, len(passengers))):
+            if passenger_id != driver_id:
+                bookings.append(Booking(
+                    passenger_id=passenger_id, ride_id=ride_id,
+                    number_of_seats=rng.choices((1, 2), (85, 15))[0],
+                    status=_booking_status(rng, status),
+                ))
+    Booking.objects.bulk_create(bookings)
+
+    drivers = {ride_id: driver_id for ride_id, driver_id, _ in rides}
+    completed = list(
+        Booking.objects.filter(ride_id__in=drivers, status='completed')
+        .order_by('pk').values_list('pk', 'ride_id', 'passenger_id', 'number_of_seats', 'ride__price')
+    )
+    PaymentTransaction.objects.bulk_create([
+        PaymentTransaction(booking_id=pk, amount=price * seats, status='validated')
+        for pk, ride_id, passenger_id, seats, price in completed
+    ])
+    payments = PaymentTransaction.objects.filter(booking__ride_id__in=drivers).order_by('pk')
+    driver_transactions, platform_transactions = [], []
+    for payment_id, ride_id, amount in payments.values_list('pk', 'booking__ride_id', 'amount'):
+        driver_amount, platform_amount = split_amount(amount, pricing)
+        driver_transactions.append(DriverTransaction(
+            payment_id=payment_id, user_id=drivers[ride_id], amount=driver_amount, is_paid=rng.random() < 0.8,
+        ))
+        platform_transactions.append(PlatformTransaction(payment_id=payment_id, amount=platform_amount))
+    DriverTransaction.objects.bulk_create(driver_transactions)
+    PlatformTransaction.objects.bulk_create(platform_transactions)
+
+    ratings, reports = [], []
+    for pk, ride_id, passenger_id, seats, price in completed:
+        driver_id = drivers[ride_id]
+        if rng.random() < 0.6:
+            # Le passager note le conducteur : note générale puis une partie des autres critères
+            for criteria, _ in Rating.RATING_CRITERIA:
+                if criteria == 'general' or rng.random() < 0.5:
+                    ratings.append(Rating(
+                        from_user_id=passenger_id, to_user_id=driver_id, ride_id=ride_id, criteria=criteria,
+                        rating=rng.choices(range(1, 6), RATING_WEIGHTS)[0], is_anonymous=rng.random() < 0.1,
+                    ))
+        if rng.random() < 0.3:
+            ratings.append(Rating(
+                from_user_id=driver_id, to_user_id=passenger_id, ride_id=ride_id, criteria='general',
+                rating=rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+            ))
+        if rng.random() < 0.01:
+            reports.append(RideReport(
+                ride_id=ride_id, reporter_id=passenger_id, reported_user_id=driver_id,
+                report_type=rng.choice(RideReport.REPORT_TYPES)[0],
+                status=rng.choice(RideReport.REPORT_STATUS)[0],
+                description='Signalement généré automatiquement',
+            ))
+    Rating.objects.bulk_create(ratings)
+    RideReport.objects.bulk_create(reports)
+
+
+def generate_dataset(users=1000, rides=10000, seed=42, chunk_size=5000, prefix='dataset-'):
+    """
+    Crée `users` utilisateurs (dont DRIVER_SHARE de conducteurs) et `rides`
+    trajets avec leurs réservations, paiements, évaluations et signalements.
+    Produit un DatasetProgress après chaque lot. Les agrégats (notes,
+    statistiques) sont recalculés à la fin.
+    """
+    rng = random.Random(seed)
+    pricing = get_pricing_settings()
+
+    last_user = _max_pk(User)
+    for done in _insert(User, _users(rng, prefix, users), chunk_size):
+        yield DatasetProgress('utilisateurs', done, users)
+    user_ids = list(User.objects.filter(pk__gt=last_user).order_by('pk').values_list('pk', flat=True))
+    driver_count = max(1, int(len(user_ids) * DRIVER_SHARE))
+    drivers, passengers = user_ids[:driver_count], user_ids[driver_count:] or user_ids
+
+    groups = dict(Group.objects.filter(name__in=[DRIVER_GROUP, PASSENGER_GROUP]).values_list('name', 'pk'))
+    memberships = (
+        User.groups.through(user_id=user_id, group_id=group_id)
+        for i, user_id in enumerate(user_ids)
+        if (group_id := groups.get(DRIVER_GROUP if i < driver_count else PASSENGER_GROUP))
+    )
+    for _ in _insert(User.groups.through, memberships, chunk_size):
+        pass
+    profiles = (
+        Profile(user_id=user_id, phone=f'06{rng.randint(0, 99999999):08d}', is_verified=rng.random() < 0.7)
+        for user_id in user_ids
+    )
+    for _ in _insert(Profile, profiles, chunk_size):
+        pass
+    for _ in _insert(Vehicle, (_vehicle(rng, driver_id) for driver_id in drivers), chunk_size):
+        pass
+    # Par borne d'identifiant, comme la relecture des trajets : une liste de conducteurs
+    # dépasserait la limite de paramètres SQL de SQLite au-delà de ~160 000 utilisateurs
+    vehicles = dict(Vehicle.objects.filter(driver_id__gt=last_user).values_list('driver_id', 'pk'))
+    yield DatasetProgress('profils et véhicules', len(user_ids), users)
+
+    last_ride = _max_pk(Ride)
+    for done in _insert(Ride, _rides(rng, rides, drivers, vehicles), chunk_size):
+        yield DatasetProgress('trajets', done, rides)
+
+    generated = Ride.objects.filter(pk__gt=last_ride).order_by('pk').values_list('pk', 'driver_id', 'status')
+    after, done = last_ride, 0
+    while True:
+        batch = list(generated.filter(pk__gt=after)[:chunk_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            _fill_rides(rng, batch, passengers, pricing)
+        after = batch[-1][0]
+        done += len(batch)
+        yield DatasetProgress('réservations, paiements et évaluations', done, rides)
+
+    rebuild_rating_aggregates(chunk_size)
+    rebuild_user_stats(chunk_size)
+    invalidate_all_searches()
+    yield DatasetProgress('agrégats', 1, 1)
@@ -0,0 +1,91 @@
+"""
+Cache des cartes de trajet de la liste publique. Chaque carte est un
+fragment HTML dont la clé contient l'id du trajet, son updated_at et la
+version du profil de son conducteur (nom, photo, note) : une page se lit en
+une lecture groupée et seules les cartes modifiées sont rendues à nouveau.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.safestring import mark_safe
+from .metrics import record_cache
+from .models import Profile, Rating
+
+User = get_user_model()
+
+CARD_TEMPLATE = 'rides/ride_card.html'
+# Une carte dont la clé a changé n'est plus lue : ce délai borne seulement la mémoire
+CARD_TIMEOUT = 24 * 3600
+
+
+def _profile_version_key(user_id):
+    return f'rides:profile:v:{user_id}'
+
+
+def _card_key(ride, profile_version):
+    return (
+        f'rides:card:{ride.pk}:{ride.updated_at.timestamp()}:'
+        f'{profile_version}:{translation.get_language()}'
+    )
+
+
+def ride_cards(rides):
+    """
+    HTML des cartes des trajets `rides`, dans le même ordre. Deux lectures
+    groupées du cache ; les cartes manquantes sont rendues avec les
+    conducteurs relus en base (une requête), puis écrites en une fois.
+    """
+    rides = list(rides)
+    version_keys = {ride.driver_id: _profile_version_key(ride.driver_id) for ride in rides}
+    versions = cache.get_many(version_keys.values())
+    keys = [_card_key(ride, versions.get(version_keys[ride.driver_id], 0)) for ride in rides]
+    cards = cache.get_many(keys)
+
+    missing = [(key, ride) for key, ride in zip(keys, rides) if key not in cards]
+    record_cache('ride_card', len(keys) - len(missing), len(missing))
+    if missing:
+        # Le trajet peut venir du cache de recherche : conducteur et profil relus ici
+        drivers = User.objects.select_related('profile').in_bulk({ride.driver_id for _, ride in missing})
+        rendered = {
+            key: render_to_string(CARD_TEMPLATE, {'ride': ride, 'driver': drivers.get(ride.driver_id)})
+            for key, ride in missing
+        }
+        cache.set_many(rendered, CARD_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def invalidate_driver_cards(user_id):
+    """Périme les cartes des trajets d'un conducteur (après le commit)"""
+    def bump():
+        key = _profile_version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # La connexion n'enregistre que last_login, absent des cartes
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_driver_cards(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_driver_cards(instance.user_id)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def rating_changed(sender, instance, **kwargs):
+    # La note moyenne est mise à jour par UPDATE (ratings.py), sans signal Profile
+    invalidate_driver_cards(instance.to_user_id)
@@ -0,0 +1,138 @@
+from array import array
+from math import inf
+
+
+class DistanceTable(dict):
+    """
+    Table de distances {(ville1, ville2): km} versionnée : chaque modification
+    incrémente `version`, ce qui permet de détecter en O(1) qu'un graphe
+    calculé à partir de la table est périmé.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def _touch(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        self._touch()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._touch()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._touch()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+
+class CityGraph:
+    """
+    Plus courts chemins entre toutes les villes (Floyd-Warshall), calculés une
+    seule fois. Les distances et le prochain saut sont stockés dans deux
+    matrices plates indexées par identifiant de ville (position dans `names`),
+    si bien que chaque distance se lit en O(1).
+    """
+
+    def __init__(self, cities, distances, key=str.lower):
+        self.key = key
+        self.source = distances
+        self.version = getattr(distances, 'version', None)
+
+        names = list(cities)
+        known = {key(name) for name in names}
+        for pair in distances:
+            for name in pair:
+                if key(name) not in known:
+                    known.add(key(name))
+                    names.append(name)
+        self.names = names
+        self.index = {key(name): i for i, name in enumerate(names)}
+
+        n = self.size = len(names)
+        dist = array('d', [inf]) * (n * n)
+        hop = array('h', [-1]) * (n * n)
+        for i in range(n):
+            dist[i * n + i] = 0
+            hop[i * n + i] = i
+        for (city1, city2), km in distances.items():
+            i, j = self.index[key(city1)], self.index[key(city2)]
+            if km < dist[i * n + j]:
+                dist[i * n + j] = dist[j * n + i] = km
+                hop[i * n + j] = j
+                hop[j * n + i] = i
+
+        for k in range(n):
+            row_k = k * n
+            for i in range(n):
+                row_i = i * n
+                d_ik = dist[row_i + k]
+                if d_ik == inf:
+                    continue
+                hop_ik = hop[row_i + k]
+                for j in range(n):
+                    candidate = d_ik + dist[row_k + j]
+                    if candidate < dist[row_i + j]:
+                        dist[row_i + j] = candidate
+                        hop[row_i + j] = hop_ik
+
+        self.dist = dist
+        self.hop = hop
+
+    def is_current(self, distances):
+        """Le graphe a-t-il été calculé à partir de cette version de la table ?"""
+        return distances is self.source and getattr(distances, 'version', None) == self.version
+
+    def city_id(self, name):
+        if not name:
+            return None
+        return self.index.get(self.key(name))
+
+    def distance(self, city1, city2):
+        """Distance routière la plus courte, ou None si aucune route n'est connue"""
+        i, j = self.city_id(city1), self.city_id(city2)
+        if i is None or j is None:
+            return None
+        return self.distance_between(i, j)
+
+    def distance_between(self, i, j):
+        """Même chose que distance() à partir des identifiants de villes"""
+        km = self.dist[i * self.size + j]
+        if km == inf:
+            return None
+        return int(km) if km.is_integer() else km
+
+    def route(self, city1, city2):
+        """Liste des villes traversées (extrémités comprises), ou None"""
+        i, j = self.city_id(city1), self.city_id(city2)
+        if i is None or j is None:
+            return None
+        return self.route_between(i, j)
+
+    def route_between(self, i, j):
+        if self.hop[i * self.size + j] == -1:
+            return None
+        path = [self.names[i]]
+        while i != j:
+            i = self.hop[i * self.size + j]
+            path.append(self.names[i])
+        return path
@@ -0,0 +1,97 @@
+"""
+Mesures par requête : nombre et durée des requêtes SQL, temps de rendu des
+templates et d'envoi des e-mails. Les compteurs d'une requête échantillonnée
+sont tenus dans un RequestProfile, accessible aux points d'instrumentation
+par une variable de contexte ; hors échantillon, ceux-ci ne coûtent qu'une
+lecture de cette variable.
+"""
+import contextvars
+import functools
+import time
+from collections import Counter
+from django.core.mail import EmailMessage
+from django.template.base import Template
+
+_current = contextvars.ContextVar('rides_request_profile', default=None)
+_hooks_installed = False
+
+
+class RequestProfile:
+    """Compteurs d'une requête en cours de mesure"""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.mail_time = 0.0
+        self.mail_count = 0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper : le SQL reçu est paramétré, deux exécutions avec des
+        # valeurs différentes ont donc la même signature
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.queries[sql] += 1
+
+    def duplicates(self, threshold):
+        """Requêtes exécutées au moins `threshold` fois (signature d'un N+1)"""
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.queries.most_common()
+            if count >= threshold
+        ]
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, context):
+        profile = _current.get()
+        # Seul le template le plus externe est chronométré (include, extends…)
+        if profile is None or profile._template_depth:
+            return render(self, context)
+        profile._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.template_time += time.perf_counter() - start
+            profile._template_depth -= 1
+    return wrapper
+
+
+def _timed_send(send):
+    @functools.wraps(send)
+    def wrapper(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return send(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return send(self, *args, **kwargs)
+        finally:
+            profile.mail_time += time.perf_counter() - start
+            profile.mail_count += 1
+    return wrapper
+
+
+def install_hooks():
+    """Instrumente le rendu des templates et l'envoi des e-mails (une seule fois)"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    Template.render = _timed_render(Template.render)
+    EmailMessage.send = _timed_send(EmailMessage.send)
+    _hooks_installed = True
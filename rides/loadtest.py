@@ -0,0 +1,353 @@
+"""
+Scénarios de charge de bout en bout contre un serveur en fonctionnement
+(voir la commande load_test). Des passagers simulés, un par thread, et leurs
+conducteurs parcourent le tunnel de réservation : recherche → détail →
+demande de réservation → confirmation par le conducteur → paiement →
+validation. Utilisateurs et trajets sont créés par l'ORM (préfixe « load- ») ;
+les sessions sont ouvertes directement dans le moteur de sessions, comme
+Client.force_login. Les exceptions côté serveur sont relevées par différence
+sur /metrics, les surventes vérifiées en base à la fin.
+"""
+import http.client
+import math
+import random
+import re
+import secrets
+import threading
+import time
+from collections import Counter as Tally, defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.db.models import Sum
+from django.shortcuts import resolve_url
+from django.urls import reverse
+from django.utils import timezone
+from .metrics import FLUSH_INTERVAL
+from .models import Booking, Profile, Ride
+from .payment_models import PaymentTransaction
+from .roles import DRIVER_GROUP
+
+User = get_user_model()
+
+PREFIX = 'load-'
+ROUTES = [('Casablanca', 'Rabat'), ('Rabat', 'Fès'), ('Marrakech', 'Agadir'), ('Tanger', 'Tétouan')]
+
+# Scénario -> étapes du tunnel parcourues (« reject » : le conducteur refuse)
+SCENARIOS = {
+    'browse': ('search', 'ride_detail'),
+    'book': ('search', 'ride_detail', 'booking_request'),
+    'reject': ('search', 'ride_detail', 'booking_request', 'booking_action'),
+    'purchase': ('search', 'ride_detail', 'booking_request', 'booking_action', 'initiate_payment', 'validate_payment'),
+}
+DEFAULT_MIX = {'browse': 4, 'book': 1, 'reject': 1, 'purchase': 4}
+
+LoadData = namedtuple('LoadData', ['rides', 'drivers', 'passengers'])
+StepStats = namedtuple('StepStats', ['step', 'count', 'errors', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'])
+LoadReport = namedtuple('LoadReport', [
+    'duration', 'scenarios', 'requests', 'errors', 'steps', 'outcomes', 'exceptions', 'oversold', 'inconsistent',
+])
+
+_EXCEPTION_LINE = re.compile(r'^rides_exceptions_total\{view="[^"]*",type="([^"]*)"\} (\S+)$', re.M)
+
+
+class StepError(Exception):
+    """Réponse inattendue ou serveur injoignable pendant une étape"""
+
+
+def parse_mix(value):
+    """« browse=4,purchase=1 » -> {'browse': 4, 'purchase': 1}"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Scénario inconnu : {name}')
+        mix[name] = float(weight) if weight else 1.0
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError('Au moins un scénario doit avoir un poids positif')
+    return mix
+
+
+def seed_load_data(drivers=4, passengers=8, rides=20, seats=3, prefix=PREFIX):
+    """
+    Recrée les utilisateurs et trajets du préfixe ; peu de places par trajet
+    pour que les passagers se les disputent. Renvoie un LoadData dont `rides`
+    associe chaque trajet à (conducteur, places initiales).
+    """
+    User.objects.filter(username__startswith=prefix).delete()
+    User.objects.bulk_create(
+        [User(username=f'{prefix}driver{i}', email=f'{prefix}driver{i}@example.com', password=make_password(None))
+         for i in range(drivers)]
+        + [User(username=f'{prefix}passenger{i}', email=f'{prefix}passenger{i}@example.com',
+                password=make_password(None))
+           for i in range(passengers)]
+    )
+    users = list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+    Profile.objects.bulk_create([Profile(user=user, is_verified=True) for user in users])
+    driver_users = [user for user in users if user.username.startswith(f'{prefix}driver')]
+    Group.objects.get_or_create(name=DRIVER_GROUP)[0].user_set.add(*driver_users)
+
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    created = {}
+    for i in range(rides):
+        departure, arrival = ROUTES[i % len(ROUTES)]
+        ride = Ride.objects.create(
+            driver=driver_users[i % drivers], departure_city=departure, arrival_city=arrival,
+            departure_date=tomorrow + timedelta(days=i // len(ROUTES) % 3), departure_time=f'{6 + i % 14:02d}:00',
+            price=Decimal('50.00'), available_seats=seats, status='confirmed',
+        )
+        created[ride.pk] = (ride.driver_id, seats)
+    return LoadData(
+        created, [user.pk for user in driver_users],
+        [user.pk for user in users if user.username.startswith(f'{prefix}passenger')],
+    )
+
+
+def open_session(user_id):
+    """Clé d'une session authentifiée pour l'utilisateur, sans passer par le formulaire de connexion"""
+    user = User.objects.get(pk=user_id)
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class _Session:
+    """En-têtes d'un utilisateur simulé : cookie de session et jeton CSRF"""
+
+    def __init__(self, session_key=None):
+        token = secrets.token_hex(16)
+        cookies = [f'{settings.CSRF_COOKIE_NAME}={token}']
+        if session_key:
+            cookies.append(f'{settings.SESSION_COOKIE_NAME}={session_key}')
+        # CSRF_HEADER_NAME est une clé de request.META (HTTP_X_CSRFTOKEN)
+        header = settings.CSRF_HEADER_NAME.removeprefix('HTTP_').replace('_', '-')
+        self.headers = {'Cookie': '; '.join(cookies), header: token}
+
+
+def _pattern(url_name, *args):
+    # Motif d'URL à partir de reverse(), le premier argument devenant un groupe capturant
+    url = reverse(url_name, args=[987654321, *args])
+    return re.compile(re.escape(url).replace('987654321', r'(\d+)'))
+
+
+def _percentile(values, q):
+    return values[max(0, min(len(values) - 1, math.ceil(q * len(values)) - 1))]
+
+
+class _Worker:
+    """Un passager simulé ; joue des scénarios tirés selon le mélange demandé"""
+
+    def __init__(self, base_url, data, passenger, sessions, rng, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.data = data
+        self.passenger = sessions[passenger]
+        self.sessions = sessions
+        self.rng = rng
+        self.timeout = timeout
+        self.login_url = resolve_url(settings.LOGIN_URL)
+        self.ride_link = _pattern('rides:ride_detail')
+        self.cancel_link = _pattern('rides:booking_action', 'cancel')
+        self.booked = set()
+        self.timings = defaultdict(list)
+        self.errors = Tally()
+        self.outcomes = Tally()
+        self.scenarios = 0
+
+    def request(self, step, session, method, path, data=None, expected=(200,)):
+        """Une requête HTTP chronométrée sous le nom d'étape `step` ; renvoie (statut, corps)"""
+        headers = dict(session.headers)
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        server = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        start = time.perf_counter()
+        try:
+            server.request(method, self.prefix + path, body, headers)
+            response = server.getresponse()
+            content = response.read().decode(errors='replace')
+            location = response.getheader('Location', '')
+        except (OSError, http.client.HTTPException) as e:
+            self.timings[step].append(time.perf_counter() - start)
+            self.errors[step] += 1
+            raise StepError(f'{step} : {e}')
+        finally:
+            server.close()
+        self.timings[step].append(time.perf_counter() - start)
+        # Une session refusée renvoie vers la page de connexion
+        if response.status not in expected or location.startswith(self.login_url):
+            self.errors[step] += 1
+            raise StepError(f'{step} : réponse {response.status}')
+        return response.status, content
+
+    def search(self):
+        departure, arrival = self.rng.choice(ROUTES)
+        path = f'{reverse("rides:ride_search")}?{urlencode({"departure": departure, "arrival": arrival})}'
+        _, content = self.request('search', self.passenger, 'GET', path)
+        found = [int(pk) for pk in self.ride_link.findall(content) if int(pk) in self.data.rides]
+        # Trajets d'autres jeux de données en tête des résultats : un trajet du jeu au hasard
+        return self.rng.choice(found or list(self.data.rides))
+
+    def play(self, scenario):
+        """Joue un scénario ; renvoie son issue"""
+        steps = SCENARIOS[scenario]
+        ride_id = self.search()
+        detail = reverse('rides:ride_detail', args=[ride_id])
+        self.request('ride_detail', self.passenger, 'GET', detail)
+        if 'booking_request' not in steps:
+            return 'browsed'
+        if ride_id in self.booked:
+            return 'already_booked'
+
+        self.booked.add(ride_id)
+        status, _ = self.request(
+            'booking_request', self.passenger, 'POST', reverse('rides:booking_request', args=[ride_id]),
+            {'number_of_seats': self.rng.randint(1, 2), 'message': ''}, expected=(200, 302),
+        )
+        if status == 200:
+            # Formulaire réaffiché : plus assez de places
+            return 'refused'
+        _, content = self.request('ride_detail', self.passenger, 'GET', detail)
+        match = self.cancel_link.search(content)
+        if match is None:
+            return 'refused'
+        booking_id = int(match.group(1))
+        if 'booking_action' not in steps:
+            return 'pending'
+
+        driver = self.sessions[self.data.rides[ride_id][0]]
+        action = 'confirm' if 'initiate_payment' in steps else 'reject'
+        self.request(
+            'booking_action', driver, 'GET', reverse('rides:booking_action', args=[booking_id, action]),
+            expected=(302,),
+        )
+        if action == 'reject':
+            return 'rejected'
+
+        status, _ = self.request(
+            'initiate_payment', self.passenger, 'GET', reverse('rides:initiate_payment', args=[booking_id]),
+            expected=(200, 302),
+        )
+        if status == 302:
+            # Réservation non confirmée : le trajet est complet
+            return 'sold_out'
+        # Le code est envoyé au passager par e-mail ; le passager le lit dans sa boîte (ici, en base)
+        code = PaymentTransaction.objects.filter(booking_id=booking_id).values_list('validation_code', flat=True).first()
+        self.request(
+            'validate_payment', driver, 'POST', reverse('rides:validate_payment', args=[booking_id]),
+            {'validation_code': code or ''}, expected=(302,),
+        )
+        return 'paid'
+
+    def run(self, mix, stop_at, iterations):
+        names, weights = zip(*mix.items())
+        try:
+            while time.monotonic() < stop_at and (iterations is None or self.scenarios < iterations):
+                scenario = self.rng.choices(names, weights)[0]
+                try:
+                    outcome = self.play(scenario)
+                except StepError:
+                    outcome = 'error'
+                self.outcomes[outcome] += 1
+                self.scenarios += 1
+        finally:
+            # Connexion ouverte par ce thread pour lire les codes de validation
+            connection.close()
+
+
+def scrape_exceptions(base_url, timeout=10.0):
+    """Exceptions non gérées par type, d'après /metrics ; {} si la page est injoignable ou refusée"""
+    parts = urlsplit(base_url)
+    headers = {'Authorization': f'Bearer {settings.METRICS_TOKEN}'} if settings.METRICS_TOKEN else {}
+    server = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        server.request('GET', parts.path.rstrip('/') + reverse('rides:metrics'), headers=headers)
+        response = server.getresponse()
+        content = response.read().decode()
+    except (OSError, http.client.HTTPException):
+        return {}
+    finally:
+        server.close()
+    if response.status != 200:
+        return {}
+    totals = Tally()
+    for exception_type, value in _EXCEPTION_LINE.findall(content):
+        totals[exception_type] += float(value)
+    return totals
+
+
+def check_seats(data):
+    """Trajets survendus et trajets dont les places restantes ne correspondent pas aux réservations"""
+    booked = dict(
+        Booking.objects.filter(ride_id__in=data.rides, status__in=['confirmed', 'completed'])
+        .values('ride_id').annotate(seats=Sum('number_of_seats')).values_list('ride_id', 'seats')
+    )
+    available = dict(Ride.objects.filter(pk__in=data.rides).values_list('pk', 'available_seats'))
+    oversold = sorted(pk for pk, (_, seats) in data.rides.items() if booked.get(pk, 0) > seats)
+    inconsistent = sorted(
+        pk for pk, (_, seats) in data.rides.items() if seats - booked.get(pk, 0) != available.get(pk)
+    )
+    return oversold, inconsistent
+
+
+def run_load(base_url, data, workers=8, duration=30.0, iterations=None, mix=None, seed=None, timeout=10.0):
+    """
+    Lance `workers` passagers simulés contre `base_url` pendant `duration`
+    secondes (ou `iterations` scénarios par passager) ; renvoie un LoadReport.
+    """
+    mix = mix or DEFAULT_MIX
+    sessions = {user_id: _Session(open_session(user_id)) for user_id in [*data.drivers, *data.passengers]}
+    rngs = [random.Random(None if seed is None else seed + i) for i in range(workers)]
+    pool = [
+        _Worker(base_url, data, data.passengers[i % len(data.passengers)], sessions, rngs[i], timeout)
+        for i in range(workers)
+    ]
+    before = scrape_exceptions(base_url, timeout)
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=worker.run, args=(mix, start + duration, iterations), daemon=True)
+        for worker in pool
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    # Les autres processus publient leurs métriques au plus une fois par FLUSH_INTERVAL
+    time.sleep(FLUSH_INTERVAL)
+    after = scrape_exceptions(base_url, timeout)
+    exceptions = {name: int(count - before.get(name, 0)) for name, count in after.items() if count > before.get(name, 0)}
+
+    timings, errors, outcomes = defaultdict(list), Tally(), Tally()
+    for worker in pool:
+        for step, values in worker.timings.items():
+            timings[step].extend(values)
+        errors.update(worker.errors)
+        outcomes.update(worker.outcomes)
+    order = [step for step in SCENARIOS['purchase'] if step in timings]
+    steps = []
+    for step in order:
+        values = sorted(value * 1000 for value in timings[step])
+        steps.append(StepStats(
+            step, len(values), errors[step],
+            round(_percentile(values, 0.5), 2), round(_percentile(values, 0.9), 2),
+            round(_percentile(values, 0.99), 2), round(values[-1], 2),
+        ))
+    oversold, inconsistent = check_seats(data)
+    return LoadReport(
+        round(elapsed, 3), sum(worker.scenarios for worker in pool), sum(len(v) for v in timings.values()),
+        sum(errors.values()), steps, dict(outcomes), exceptions, oversold, inconsistent,
+    )
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rides.contention import ContentionResult, run_contention
+
+# Comportement historique de SQLite, comparé aux réglages configurés (SQLITE_*)
+DEFAULT_PROFILE = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_BUSY_TIMEOUT': '5',
+    'SQLITE_MMAP_SIZE': '0',
+    'SQLITE_TRANSACTION_MODE': 'DEFERRED',
+}
+
+class Command(BaseCommand):
+    help = ('Compare les écritures concurrentes sur SQLite entre le comportement historique et les réglages '
+            'configurés (WAL, busy_timeout, BEGIN IMMEDIATE), chacun sur une base temporaire')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=25, help='Opérations par thread')
+        parser.add_argument('--output', help='Fichier de résultats JSON')
+        # Mesure d'un seul profil, dans le processus lancé pour lui
+        parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            if connection.vendor != 'sqlite':
+                raise CommandError('Ce banc compare des réglages SQLite')
+            call_command('migrate', verbosity=0)
+            result = run_contention(options['threads'], options['operations'])
+            self.stdout.write(json.dumps(result._asdict()))
+            return
+
+        configured = {
+            'SQLITE_JOURNAL_MODE': settings.SQLITE_JOURNAL_MODE,
+            'SQLITE_SYNCHRONOUS': settings.SQLITE_SYNCHRONOUS,
+            'SQLITE_BUSY_TIMEOUT': str(settings.SQLITE_BUSY_TIMEOUT),
+            'SQLITE_MMAP_SIZE': str(settings.SQLITE_MMAP_SIZE),
+            'SQLITE_TRANSACTION_MODE': settings.SQLITE_TRANSACTION_MODE,
+        }
+        results = {}
+        self.stdout.write(f'{"profil":<12}{"opérations":>12}{"durée s":>10}{"ops/s":>10}{"erreurs":>10}{"p50 ms":>10}{"p99 ms":>10}')
+        for name, profile in (('default', DEFAULT_PROFILE), ('configured', configured)):
+            result = self.run_profile(profile, options['threads'], options['operations'])
+            results[name] = {'profile': profile, **result._asdict()}
+            self.stdout.write(
+                f'{name:<12}{result.operations:>12}{result.seconds:>10.2f}{result.ops_per_s:>10.1f}'
+                f'{result.errors:>10}{result.p50_ms:>10.2f}{result.p99_ms:>10.2f}'
+            )
+
+        before, after = results['default'], results['configured']
+        if before['ops_per_s']:
+            self.stdout.write(f'Débit : x{after["ops_per_s"] / before["ops_per_s"]:.2f}')
+        self.stdout.write(f'Erreurs « database is locked » : {before["errors"]} -> {after["errors"]}')
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Résultats enregistrés dans {options["output"]}')
+        if after['errors']:
+            raise CommandError('Des écritures échouent encore avec les réglages configurés')
+        self.stdout.write(self.style.SUCCESS('Aucune écriture perdue avec les réglages configurés'))
+
+    def run_profile(self, profile, threads, operations):
+        """Mesure un profil dans un processus à part, sur une base SQLite temporaire neuve"""
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ, **profile,
+                'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+                'DB_ENGINE': 'sqlite',
+                'SQLITE_PATH': str(Path(directory) / 'contention.sqlite3'),
+            }
+            process = subprocess.run(
+                [sys.executable, '-m', 'django', 'benchmark_contention', '--child',
+                 '--threads', str(threads), '--operations', str(operations)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+        if process.returncode:
+            raise CommandError(f'Échec de la mesure :\n{process.stderr[-2000:]}')
+        return ContentionResult(**json.loads(process.stdout.strip().splitlines()[-1]))
@@ -0,0 +1,62 @@
+import json
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rides.benchmarks import SCENARIOS, run_benchmarks
+from rides.dataset import generate_dataset
+from rides.models import Booking, Ride
+
+PREFIX = 'bench-'
+
+class Command(BaseCommand):
+    help = 'Mesure les vues principales sur une base de test et un jeu de données générés, résultats en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--rides', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--views', nargs='*', choices=sorted(SCENARIOS), help='Vues à mesurer (toutes par défaut)')
+        parser.add_argument('--output', default='benchmark.json', help='Fichier de résultats JSON')
+        parser.add_argument('--keepdb', action='store_true', help='Conserver la base de test et son jeu de données')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not User.objects.filter(username__startswith=PREFIX).exists():
+                self.stdout.write(f'Génération du jeu de données ({options["users"]} utilisateurs, {options["rides"]} trajets)…')
+                for _ in generate_dataset(options['users'], options['rides'], options['seed'], prefix=PREFIX):
+                    pass
+
+            results = {}
+            self.stdout.write(f'{"vue":<16}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"requêtes":>10}{"pic Ko":>10}')
+            try:
+                for result in run_benchmarks(options['views'], options['iterations']):
+                    results[result.view] = result._asdict()
+                    self.stdout.write(
+                        f'{result.view:<16}{result.p50_ms:>10.2f}{result.p90_ms:>10.2f}{result.p99_ms:>10.2f}'
+                        f'{result.queries:>10}{result.peak_kb:>10.0f}'
+                    )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            meta = {
+                'created': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'rides': Ride.objects.count(),
+                'bookings': Booking.objects.count(),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {options["output"]}'))
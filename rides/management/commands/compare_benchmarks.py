@@ -0,0 +1,39 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from rides.benchmarks import compare_results
+
+class Command(BaseCommand):
+    help = 'Compare des résultats de benchmark_views à une référence ; échoue en cas de régression'
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='Résultats de référence (JSON)')
+        parser.add_argument('current', help='Résultats à vérifier (JSON)')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Hausse relative tolérée (0.2 = 20 %%)')
+
+    def handle(self, *args, **options):
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+        with open(options['current']) as f:
+            current = json.load(f)
+        if baseline['meta'].get('rides') != current['meta'].get('rides'):
+            self.stdout.write(self.style.WARNING(
+                f'Jeux de données différents : {baseline["meta"].get("rides")} et {current["meta"].get("rides")} trajets'
+            ))
+
+        for view, result in current['results'].items():
+            reference = baseline['results'].get(view)
+            if reference is None:
+                self.stdout.write(f'{view:<16} absent de la référence')
+                continue
+            self.stdout.write(
+                f'{view:<16} p50 {reference["p50_ms"]:.2f} → {result["p50_ms"]:.2f} ms, '
+                f'p90 {reference["p90_ms"]:.2f} → {result["p90_ms"]:.2f} ms, '
+                f'{reference["queries"]} → {result["queries"]} requêtes'
+            )
+
+        regressions = compare_results(baseline['results'], current['results'], options['threshold'])
+        if regressions:
+            raise CommandError('Régressions : ' + ' ; '.join(
+                f'{view} {metric} {before} → {after}' for view, metric, before, after in regressions
+            ))
+        self.stdout.write(self.style.SUCCESS('Aucune régression'))
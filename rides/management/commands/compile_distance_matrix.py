@@ -0,0 +1,93 @@
+import csv
+import heapq
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rides.cities import CITY_REGISTRY, CITY_DISTANCES, normalize_city
+from rides.matrix import CELL_FORMATS, write_matrix
+
+class Command(BaseCommand):
+    help = 'Compile les localités et distances routières en une matrice binaire projetable en mémoire'
+
+    def add_arguments(self, parser):
+        parser.add_argument('localities', nargs='?', help="CSV des localités : name,latitude,longitude[,aliases séparés par |]")
+        parser.add_argument('distances', nargs='?', help='CSV des distances routières : from,to,km')
+        parser.add_argument('--output', default=None, help='Fichier de sortie (DISTANCE_MATRIX_PATH par défaut)')
+        parser.add_argument('--dtype', choices=sorted(CELL_FORMATS), default='uint16')
+        parser.add_argument('--direct-only', action='store_true', help='Ne pas compléter par les plus courts chemins')
+
+    def handle(self, *args, **options):
+        if bool(options['localities']) != bool(options['distances']):
+            raise CommandError('Indiquez les deux fichiers CSV, ou aucun pour compiler le registre intégré.')
+
+        if options['localities']:
+            localities = self.read_localities(options['localities'])
+            edges = self.read_distances(options['distances'])
+        else:
+            localities = [(name, lat, lon, list(aliases)) for name, lat, lon, aliases in CITY_REGISTRY]
+            edges = [(city1, city2, km) for (city1, city2), km in CITY_DISTANCES.items()]
+
+        ids = {}
+        for locality_id, (name, _lat, _lon, aliases) in enumerate(localities):
+            for variant in (name, *aliases):
+                ids.setdefault(normalize_city(variant), locality_id)
+
+        adjacency = [dict() for _ in localities]
+        skipped = 0
+        for city1, city2, km in edges:
+            i, j = ids.get(normalize_city(city1)), ids.get(normalize_city(city2))
+            if i is None or j is None:
+                skipped += 1
+                continue
+            if km < adjacency[i].get(j, float('inf')):
+                adjacency[i][j] = adjacency[j][i] = km
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'{skipped} distance(s) ignorée(s) : localité inconnue'))
+
+        n = len(localities)
+        if options['direct_only']:
+            rows = (self.direct_row(adjacency, i, n) for i in range(n))
+        else:
+            rows = (self.shortest_row(adjacency, i, n) for i in range(n))
+
+        output = options['output'] or settings.DISTANCE_MATRIX_PATH
+        started = time.monotonic()
+        write_matrix(output, localities, rows, dtype=options['dtype'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Matrice {n}x{n} ({options["dtype"]}) écrite dans {output} en {elapsed:.1f}s'
+        ))
+
+    def read_localities(self, path):
+        localities = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                aliases = [alias for alias in (row.get('aliases') or '').split('|') if alias]
+                localities.append((row['name'], float(row['latitude']), float(row['longitude']), aliases))
+        return localities
+
+    def read_distances(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return [(row['from'], row['to'], float(row['km'])) for row in csv.DictReader(f)]
+
+    def direct_row(self, adjacency, source, n):
+        row = [None] * n
+        row[source] = 0
+        for target, km in adjacency[source].items():
+            row[target] = km
+        return row
+
+    def shortest_row(self, adjacency, source, n):
+        """Dijkstra depuis une localité : une ligne de la matrice"""
+        row = [None] * n
+        queue = [(0, source)]
+        while queue:
+            km, i = heapq.heappop(queue)
+            if row[i] is not None:
+                continue
+            row[i] = km
+            for j, edge in adjacency[i].items():
+                if row[j] is None:
+                    heapq.heappush(queue, (km + edge, j))
+        return row
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
-from rides.models import Ride
+from rides.models import Ride, Vehicle
 from datetime import timedelta, time
 
 class Command(BaseCommand):
@@ -37,51 +37,50 @@ class Command(BaseCommand):
             passagers_group = Group.objects.get(name='Passagers')
             passager.groups.add(passagers_group)
             
-            # Création de trajets de test
+            # Véhicule du conducteur
+            vehicule = Vehicle.objects.create(
+                driver=conducteur,
+                brand='Dacia',
+                model='Logan',
+                color='Gris',
+                license_plate='12345-A-6',
+                number_of_seats=5
+            )
+
+            # Création de trajets de test (prix calculé à partir de la distance)
             trajets = [
                 {
-                    'departure_city': 'Paris',
-                    'arrival_city': 'Lyon',
-                    'departure_address': '1 Place de la République, Paris',
-                    'arrival_address': '10 Place Bellecour, Lyon',
+                    'departure_city': 'Casablanca',
+                    'arrival_city': 'Rabat',
                     'departure_date': timezone.now().date() + timedelta(days=1),
                     'departure_time': time(8, 0),  # 8h00
-                    'price_per_seat': 35.00,
                     'available_seats': 3,
-                    'vehicle_description': 'Peugeot 308 grise',
                 },
                 {
-                    'departure_city': 'Lyon',
-                    'arrival_city': 'Marseille',
-                    'departure_address': '10 Place Bellecour, Lyon',
-                    'arrival_address': '1 Quai du Port, Marseille',
+                    'departure_city': 'Rabat',
+                    'arrival_city': 'Fès',
                     'departure_date': timezone.now().date() + timedelta(days=2),
                     'departure_time': time(14, 30),  # 14h30
-                    'price_per_seat': 30.00,
                     'available_seats': 4,
-                    'vehicle_description': 'Peugeot 308 grise',
                 },
                 {
-                    'departure_city': 'Marseille',
-                    'arrival_city': 'Nice',
-                    'departure_address': '1 Quai du Port, Marseille',
-                    'arrival_address': '1 Place Masséna, Nice',
+                    'departure_city': 'Marrakech',
+                    'arrival_city': 'Agadir',
                     'departure_date': timezone.now().date() + timedelta(days=3),
                     'departure_time': time(10, 0),  # 10h00
-                    'price_per_seat': 25.00,
                     'available_seats': 3,
-                    'vehicle_description': 'Peugeot 308 grise',
                 }
             ]
 
             for trajet in trajets:
                 ride = Ride.objects.create(
                     driver=conducteur,
+                    vehicle=vehicule,
                     status='confirmed',
                     **trajet
                 )
                 self.stdout.write(self.style.SUCCESS(
-                    f'Trajet créé : {ride.departure_city} → {ride.arrival_city}'
+                    f'Trajet créé : {ride.departure_city} → {ride.arrival_city} ({ride.price} DH)'
                 ))
 
         except Exception as e:
@@ -0,0 +1,36 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rides.dataset import generate_dataset
+from rides.models import Booking, Rating, Ride, RideReport
+from rides.payment_models import PaymentTransaction
+
+class Command(BaseCommand):
+    help = 'Génère un jeu de données synthétique reproductible (utilisateurs, trajets, réservations, paiements, évaluations)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--rides', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42, help='Graine : même graine et mêmes volumes, mêmes données')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='dataset-', help='Préfixe des noms d\'utilisateur créés')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Des utilisateurs « {options["prefix"]}… » existent déjà : choisir un autre --prefix'
+            )
+
+        started = time.monotonic()
+        for progress in generate_dataset(
+            options['users'], options['rides'], options['seed'], options['chunk_size'], options['prefix']
+        ):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'… {progress.step} : {progress.done}/{progress.total} ({elapsed:.1f}s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Jeu de données créé en {time.monotonic() - started:.1f}s : '
+            f'{Ride.objects.count()} trajets, {Booking.objects.count()} réservations, '
+            f'{PaymentTransaction.objects.count()} paiements, {Rating.objects.count()} évaluations, '
+            f'{RideReport.objects.count()} signalements au total'
+        ))
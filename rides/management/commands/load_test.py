@@ -0,0 +1,134 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+from rides.loadtest import DEFAULT_MIX, parse_mix, run_load, seed_load_data
+
+class Command(BaseCommand):
+    help = 'Joue des scénarios de réservation concurrents contre un serveur en fonctionnement (runserver local par défaut)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Serveur à tester, qui doit utiliser la même base que cette commande (données créées et '
+                 'places vérifiées ici) ; sans cette option, un runserver est lancé sur la base configurée',
+        )
+        parser.add_argument(
+            '--shared-database', action='store_true',
+            help='Confirme que le serveur de --url utilise la même base que cette commande',
+        )
+        parser.add_argument('--workers', type=int, default=8, help='Passagers simulés (un thread chacun)')
+        parser.add_argument('--drivers', type=int, default=4)
+        parser.add_argument('--rides', type=int, default=20)
+        parser.add_argument('--seats', type=int, default=3, help='Places par trajet')
+        parser.add_argument('--duration', type=float, default=30.0, help='Durée en secondes')
+        parser.add_argument('--iterations', type=int, help='Scénarios par passager (au lieu de la durée)')
+        parser.add_argument(
+            '--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help='Poids des scénarios, ex. browse=4,book=1,reject=1,purchase=4',
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Fichier de résultats JSON')
+        parser.add_argument('--server-log', help='Journal du runserver lancé par la commande')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['url'] and not options['shared_database']:
+            # Sur une autre base, les comptes créés ici n'existent pas côté serveur et la
+            # vérification des places porterait sur des trajets que personne n'a réservés
+            raise CommandError(
+                '--url exige un serveur qui utilise la même base que cette commande ; '
+                'ajoutez --shared-database pour le confirmer'
+            )
+
+        data = seed_load_data(options['drivers'], options['workers'], options['rides'], options['seats'])
+        server = None
+        url = options['url']
+        if not url:
+            server, url = self.start_server(options['server_log'])
+        try:
+            self.stdout.write(f'{options["workers"]} passagers, {options["drivers"]} conducteurs, {options["rides"]} trajets contre {url}…')
+            report = run_load(
+                url, data, options['workers'], options['duration'], options['iterations'], mix, options['seed'],
+            )
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+        self.stdout.write(
+            f'{report.duration:.1f} s : {report.scenarios} scénarios ({report.scenarios / report.duration:.1f}/s), '
+            f'{report.requests} requêtes ({report.requests / report.duration:.1f}/s), '
+            f'{report.errors} erreur(s) ({100 * report.errors / max(report.requests, 1):.2f} %)'
+        )
+        self.stdout.write(f'{"étape":<18}{"requêtes":>10}{"erreurs":>10}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+        for step in report.steps:
+            self.stdout.write(
+                f'{step.step:<18}{step.count:>10}{step.errors:>10}{step.p50_ms:>10.2f}{step.p90_ms:>10.2f}'
+                f'{step.p99_ms:>10.2f}{step.max_ms:>10.2f}'
+            )
+        self.stdout.write('Issues : ' + ', '.join(f'{name}={count}' for name, count in sorted(report.outcomes.items())))
+        self.stdout.write('Exceptions serveur : ' + (
+            ', '.join(f'{name}={count}' for name, count in sorted(report.exceptions.items())) or 'aucune'
+        ))
+
+        if options['output']:
+            result = report._asdict()
+            result['steps'] = [step._asdict() for step in report.steps]
+            result['meta'] = {
+                'created': timezone.now().isoformat(),
+                'url': url,
+                'database': settings.DATABASES['default']['ENGINE'],
+                'workers': options['workers'],
+                'mix': mix,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(f'Résultats enregistrés dans {options["output"]}')
+
+        if report.oversold or report.inconsistent:
+            raise CommandError(
+                f'Places incohérentes : {len(report.oversold)} trajet(s) survendu(s) {report.oversold}, '
+                f'{len(report.inconsistent)} trajet(s) dont les places restantes sont fausses {report.inconsistent}'
+            )
+        self.stdout.write(self.style.SUCCESS('Aucune survente'))
+
+    def start_server(self, log_path):
+        """Lance runserver sur un port libre, avec les mêmes réglages ; renvoie (processus, URL)"""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'django', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+            cwd=settings.BASE_DIR, env=env, stdout=log, stderr=log,
+        )
+        if log_path:
+            log.close()
+        url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('Le serveur de développement s\'est arrêté au démarrage')
+            try:
+                urllib.request.urlopen(url + reverse('rides:metrics'), timeout=1).close()
+                return process, url
+            except urllib.error.HTTPError:
+                # Le serveur répond, même s'il refuse l'accès aux métriques
+                return process, url
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError('Le serveur de développement ne répond pas')
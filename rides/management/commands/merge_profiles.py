@@ -0,0 +1,33 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rides.profiling import hot_functions, read_stacks, view_directory
+
+class Command(BaseCommand):
+    help = "Fusionne les profils enregistrés (piles repliées) et affiche les fonctions les plus coûteuses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PROFILING_DIR, help='Répertoire des profils (PROFILING_DIR)')
+        parser.add_argument('--view', help='Nom de vue à analyser, par exemple rides:my_rides (toutes par défaut)')
+        parser.add_argument('--top', type=int, default=20, help='Nombre de fonctions à afficher')
+        parser.add_argument('--output', help='Fichier de piles fusionnées à écrire (entrée de flamegraph.pl)')
+
+    def handle(self, *args, **options):
+        if not options['dir']:
+            raise CommandError('Aucun répertoire de profils : définir PROFILING_DIR ou --dir')
+        root = view_directory(options['dir'], options['view']) if options['view'] else Path(options['dir'])
+        paths = sorted(root.rglob('*.folded'))
+        if not paths:
+            raise CommandError(f'Aucun profil dans {root}')
+
+        stacks = read_stacks(paths)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                for stack, value in sorted(stacks.items()):
+                    f.write(f'{stack} {value}\n')
+
+        total = sum(stacks.values()) or 1
+        self.stdout.write(f'{len(paths)} requête(s) profilée(s), {total / 1000:.1f} ms au total\n')
+        self.stdout.write(f'{"propre (ms)":>12} {"%":>6} {"cumulé (ms)":>12}  fonction')
+        for frame, own, cumulative in hot_functions(stacks)[:options['top']]:
+            self.stdout.write(f'{own / 1000:>12.1f} {own * 100 / total:>6.1f} {cumulative / 1000:>12.1f}  {frame}')
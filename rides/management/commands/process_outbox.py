@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from rides.outbox import process_outbox
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente dans la file d'envoi, par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help='Continuer à surveiller la file après l\'avoir vidée')
+        parser.add_argument('--interval', type=float, default=5.0, help='Attente entre deux passages en mode --loop (secondes)')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                for result in process_outbox(options['batch_size']):
+                    self.stdout.write(
+                        f'{result.sent} envoyé(s), {result.retried} reporté(s), {result.failed} en échec définitif'
+                    )
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from rides.ratings import rebuild_rating_aggregates
+
+class Command(BaseCommand):
+    help = 'Recalcule les moyennes des profils et par critère à partir de toutes les évaluations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        profiles, aggregates = rebuild_rating_aggregates(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{profiles} profil(s) corrigé(s), {aggregates} moyenne(s) par critère '
+            f'recalculée(s) en {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from rides.stats import rebuild_user_stats
+
+class Command(BaseCommand):
+    help = 'Recalcule les statistiques de trajets de tous les utilisateurs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_user_stats(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Statistiques recalculées pour {count} utilisateur(s) en {time.monotonic() - started:.1f}s'
+        ))
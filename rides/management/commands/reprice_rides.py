@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rides.pricing import (
+    acquire_reprice_lock, get_pricing_settings, invalidate_pricing, release_reprice_lock, reprice_rides,
+)
+
+class Command(BaseCommand):
+    help = 'Recalcule par lots le prix des trajets à venir selon les paramètres de tarification actuels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--start-after', type=int, default=0, help='Reprendre après cet identifiant de trajet')
+        parser.add_argument('--pause', type=float, default=0.0, help='Pause entre deux lots (secondes)')
+        # Verrou déjà pris par l'administration, qui le libère à la fin du processus
+        parser.add_argument('--lock-held', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['lock_held']:
+            return self.reprice(options)
+        if not acquire_reprice_lock(f'command:{os.getpid()}'):
+            raise CommandError('Un recalcul des prix est déjà en cours')
+        try:
+            return self.reprice(options)
+        finally:
+            release_reprice_lock()
+
+    def reprice(self, options):
+        invalidate_pricing()
+        pricing = get_pricing_settings()
+        self.stdout.write(
+            f'Tarification : {pricing.base_price_per_km} DH/km, minimum {pricing.min_price} DH, '
+            f'{pricing.driver_profit_percentage}% conducteur'
+        )
+
+        started = time.monotonic()
+        progress = None
+        for progress in reprice_rides(options['start_after'], options['chunk_size'], pricing):
+            elapsed = time.monotonic() - started
+            rate = progress.scanned / elapsed if elapsed else 0
+            self.stdout.write(
+                f'… {progress.scanned} trajets parcourus, {progress.updated} mis à jour '
+                f'({rate:.0f} trajets/s), dernier id : {progress.last_id}'
+            )
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        if progress is None:
+            self.stdout.write(self.style.SUCCESS('Aucun trajet à recalculer.'))
+            return
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{progress.updated} trajet(s) recalculé(s) sur {progress.scanned} en {elapsed:.1f}s'
+        ))
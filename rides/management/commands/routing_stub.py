@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from rides.routing_stub import RoutingStubServer
+
+class Command(BaseCommand):
+    help = "Lance un faux fournisseur d'itinéraires local (API Distance Matrix) pour le développement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0.0, help='Latence simulée par requête (secondes)')
+
+    def handle(self, *args, **options):
+        server = RoutingStubServer(options['host'], options['port'], delay=options['delay'], verbose=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fournisseur simulé à l\'écoute sur {server.url}\n'
+            f'Utilisez ROUTING_BACKEND=rides.routing.HTTPRoutingBackend ROUTING_URL={server.url}'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from rides.smtp_sink import SMTPSinkServer
+
+class Command(BaseCommand):
+    help = "Lance un serveur SMTP local qui affiche les emails reçus au lieu de les envoyer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        server = SMTPSinkServer(options['host'], options['port'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Serveur SMTP local à l\'écoute sur {server.host}:{server.port}\n'
+            f'Utilisez EMAIL_HOST={server.host} EMAIL_PORT={server.port} EMAIL_USE_TLS=False'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,109 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from math import isnan
+from pathlib import Path
+from .cities import normalize_city
+
+# En-tête du fichier binaire : signature, version, type des cellules, nombre de localités
+HEADER = struct.Struct('<4sBc2xI4x')
+MAGIC = b'RDMX'
+FORMAT_VERSION = 1
+
+# uint16 : distances arrondies au km, 0xFFFF = distance inconnue
+# float32 : distances exactes, NaN = distance inconnue
+CELL_FORMATS = {'uint16': b'H', 'float32': b'f'}
+UINT16_UNKNOWN = 0xFFFF
+
+
+def index_path(matrix_path):
+    """Chemin de l'index des localités associé à une matrice"""
+    return Path(matrix_path).with_suffix('.json')
+
+
+def write_matrix(path, localities, rows, dtype='uint16'):
+    """
+    Écrit une matrice dense n x n (ligne par ligne) et son index.
+    `localities` : liste de (nom, latitude, longitude, variantes)
+    `rows` : itérable de n lignes de n distances (None = inconnue)
+    """
+    code = CELL_FORMATS[dtype]
+    unknown = UINT16_UNKNOWN if dtype == 'uint16' else float('nan')
+    n = len(localities)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Écriture dans des fichiers temporaires puis remplacement atomique : les
+    # processus qui ont déjà projeté l'ancienne matrice continuent de la lire
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_index = index_path(path).with_name(index_path(path).name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, code, n))
+        for row in rows:
+            if dtype == 'uint16':
+                values = [unknown if km is None else min(int(round(km)), UINT16_UNKNOWN - 1) for km in row]
+            else:
+                values = [unknown if km is None else float(km) for km in row]
+            cells = array(code.decode(), values)
+            if sys.byteorder == 'big':
+                cells.byteswap()
+            f.write(cells.tobytes())
+
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump([list(locality) for locality in localities], f, ensure_ascii=False)
+    os.replace(tmp_index, index_path(path))
+    os.replace(tmp_path, path)
+
+
+class DistanceMatrix:
+    """
+    Matrice de distances projetée en mémoire (mmap en lecture seule) : tous
+    les processus qui l'ouvrent partagent les mêmes pages du cache disque et
+    aucune donnée n'est désérialisée au chargement. Chaque lecture est O(1).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, code, n = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or code not in CELL_FORMATS.values():
+            self._mm.close()
+            raise ValueError(f"Fichier de distances invalide : {self.path}")
+        self.size = n
+        self._cell = struct.Struct('<' + code.decode())
+        self._is_float = code == b'f'
+        if len(self._mm) != HEADER.size + n * n * self._cell.size:
+            self._mm.close()
+            raise ValueError(f"Fichier de distances tronqué : {self.path}")
+
+        with open(index_path(self.path), encoding='utf-8') as f:
+            self.localities = json.load(f)
+        if len(self.localities) != n:
+            self._mm.close()
+            raise ValueError(f"Index des localités incohérent : {index_path(self.path)}")
+        self.index = {}
+        for locality_id, (name, _lat, _lon, aliases) in enumerate(self.localities):
+            for variant in (name, *aliases):
+                self.index.setdefault(normalize_city(variant), locality_id)
+
+    def close(self):
+        self._mm.close()
+
+    def locality_id(self, name):
+        return self.index.get(normalize_city(name))
+
+    def coordinates(self, locality_id):
+        _, lat, lon, _ = self.localities[locality_id]
+        return lat, lon
+
+    def distance_between(self, i, j):
+        """Distance entre deux localités (par identifiant), ou None si inconnue"""
+        offset = HEADER.size + (i * self.size + j) * self._cell.size
+        (km,) = self._cell.unpack_from(self._mm, offset)
+        if self._is_float:
+            return None if isnan(km) else km
+        return None if km == UINT16_UNKNOWN else km
@@ -0,0 +1,243 @@
+"""
+Métriques au format texte de Prometheus. Chaque processus (worker gunicorn,
+commande process_outbox…) cumule ses valeurs en mémoire et, si METRICS_DIR
+est défini, les écrit au plus une fois par seconde dans un fichier qui lui
+est propre. La vue /metrics additionne les fichiers de tous les processus.
+Comme pour le mode multiprocessus de prometheus_client, le répertoire est à
+vider au démarrage d'un déploiement.
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+FLUSH_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+_metrics = {}
+
+
+class _ProcessStore:
+    """Valeurs cumulées du processus courant"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Une seule écriture du fichier à la fois (flush peut venir de plusieurs threads)
+        self.flush_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Après un fork, le processus enfant repart de zéro sous son propre fichier
+        self.pid = os.getpid()
+        self.file_name = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = time.monotonic()
+
+    def add(self, name, labels, amount):
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self.maybe_flush()
+
+    def observe(self, name, labels, buckets, value):
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            key = (name, labels)
+            state = self.histograms.get(key)
+            if state is None:
+                # Un compteur par borne (non cumulés) puis +Inf, somme, nombre
+                state = self.histograms[key] = [0] * (len(buckets) + 1) + [0, 0]
+            state[bisect_left(buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, state] for (name, labels), state in self.histograms.items()],
+            }
+
+    def maybe_flush(self):
+        # Vérification et réservation de l'écriture sous le verrou : un seul thread écrit par intervalle
+        with self.lock:
+            if time.monotonic() - self.last_flush < FLUSH_INTERVAL:
+                return
+            self.last_flush = time.monotonic()
+        self.flush()
+
+    def flush(self):
+        """
+        Écrit l'état du processus dans METRICS_DIR (remplacement atomique).
+        Appelée depuis les vues métier : une erreur d'écriture est journalisée,
+        jamais propagée.
+        """
+        with self.lock:
+            self.last_flush = time.monotonic()
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        with self.flush_lock:
+            tmp = None
+            try:
+                Path(directory).mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'{self.pid}-', suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    f.write(json.dumps(self.snapshot()))
+                os.replace(tmp, Path(directory) / self.file_name)
+            except OSError as e:
+                logger.warning('Écriture des métriques impossible dans %s : %s', directory, e)
+                if tmp:
+                    try:
+                        os.unlink(tmp)
+                    except OSError:
+                        pass
+
+
+_store = _ProcessStore()
+atexit.register(_store.flush)
+
+
+def _labels(metric, labels):
+    return tuple(str(labels[name]) for name in metric.labelnames)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def inc(self, amount=1, **labels):
+        if amount:
+            _store.add(self.name, _labels(self, labels), amount)
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        _metrics[name] = self
+
+    def observe(self, value, **labels):
+        _store.observe(self.name, _labels(self, labels), self.buckets, value)
+
+
+REQUEST_LATENCY = Histogram(
+    'rides_request_duration_seconds', 'Durée de traitement des requêtes HTTP par vue', ['view'],
+)
+REQUEST_QUERIES = Histogram(
+    'rides_request_queries', 'Nombre de requêtes SQL par requête HTTP', ['view'], QUERY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'rides_cache_requests_total', 'Lectures des caches applicatifs', ['cache', 'result'],
+)
+EMAILS = Counter(
+    'rides_emails_total', "E-mails sortants (envoyés, reportés, abandonnés)", ['result'],
+)
+TRANSITIONS = Counter(
+    'rides_state_transitions_total', "Changements d'état des réservations, demandes et paiements",
+    ['kind', 'from_status', 'to_status'],
+)
+EXCEPTIONS = Counter(
+    'rides_exceptions_total', 'Exceptions non gérées levées par les vues', ['view', 'type'],
+)
+
+
+def record_cache(cache_name, hits, misses=0):
+    CACHE_REQUESTS.inc(hits, cache=cache_name, result='hit')
+    CACHE_REQUESTS.inc(misses, cache=cache_name, result='miss')
+
+
+def _read_snapshots():
+    _store.flush()
+    directory = settings.METRICS_DIR
+    if not directory:
+        return [_store.snapshot()]
+    snapshots = []
+    for path in Path(directory).glob('*.json'):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Fichier remplacé ou supprimé pendant la lecture
+            continue
+    return snapshots
+
+
+def collect():
+    """Valeurs additionnées sur tous les processus : (counters, histograms)"""
+    counters, histograms = {}, {}
+    for snapshot in _read_snapshots():
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, state in snapshot['histograms']:
+            key = (name, tuple(labels))
+            total = histograms.get(key)
+            histograms[key] = state if total is None else [a + b for a, b in zip(total, state)]
+    return counters, histograms
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """Exposition texte (format 0.0.4) de toutes les métriques"""
+    counters, histograms = collect()
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        if metric.type == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric.name:
+                    lines.append(f'{name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}')
+            continue
+        for (name, labels), state in sorted(histograms.items()):
+            if name != metric.name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, math.inf), state):
+                cumulative += count
+                le = _format_labels(metric.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f'{name}_bucket{le} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(metric.labelnames, labels)} {_format_value(state[-2])}')
+            lines.append(f'{name}_count{_format_labels(metric.labelnames, labels)} {state[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,160 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from .instrumentation import RequestProfile, install_hooks
+from .metrics import EXCEPTIONS, REQUEST_LATENCY, REQUEST_QUERIES
+from .profiling import profile_request, write_profile
+from .query_budgets import query_budget
+from .roles import get_user_roles
+
+logger = logging.getLogger('rides.instrumentation')
+profiling_logger = logging.getLogger('rides.profiling')
+
+
+class UserRolesMiddleware:
+    """Expose request.roles, résolu à la première utilisation puis réutilisé"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.roles = SimpleLazyObject(lambda: get_user_roles(request.user))
+        return self.get_response(request)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Mesure une proportion INSTRUMENTATION_SAMPLE_RATE des requêtes et écrit
+    une ligne JSON par requête dans le journal rides.instrumentation.
+    Désactivé (retiré de la chaîne) lorsque la proportion est nulle.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.duplicate_threshold = settings.INSTRUMENTATION_DUPLICATE_THRESHOLD
+        self.get_response = get_response
+        # Le journal est ouvert à la première écriture (delay=True)
+        settings.INSTRUMENTATION_LOG.parent.mkdir(parents=True, exist_ok=True)
+        install_hooks()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = profile.activate()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            profile.deactivate(token)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        logger.info(json.dumps({
+            'ts': timezone.now().isoformat(),
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': _ms(total),
+            'queries': profile.query_count,
+            'query_budget': query_budget(view_name),
+            'db_ms': _ms(profile.db_time),
+            'template_ms': _ms(profile.template_time),
+            'mails': profile.mail_count,
+            'mail_ms': _ms(profile.mail_time),
+            'duplicates': profile.duplicates(self.duplicate_threshold),
+        }))
+        return response
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Durée et nombre de requêtes SQL de chaque requête, exceptions non gérées,
+    par nom de vue (voir rides.metrics)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUEST_LATENCY.observe(time.perf_counter() - start, view=view)
+        REQUEST_QUERIES.observe(queries.count, view=view)
+        return response
+
+    def process_exception(self, request, exception):
+        match = request.resolver_match
+        EXCEPTIONS.inc(view=match.view_name if match else 'unresolved', type=type(exception).__name__)
+
+
+class RequestProfilerMiddleware:
+    """
+    Profile avec cProfile une proportion PROFILING_SAMPLE_RATE des requêtes,
+    ainsi que toute requête d'un membre du staff portant l'en-tête
+    PROFILING_HEADER, et écrit ses piles dans PROFILING_DIR (voir
+    rides.profiling et la commande merge_profiles). Placé après
+    AuthenticationMiddleware. Désactivé si PROFILING_DIR est vide.
+    """
+
+    def __init__(self, get_response):
+        self.directory = settings.PROFILING_DIR
+        if not self.directory:
+            raise MiddlewareNotUsed
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.get_response = get_response
+
+    def _requested(self, request):
+        return request.META.get(self.header) and request.user.is_staff
+
+    def __call__(self, request):
+        requested = self._requested(request)
+        if not requested and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        response, profiler = profile_request(self.get_response, request)
+        match = request.resolver_match
+        try:
+            path = write_profile(self.directory, match.view_name if match else 'unresolved', profiler)
+        except OSError as e:
+            # Comme pour les métriques : un répertoire inutilisable ne fait pas échouer la requête
+            profiling_logger.warning('Écriture du profil impossible dans %s : %s', self.directory, e)
+            return response
+        if requested:
+            response[settings.PROFILING_HEADER] = path.name
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0010_paymenttransaction_drivertransaction_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['status', 'departure_date', 'departure_time'], name='ride_status_departure_idx'),
+        ),
+    ]
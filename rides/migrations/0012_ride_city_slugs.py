@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def backfill_city_slugs(apps, schema_editor):
+    Ride = apps.get_model('rides', 'Ride')
+    batch = []
+    for ride in Ride.objects.only('id', 'departure_city', 'arrival_city').iterator(chunk_size=2000):
+        ride.departure_slug = slugify(ride.departure_city or '')
+        ride.arrival_slug = slugify(ride.arrival_city or '')
+        batch.append(ride)
+        if len(batch) >= 2000:
+            Ride.objects.bulk_update(batch, ['departure_slug', 'arrival_slug'])
+            batch = []
+    if batch:
+        Ride.objects.bulk_update(batch, ['departure_slug', 'arrival_slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0011_ride_status_departure_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='arrival_slug',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='departure_slug',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_city_slugs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['departure_slug', 'arrival_slug', 'departure_date'], name='ride_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['arrival_slug', 'departure_date'], name='ride_arrival_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0012_ride_city_slugs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistanceCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_slug', models.CharField(max_length=100)),
+                ('arrival_slug', models.CharField(max_length=100)),
+                ('distance_km', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('provider', models.CharField(max_length=30)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Distance en cache',
+                'verbose_name_plural': 'Distances en cache',
+                'unique_together': {('departure_slug', 'arrival_slug')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Profile = apps.get_model('rides', 'Profile')
+    Rating = apps.get_model('rides', 'Rating')
+    RatingAggregate = apps.get_model('rides', 'RatingAggregate')
+    rows = Rating.objects.values('to_user_id', 'criteria').annotate(total=Sum('rating'), n=Count('id')).order_by()
+    sums = {}
+    aggregates = []
+    for row in rows:
+        total, n = sums.get(row['to_user_id'], (0, 0))
+        sums[row['to_user_id']] = (total + row['total'], n + row['n'])
+        aggregates.append(RatingAggregate(
+            user_id=row['to_user_id'], criteria=row['criteria'], rating_sum=row['total'], count=row['n']
+        ))
+    RatingAggregate.objects.bulk_create(aggregates, batch_size=2000)
+    for user_id, (rating_sum, n) in sums.items():
+        Profile.objects.filter(user_id=user_id).update(rating_sum=rating_sum, number_of_ratings=n, rating=rating_sum / n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0013_distancecache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RatingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criteria', models.CharField(choices=[('general', 'Général'), ('punctuality', 'Ponctualité'), ('comfort', 'Confort'), ('cleanliness', 'Propreté'), ('communication', 'Communication'), ('driving', 'Conduite')], max_length=20)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_aggregates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Moyenne par critère',
+                'verbose_name_plural': 'Moyennes par critère',
+                'unique_together': {('user', 'criteria')},
+            },
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
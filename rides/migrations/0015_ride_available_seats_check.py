@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0014_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ride',
+            constraint=models.CheckConstraint(check=models.Q(('available_seats__gte', 0)), name='ride_available_seats_non_negative'),
+        ),
+    ]
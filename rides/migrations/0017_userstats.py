@@ -0,0 +1,66 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Sum
+
+
+def backfill_user_stats(apps, schema_editor):
+    Booking = apps.get_model('rides', 'Booking')
+    DriverTransaction = apps.get_model('rides', 'DriverTransaction')
+    Rating = apps.get_model('rides', 'Rating')
+    Ride = apps.get_model('rides', 'Ride')
+    UserStats = apps.get_model('rides', 'UserStats')
+    stats = {}
+
+    def row(user_id):
+        return stats.setdefault(user_id, UserStats(user_id=user_id))
+
+    completed = Booking.objects.filter(status='completed').order_by()
+    for values in completed.values('passenger_id').annotate(n=Count('id'), km=Sum('ride__distance_km')):
+        row(values['passenger_id']).passenger_trips = values['n']
+        row(values['passenger_id']).passenger_distance_km = values['km'] or 0
+    for values in completed.values('ride__driver_id').annotate(seats=Sum('number_of_seats')):
+        row(values['ride__driver_id']).passengers_carried = values['seats']
+    driven = Ride.objects.filter(
+        Exists(Booking.objects.filter(ride=OuterRef('pk'), status='completed'))
+    ).order_by().values('driver_id').annotate(n=Count('id'), km=Sum('distance_km'))
+    for values in driven:
+        row(values['driver_id']).driver_trips = values['n']
+        row(values['driver_id']).driver_distance_km = values['km'] or 0
+    for values in DriverTransaction.objects.order_by().values('user_id').annotate(total=Sum('amount')):
+        row(values['user_id']).earnings = values['total']
+    for values in Rating.objects.order_by().values('from_user_id').annotate(n=Count('id')):
+        row(values['from_user_id']).reviews_given = values['n']
+    UserStats.objects.bulk_create(stats.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('rides', '0016_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trip_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('passenger_trips', models.PositiveIntegerField(default=0)),
+                ('passenger_distance_km', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('driver_trips', models.PositiveIntegerField(default=0)),
+                ('driver_distance_km', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('passengers_carried', models.PositiveIntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('reviews_given', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques de trajets',
+                'verbose_name_plural': 'Statistiques de trajets',
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:37
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F, Value
+
+
+def derive_admin_share(apps, schema_editor):
+    # Part de la plateforme ramenée au complément de celle du conducteur, seule appliquée
+    PricingSettings = apps.get_model('rides', 'PricingSettings')
+    PricingSettings.objects.update(admin_profit_percentage=Value(100) - F('driver_profit_percentage'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0017_userstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pricingsettings',
+            name='admin_profit_percentage',
+            field=models.DecimalField(decimal_places=2, default=20.0, help_text="Pourcentage du prix total qui revient à l'administrateur (complément de la part du conducteur)", max_digits=5, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.RunPython(derive_admin_share, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import uuid
 from decimal import Decimal
-from django.core.mail import send_mail
 from django.conf import settings
+from .cities import normalize_city
+from .services import UnknownCity
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -14,6 +15,8 @@ class Profile(models.Model):
     photo = models.ImageField(upload_to='profile_photos/', blank=True)
     rating = models.FloatField(default=5.0)
     number_of_ratings = models.IntegerField(default=0)
+    # Somme des notes reçues : la moyenne est mise à jour sans relire Rating
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -58,7 +61,7 @@ class PricingSettings(models.Model):
         decimal_places=2,
         default=20.00,
         validators=[MinValueValidator(1), MaxValueValidator(100)],
-        help_text="Pourcentage du prix total qui revient à l'administrateur"
+        help_text="Pourcentage du prix total qui revient à l'administrateur (complément de la part du conducteur)"
     )
     min_price = models.DecimalField(
         max_digits=6,
@@ -74,14 +77,31 @@ class PricingSettings(models.Model):
         verbose_name = "Paramètre de tarification"
         verbose_name_plural = "Paramètres de tarification"
 
-    def clean(self):
-        from django.core.exceptions import ValidationError
-        if self.driver_profit_percentage + self.admin_profit_percentage != 100:
-            raise ValidationError("La somme des pourcentages de profit doit être égale à 100%")
+    def save(self, *args, **kwargs):
+        # La plateforme reçoit le reste du prix (voir pricing.split_amount) : sa part
+        # n'est pas saisie mais déduite de celle du conducteur, la somme vaut toujours 100 %
+        self.admin_profit_percentage = Decimal('100') - Decimal(str(self.driver_profit_percentage))
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Tarification ({self.base_price_per_km}€/km)"
 
+class DistanceCache(models.Model):
+    """Distances routières obtenues auprès du fournisseur d'itinéraires"""
+    departure_slug = models.CharField(max_length=100)
+    arrival_slug = models.CharField(max_length=100)
+    distance_km = models.DecimalField(max_digits=8, decimal_places=2)
+    provider = models.CharField(max_length=30)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['departure_slug', 'arrival_slug']
+        verbose_name = "Distance en cache"
+        verbose_name_plural = "Distances en cache"
+
+    def __str__(self):
+        return f"{self.departure_slug} ↔ {self.arrival_slug} : {self.distance_km} km"
+
 class Ride(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Brouillon'),
@@ -96,6 +116,8 @@ class Ride(models.Model):
     vehicle = models.ForeignKey(Vehicle, on_delete=models.SET_NULL, null=True)
     departure_city = models.CharField(max_length=100)
     arrival_city = models.CharField(max_length=100)
+    departure_slug = models.CharField(max_length=100, blank=True, editable=False)
+    arrival_slug = models.CharField(max_length=100, blank=True, editable=False)
     departure_date = models.DateField()
     departure_time = models.TimeField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
@@ -123,27 +145,45 @@ class Ride(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Sert la liste publique : status = ... ORDER BY date, heure (pagination keyset)
+            models.Index(fields=['status', 'departure_date', 'departure_time'], name='ride_status_departure_idx'),
+            # Recherche par ville : égalité ou préfixe sur les noms normalisés
+            models.Index(fields=['departure_slug', 'arrival_slug', 'departure_date'], name='ride_route_idx'),
+            models.Index(fields=['arrival_slug', 'departure_date'], name='ride_arrival_idx'),
+        ]
+        constraints = [
+            # Dernier rempart contre la survente, quel que soit le chemin d'écriture
+            models.CheckConstraint(check=models.Q(available_seats__gte=0), name='ride_available_seats_non_negative'),
+        ]
+
     def calculate_price(self):
         """Calcule le prix du trajet et les profits associés"""
-        if not self.distance_km:
-            return
-
-        # Récupérer les paramètres de tarification actuels
-        pricing = PricingSettings.objects.first()
-        if not pricing:
-            return
-
-        # Calculer le prix total
-        base_price = self.distance_km * pricing.base_price_per_km
-        self.price = max(base_price, pricing.min_price)
+        # Même distance que le formulaire et l'API de devis (cache persistant puis fournisseur)
+        from .pricing import apply_pricing
+        from .routing import road_distance
 
-        # Calculer les profits
-        self.driver_profit = (self.price * pricing.driver_profit_percentage / 100).quantize(Decimal('0.01'))
-        self.admin_profit = (self.price * pricing.admin_profit_percentage / 100).quantize(Decimal('0.01'))
+        if not self.distance_km:
+            try:
+                self.distance_km = road_distance(self.departure_city, self.arrival_city)
+            except UnknownCity:
+                return
+        apply_pricing(self)
 
     def save(self, *args, **kwargs):
-        if self.distance_km and not self.price:
+        if not self.price:
             self.calculate_price()
+        self.departure_slug = normalize_city(self.departure_city)
+        self.arrival_slug = normalize_city(self.arrival_city)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'departure_city' in update_fields:
+                update_fields.add('departure_slug')
+            if 'arrival_city' in update_fields:
+                update_fields.add('arrival_slug')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -209,13 +249,55 @@ class Rating(models.Model):
         return f"Note de {self.from_user.username} pour {self.to_user.username} - {self.get_criteria_display()}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Mettre à jour la note moyenne du profil
-        profile = Profile.objects.get(user=self.to_user)
-        all_ratings = Rating.objects.filter(to_user=self.to_user)
-        profile.rating = all_ratings.aggregate(models.Avg('rating'))['rating__avg']
-        profile.number_of_ratings = all_ratings.count()
-        profile.save()
+        from .ratings import record_rating_change
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                # Ligne verrouillée : deux modifications concurrentes ne partent pas de la même ancienne note
+                previous = Rating.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'to_user_id', 'criteria', 'rating'
+                ).first()
+            super().save(*args, **kwargs)
+            # Mise à jour incrémentale des moyennes du profil et par critère
+            record_rating_change(previous, (self.to_user_id, self.criteria, self.rating))
+
+class RatingAggregate(models.Model):
+    """Somme et nombre des notes reçues par utilisateur et par critère"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rating_aggregates')
+    criteria = models.CharField(max_length=20, choices=Rating.RATING_CRITERIA)
+    rating_sum = models.PositiveIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'criteria']
+        verbose_name = "Moyenne par critère"
+        verbose_name_plural = "Moyennes par critère"
+
+    def __str__(self):
+        return f"{self.user.username} - {self.get_criteria_display()} : {self.average}"
+
+    @property
+    def average(self):
+        return round(self.rating_sum / self.count, 1) if self.count else None
+
+class UserStats(models.Model):
+    """Statistiques de trajets d'un utilisateur, tenues à jour de façon incrémentale"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='trip_stats')
+    passenger_trips = models.PositiveIntegerField(default=0)
+    passenger_distance_km = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    driver_trips = models.PositiveIntegerField(default=0)
+    driver_distance_km = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    passengers_carried = models.PositiveIntegerField(default=0)
+    earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reviews_given = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistiques de trajets"
+        verbose_name_plural = "Statistiques de trajets"
+
+    def __str__(self):
+        return f"Statistiques de {self.user.username}"
 
 class RideRequest(models.Model):
     STATUS_CHOICES = [
@@ -292,9 +374,11 @@ class RideReport(models.Model):
 
     def save(self, *args, **kwargs):
         # Si c'est un nouveau signalement grave, notifier les administrateurs
-        if self.requires_immediate_action and not self.pk:
-            self.notify_admins()
-        super().save(*args, **kwargs)
+        urgent = self.requires_immediate_action and not self.pk
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if urgent:
+                self.notify_admins()
 
     def notify_admins(self):
         # Logique pour notifier les administrateurs
@@ -310,12 +394,45 @@ class RideReport(models.Model):
         Veuillez traiter ce signalement en priorité.
         """
         
+        from .outbox import enqueue_email
+
         admin_emails = [admin[1] for admin in settings.ADMINS]
         if admin_emails:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                admin_emails,
-                fail_silently=True
-            ) 
\ No newline at end of file
+            enqueue_email(subject, message, admin_emails)
+
+class EmailOutbox(models.Model):
+    """
+    Emails à envoyer, enregistrés dans la même transaction que la modification
+    qui les déclenche et expédiés par la commande process_outbox
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sending', 'En cours d\'envoi'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échec définitif'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Réservation par un processus d'envoi : jeton du lot et fin du bail
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Email en attente"
+        verbose_name_plural = "Emails en attente"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.recipients)} ({self.get_status_display()})"
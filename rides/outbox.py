@@ -0,0 +1,150 @@
+"""
+File d'envoi des emails (« outbox ») : les vues n'écrivent qu'une ligne en
+base, dans la transaction de la modification métier ; la commande
+process_outbox expédie ensuite les messages par lots, avec une seule
+connexion SMTP par lot, et réessaie plus tard en cas d'échec.
+"""
+import logging
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+from .metrics import EMAILS
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = 30  # secondes, doublé à chaque nouvel échec
+RETRY_MAX_DELAY = 3600
+LEASE_SECONDS = 300
+
+OutboxResult = namedtuple('OutboxResult', ['sent', 'retried', 'failed'])
+
+
+def enqueue_email(subject, body, recipients, from_email=None, html_body=''):
+    """
+    Ajoute un email à la file d'envoi. À appeler dans la transaction de la
+    modification qui le déclenche : annulée, elle n'enverra rien.
+    """
+    recipients = [address for address in recipients if address]
+    if not recipients:
+        return None
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=recipients,
+    )
+
+
+def retry_delay(attempts):
+    """Délai avant la tentative suivante, après `attempts` échecs"""
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def _due(now):
+    # À envoyer, ou réservé par un processus dont le bail a expiré
+    return Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', locked_until__lt=now)
+
+
+def claim_batch(batch_size=50, lease_seconds=LEASE_SECONDS):
+    """
+    Réserve jusqu'à `batch_size` emails à envoyer. L'UPDATE conditionnel
+    garantit qu'un même email n'est réservé que par un seul processus.
+    """
+    now = timezone.now()
+    ids = list(
+        EmailOutbox.objects.filter(_due(now))
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    EmailOutbox.objects.filter(_due(now), id__in=ids).update(
+        status='sending', claim_token=token, locked_until=now + timedelta(seconds=lease_seconds)
+    )
+    return list(EmailOutbox.objects.filter(claim_token=token, status='sending').order_by('id'))
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, email.recipients, connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _record_failure(email, error):
+    attempts = email.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        updates = {'status': 'failed'}
+        logger.error("Email %s abandonné après %s tentatives : %s", email.pk, attempts, error)
+    else:
+        updates = {'status': 'pending', 'next_attempt_at': timezone.now() + retry_delay(attempts)}
+    EmailOutbox.objects.filter(pk=email.pk, claim_token=email.claim_token).update(
+        attempts=F('attempts') + 1, last_error=str(error)[:1000], claim_token='', locked_until=None, **updates
+    )
+    return updates['status']
+
+
+def _counted(result):
+    EMAILS.inc(result.sent, result='sent')
+    EMAILS.inc(result.retried, result='retried')
+    EMAILS.inc(result.failed, result='failed')
+    return result
+
+
+def deliver_batch(emails):
+    """Envoie un lot réservé sur une seule connexion SMTP"""
+    sent, retried, failed = [], 0, 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Serveur injoignable : tout le lot est reporté
+        logger.warning("Connexion au serveur d'emails impossible : %s", e)
+        for email in emails:
+            if _record_failure(email, e) == 'failed':
+                failed += 1
+            else:
+                retried += 1
+        return _counted(OutboxResult(0, retried, failed))
+
+    try:
+        for email in emails:
+            try:
+                _message(email, connection).send()
+            except Exception as e:
+                if _record_failure(email, e) == 'failed':
+                    failed += 1
+                else:
+                    retried += 1
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    # Même garde que pour les échecs : un email dont le bail a expiré a pu être repris par un autre processus
+    EmailOutbox.objects.filter(pk__in=sent, claim_token=emails[0].claim_token).update(
+        status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1,
+        claim_token='', locked_until=None, last_error=''
+    )
+    return _counted(OutboxResult(len(sent), retried, failed))
+
+
+def process_outbox(batch_size=50, max_batches=None):
+    """Vide la file d'envoi lot par lot ; renvoie un OutboxResult par lot"""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim_batch(batch_size)
+        if not emails:
+            break
+        batches += 1
+        yield deliver_batch(emails)
@@ -0,0 +1,156 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou falsifié"""
+
+
+def encode_cursor(values, direction='next'):
+    """Encode une position (valeurs de tri) en curseur opaque"""
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Décode un curseur opaque en (valeurs, direction)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values, direction = payload['v'], payload['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values, direction
+
+
+class KeysetPage:
+    """Page de résultats obtenue par pagination keyset"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, estimated_count, count_is_exact):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.estimated_count = estimated_count
+        self.count_is_exact = count_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur sur un tri lexicographique (champs préfixés par
+    « - » pour un ordre décroissant, chemins « ride__departure_date »
+    acceptés). Chaque page coûte une seule requête bornée par LIMIT, quelle
+    que soit sa profondeur : pas d'OFFSET ni de COUNT(*) sur toute la table.
+    Avec count_cap=None, aucun comptage n'est fait.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('departure_date', 'departure_time', 'id'), count_cap=1000):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+        self.descending = tuple(name.startswith('-') for name in self.ordering)
+        self.count_cap = count_cap
+
+    def _serialize(self, obj):
+        values = []
+        for name in self.fields:
+            value = obj
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def _field(self, name):
+        opts = self.queryset.model._meta
+        parts = name.split('__')
+        for part in parts[:-1]:
+            opts = opts.get_field(part).related_model._meta
+        return opts.get_field(parts[-1])
+
+    def _deserialize(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        try:
+            return [self._field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor(values)
+
+    def _seek(self, values, after):
+        """Filtre des lignes situées après (ou avant) la position donnée dans l'ordre de tri"""
+        condition = Q()
+        for i, (name, descending) in enumerate(zip(self.fields, self.descending)):
+            lookup = 'lt' if after == descending else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[i]})
+            for previous_name, previous_value in zip(self.fields[:i], values[:i]):
+                branch &= Q(**{previous_name: previous_value})
+            condition |= branch
+        return condition
+
+    def estimate_count(self):
+        """Compte borné : exact jusqu'à count_cap, au-delà simple estimation"""
+        if self.count_cap is None:
+            return None, False
+        count = self.queryset.order_by()[:self.count_cap + 1].count()
+        if count > self.count_cap:
+            return self.count_cap, False
+        return count, True
+
+    def get_page(self, cursor=None):
+        values, direction = None, 'next'
+        if cursor:
+            try:
+                values, direction = decode_cursor(cursor)
+                values = self._deserialize(values)
+            except InvalidCursor:
+                values, direction = None, 'next'
+
+        queryset = self.queryset
+        if direction == 'prev':
+            queryset = queryset.filter(self._seek(values, after=False))
+            queryset = queryset.order_by(*[name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering])
+        else:
+            if values is not None:
+                queryset = queryset.filter(self._seek(values, after=True))
+            queryset = queryset.order_by(*self.ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'prev':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_next:
+                next_cursor = encode_cursor(self._serialize(rows[-1]), 'next')
+            if has_previous:
+                previous_cursor = encode_cursor(self._serialize(rows[0]), 'prev')
+
+        estimated_count, count_is_exact = self.estimate_count()
+        return KeysetPage(rows, next_cursor, previous_cursor, estimated_count, count_is_exact)
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from .models import Booking
+from .pricing import split_amount
 import random
 import string
 
@@ -29,30 +30,38 @@ class PaymentTransaction(models.Model):
 
     def validate_payment(self, code):
         """Valide le paiement avec le code fourni"""
+        from .metrics import TRANSITIONS
+        from .stats import record_booking_completed
+
         if self.validation_code == code:
-            self.status = 'validated'
-            self.save()
-            
-            # Mettre à jour le statut de la réservation
-            self.booking.status = 'completed'
-            self.booking.save()
-            
-            # Calculer la répartition du paiement (80% conducteur, 20% plateforme)
-            driver_amount = self.amount * 0.8
-            platform_amount = self.amount * 0.2
-            
-            # Créer les transactions pour le conducteur et la plateforme
-            DriverTransaction.objects.create(
-                payment=self,
-                user=self.booking.ride.driver,
-                amount=driver_amount
-            )
-            
-            PlatformTransaction.objects.create(
-                payment=self,
-                amount=platform_amount
-            )
+            previous_status = self.status
+            with transaction.atomic():
+                self.status = 'validated'
+                self.save()
+                
+                # Mettre à jour le statut de la réservation
+                self.booking.status = 'completed'
+                self.booking.save()
+                
+                # Calculer la répartition du paiement selon les paramètres de tarification
+                driver_amount, platform_amount = split_amount(self.amount)
+                
+                # Créer les transactions pour le conducteur et la plateforme
+                DriverTransaction.objects.create(
+                    payment=self,
+                    user=self.booking.ride.driver,
+                    amount=driver_amount
+                )
+                
+                PlatformTransaction.objects.create(
+                    payment=self,
+                    amount=platform_amount
+                )
+                
+                # Statistiques du passager et du conducteur
+                record_booking_completed(self.booking, driver_amount)
             
+            TRANSITIONS.inc(kind='payment', from_status=previous_status, to_status='validated')
             return True
         return False
 
@@ -4,8 +4,8 @@ from django.contrib import messages
 from django.http import JsonResponse
 from .models import Booking
 from .payment_models import PaymentTransaction
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
+from .outbox import enqueue_email
 
 @login_required
 def initiate_payment(request, booking_id):
@@ -16,29 +16,29 @@ def initiate_payment(request, booking_id):
         messages.error(request, 'Cette réservation ne peut pas être payée actuellement.')
         return redirect('rides:ride_detail', pk=booking.ride.id)
     
-    # Créer ou récupérer la transaction
-    payment, created = PaymentTransaction.objects.get_or_create(
-        booking=booking,
-        defaults={
-            'amount': booking.ride.price * booking.number_of_seats
-        }
-    )
-    
-    if created or payment.status == 'pending':
-        # Générer un nouveau code de validation
-        validation_code = payment.generate_validation_code()
-        
-        # Envoyer le code par email au passager
-        send_mail(
-            'Code de validation pour votre trajet',
-            f'Votre code de validation pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} est : {validation_code}\n'
-            f'Montant à payer : {payment.amount} DH\n'
-            'Veuillez communiquer ce code au conducteur uniquement après le trajet.',
-            settings.DEFAULT_FROM_EMAIL,
-            [request.user.email],
-            fail_silently=True,
+    with transaction.atomic():
+        # Créer ou récupérer la transaction
+        payment, created = PaymentTransaction.objects.get_or_create(
+            booking=booking,
+            defaults={
+                'amount': booking.ride.price * booking.number_of_seats
+            }
         )
         
+        if created or payment.status == 'pending':
+            # Générer un nouveau code de validation
+            validation_code = payment.generate_validation_code()
+            
+            # Envoyer le code par email au passager
+            enqueue_email(
+                'Code de validation pour votre trajet',
+                f'Votre code de validation pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} est : {validation_code}\n'
+                f'Montant à payer : {payment.amount} DH\n'
+                'Veuillez communiquer ce code au conducteur uniquement après le trajet.',
+                [request.user.email],
+            )
+    
+    if created or payment.status == 'pending':
         messages.success(request, 'Un code de validation vous a été envoyé par email. Veuillez procéder au paiement.')
     
     return render(request, 'rides/payment.html', {
@@ -60,18 +60,19 @@ def validate_payment(request, booking_id):
         code = request.POST.get('validation_code')
         payment = get_object_or_404(PaymentTransaction, booking=booking)
         
-        if payment.validate_payment(code):
+        with transaction.atomic():
+            validated = payment.validate_payment(code)
+            if validated:
+                # Envoyer un email de confirmation au conducteur
+                enqueue_email(
+                    'Paiement validé',
+                    f'Le paiement pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} a été validé.\n'
+                    f'Montant : {payment.drivertransaction.amount} DH',
+                    [booking.ride.driver.email],
+                )
+        
+        if validated:
             messages.success(request, 'Paiement validé avec succès ! L\'argent sera transféré sur votre compte.')
-            
-            # Envoyer un email de confirmation au conducteur
-            send_mail(
-                'Paiement validé',
-                f'Le paiement pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} a été validé.\n'
-                f'Montant : {payment.amount * 0.8} DH (80% du total)',
-                settings.DEFAULT_FROM_EMAIL,
-                [booking.ride.driver.email],
-                fail_silently=True,
-            )
         else:
             messages.error(request, 'Code de validation incorrect.')
         
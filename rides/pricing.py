@@ -0,0 +1,174 @@
+import threading
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .metrics import record_cache
+from .models import PricingSettings, Ride
+from .search_cache import invalidate_all_searches
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+# Clé partagée entre les processus : incrémentée à chaque modification des paramètres
+VERSION_KEY = 'rides:pricing:version'
+
+PriceQuote = namedtuple('PriceQuote', ['distance_km', 'price', 'driver_profit', 'admin_profit'])
+
+_local = {'version': None, 'pricing': None}
+_lock = threading.Lock()
+
+
+def _as_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _load_pricing():
+    # Les paramètres actifs sont les derniers modifiés ; à défaut, les valeurs par défaut du modèle
+    pricing = PricingSettings.objects.order_by('-updated_at', '-pk').first() or PricingSettings()
+    for field in ('base_price_per_km', 'driver_profit_percentage', 'admin_profit_percentage', 'min_price'):
+        setattr(pricing, field, _as_decimal(getattr(pricing, field)))
+    return pricing
+
+
+def _current_version():
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def pricing_version():
+    """Version courante des paramètres de tarification (change à chaque modification)"""
+    return _current_version()
+
+
+def get_pricing_settings():
+    """
+    Paramètres de tarification actifs, conservés en mémoire dans chaque
+    processus. Une seule lecture de cache par appel pour vérifier la version ;
+    la base n'est relue qu'après une modification.
+    """
+    version = _current_version()
+    if _local['version'] != version or _local['pricing'] is None:
+        with _lock:
+            if _local['version'] != version or _local['pricing'] is None:
+                record_cache('pricing', 0, 1)
+                _local['pricing'] = _load_pricing()
+                _local['version'] = version
+                return _local['pricing']
+    record_cache('pricing', 1)
+    return _local['pricing']
+
+
+def invalidate_pricing():
+    """Force tous les processus à relire les paramètres de tarification"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+    _local['pricing'] = None
+
+
+@receiver(post_save, sender=PricingSettings)
+@receiver(post_delete, sender=PricingSettings)
+def pricing_settings_changed(sender, **kwargs):
+    # Après le commit : un autre processus ne doit pas relire l'ancienne ligne sous la nouvelle version
+    transaction.on_commit(invalidate_pricing)
+
+
+def split_amount(amount, pricing=None):
+    """Répartit un montant entre conducteur et plateforme ; la somme est exacte"""
+    pricing = pricing or get_pricing_settings()
+    amount = _as_decimal(amount)
+    driver_share = (amount * pricing.driver_profit_percentage / HUNDRED).quantize(CENT, rounding=ROUND_HALF_UP)
+    return driver_share, amount - driver_share
+
+
+def quote_price(distance_km, pricing=None):
+    """Prix d'un trajet et répartition des profits, en arithmétique décimale exacte"""
+    pricing = pricing or get_pricing_settings()
+    distance_km = _as_decimal(distance_km)
+    price = max(distance_km * pricing.base_price_per_km, pricing.min_price).quantize(CENT, rounding=ROUND_HALF_UP)
+    driver_profit, admin_profit = split_amount(price, pricing)
+    return PriceQuote(distance_km, price, driver_profit, admin_profit)
+
+
+def quote_prices(distances, pricing=None):
+    """
+    Devis d'une liste de distances avec les mêmes paramètres, dans le même
+    ordre (None pour une distance inconnue). Chaque distance distincte n'est
+    tarifée qu'une fois.
+    """
+    pricing = pricing or get_pricing_settings()
+    quotes = {}
+    for distance_km in distances:
+        if distance_km is not None and distance_km not in quotes:
+            quotes[distance_km] = quote_price(distance_km, pricing)
+    return [None if distance_km is None else quotes[distance_km] for distance_km in distances]
+
+
+def apply_pricing(ride, pricing=None):
+    """Renseigne price, driver_profit et admin_profit d'un trajet à partir de sa distance"""
+    quote = quote_price(ride.distance_km, pricing)
+    ride.price = quote.price
+    ride.driver_profit = quote.driver_profit
+    ride.admin_profit = quote.admin_profit
+    return quote
+
+
+RepriceProgress = namedtuple('RepriceProgress', ['last_id', 'scanned', 'updated'])
+
+REPRICEABLE_STATUSES = ('draft', 'confirmed')
+
+# Un seul recalcul à la fois ; le bail couvre un processus arrêté sans libérer le verrou
+REPRICE_LOCK_KEY = 'rides:reprice:running'
+REPRICE_LOCK_TIMEOUT = 6 * 3600
+
+
+def acquire_reprice_lock(owner):
+    """Réserve le recalcul pour `owner` ; faux si un recalcul est déjà en cours"""
+    return cache.add(REPRICE_LOCK_KEY, owner, REPRICE_LOCK_TIMEOUT)
+
+
+def release_reprice_lock():
+    cache.delete(REPRICE_LOCK_KEY)
+
+
+def reprice_rides(start_after=0, chunk_size=1000, pricing=None):
+    """
+    Recalcule le prix des trajets à venir (brouillons et validés) par lots,
+    dans l'ordre des identifiants. Chaque lot est mis à jour par un seul
+    bulk_update dans une transaction courte ; aucun verrou n'est conservé
+    entre deux lots. Produit un RepriceProgress après chaque lot, dont
+    `last_id` permet de reprendre un traitement interrompu.
+    """
+    pricing = pricing or get_pricing_settings()
+    rides = Ride.objects.filter(
+        status__in=REPRICEABLE_STATUSES,
+        departure_date__gte=timezone.now().date(),
+        distance_km__isnull=False,
+    ).only('id', 'distance_km', 'price', 'driver_profit', 'admin_profit', 'updated_at')
+
+    last_id, scanned, updated = start_after, 0, 0
+    while True:
+        batch = list(rides.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not batch:
+            break
+        now = timezone.now()
+        changed = []
+        for ride in batch:
+            quote = quote_price(ride.distance_km, pricing)
+            if (ride.price, ride.driver_profit, ride.admin_profit) != quote[1:]:
+                ride.price, ride.driver_profit, ride.admin_profit = quote[1:]
+                ride.updated_at = now
+                changed.append(ride)
+        if changed:
+            with transaction.atomic():
+                Ride.objects.bulk_update(changed, ['price', 'driver_profit', 'admin_profit', 'updated_at'])
+                invalidate_all_searches()
+        last_id = batch[-1].id
+        scanned += len(batch)
+        updated += len(changed)
+        yield RepriceProgress(last_id, scanned, updated)
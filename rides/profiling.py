@@ -0,0 +1,127 @@
+"""
+Profilage cProfile de requêtes échantillonnées. Le profil d'une requête est
+converti en piles repliées (format « collapsed » de flamegraph.pl : une
+ligne `f1;f2;f3 microsecondes` par pile) et écrit dans un fichier par
+requête, sous un sous-répertoire par nom de vue. cProfile ne conserve que
+les arcs appelant → appelé : les piles sont reconstruites en répartissant
+le temps de chaque fonction entre ses appelants au prorata (comme flameprof).
+"""
+import cProfile
+import heapq
+import os
+import pstats
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from django.utils import timezone
+
+MAX_DEPTH = 80
+# Nombre de nœuds développés par profil : borne le temps de conversion
+MAX_NODES = 5000
+# Occurrences d'une même fonction sur une pile (récursion, chaîne des middlewares)
+MAX_RECURSION = 20
+# En deçà (secondes), une branche n'est plus explorée : borne la taille du fichier
+MIN_TIME = 1e-6
+
+
+def _profiled_request(get_response, request):
+    # Racine connue des piles : la chaîne des middlewares est récursive
+    # (inner → __call__ → inner), aucune de ses fonctions n'est sans appelant
+    return get_response(request)
+
+
+_ROOT = (_profiled_request.__code__.co_filename, _profiled_request.__code__.co_firstlineno, _profiled_request.__name__)
+
+
+def profile_request(get_response, request):
+    """Traite la requête sous cProfile ; renvoie (réponse, profileur)"""
+    profiler = cProfile.Profile()
+    response = profiler.runcall(_profiled_request, get_response, request)
+    return response, profiler
+
+
+def _frame(func):
+    filename, lineno, name = func
+    if filename == '~':
+        # Fonction native : '<built-in method time.sleep>'
+        return name
+    return f'{Path(filename).name}:{lineno}({name})'.replace(';', ',').replace(' ', '_')
+
+
+def collapsed_stacks(stats):
+    """
+    Piles reconstruites d'un pstats.Stats : {pile: microsecondes de temps
+    propre}. Les branches les plus coûteuses sont développées d'abord, dans
+    la limite de MAX_NODES ; une branche non développée est comptée en bloc
+    sur sa dernière fonction.
+    """
+    entries = stats.stats
+    callees = defaultdict(list)
+    for func, (cc, nc, tt, ct, callers) in entries.items():
+        for caller, (edge_cc, edge_nc, edge_tt, edge_ct) in callers.items():
+            callees[caller].append((func, edge_ct))
+
+    stacks = Counter()
+    pending = []
+    for func, (cc, nc, tt, ct, callers) in entries.items():
+        if func == _ROOT or not callers:
+            pending.append((-ct, len(pending), func, _frame(func), (func,)))
+    heapq.heapify(pending)
+    expanded = 0
+    while pending:
+        total, _, func, path, on_path = heapq.heappop(pending)
+        total = -total
+        if expanded >= MAX_NODES or len(on_path) >= MAX_DEPTH:
+            stacks[path] += total
+            continue
+        expanded += 1
+        cc, nc, tt, ct, callers = entries[func]
+        # Part du temps cumulé de la fonction qui passe par ce chemin
+        scale = min(total / ct, 1) if ct else 0
+        stacks[path] += tt * scale
+        for callee, edge_ct in callees[func]:
+            share = edge_ct * scale
+            if share >= MIN_TIME and on_path.count(callee) < MAX_RECURSION:
+                heapq.heappush(pending, (-share, expanded, callee, f'{path};{_frame(callee)}', on_path + (callee,)))
+    return {stack: round(seconds * 1e6) for stack, seconds in stacks.items() if round(seconds * 1e6)}
+
+
+def view_directory(directory, view_name):
+    # 'rides:my_rides' -> 'rides.my_rides'
+    return Path(directory) / view_name.replace(':', '.').replace('/', '_')
+
+
+def write_profile(directory, view_name, profiler):
+    """Écrit le profil d'une requête ; renvoie le chemin du fichier"""
+    stacks = collapsed_stacks(pstats.Stats(profiler))
+    target = view_directory(directory, view_name)
+    target.mkdir(parents=True, exist_ok=True)
+    path = target / f'{timezone.now():%Y%m%d-%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:6]}.folded'
+    path.write_text(''.join(f'{stack} {value}\n' for stack, value in stacks.items()))
+    return path
+
+
+def read_stacks(paths):
+    """Additionne les piles de plusieurs fichiers repliés"""
+    stacks = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, value = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    stacks[stack] += int(value)
+    return stacks
+
+
+def hot_functions(stacks):
+    """
+    Temps propre et cumulé de chaque fonction : [(fonction, propre, cumulé)],
+    en microsecondes, du plus grand temps propre au plus petit.
+    """
+    own, cumulative = Counter(), Counter()
+    for stack, value in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += value
+        for frame in set(frames):
+            cumulative[frame] += value
+    return [(frame, value, cumulative[frame]) for frame, value in own.most_common()]
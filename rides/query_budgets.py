@@ -0,0 +1,44 @@
+"""
+Budget de requêtes SQL par vue (nom complet « namespace:nom » de l'URL) :
+nombre maximal de requêtes pour servir la page, cache froid, quel que soit
+le volume de données. Vérifié par les tests (rides.tests.budgets) et relevé
+par l'instrumentation des requêtes.
+
+Toutes les vues de rides.urls ont un budget, sauf :
+- rides:dashboard, dont le gabarit rides/dashboard.html n'existe pas (la page
+  échoue quel que soit l'utilisateur) ;
+- rides:metrics, qui ne lit aucune donnée des modèles.
+"""
+
+QUERY_BUDGETS = {
+    'rides:ride_list': 4,
+    'rides:ride_search': 8,
+    'rides:ride_detail': 7,
+    'rides:ride_create': 6,
+    'rides:ride_edit': 8,
+    'rides:ride_delete': 7,
+    'rides:my_rides': 8,
+    'rides:profile': 9,
+    'rides:booking_action': 9,
+    'rides:report_ride': 7,
+    'rides:my_reports': 7,
+    'rides:vehicle_list': 6,
+    'rides:vehicle_create': 5,
+    'rides:vehicle_edit': 7,
+    'rides:vehicle_delete': 7,
+    'rides:booking_request': 8,
+    'rides:request_action': 9,
+    'rides:ride_validate': 5,
+    'rides:rate_ride': 3,
+    'rides:initiate_payment': 14,
+    'rides:validate_payment': 24,
+    'rides:verify_email': 4,
+    'rides:get_cities': 2,
+    'rides:calculate_price': 3,
+    'rides:calculate_prices': 3,
+}
+
+
+def query_budget(view_name):
+    """Budget de la vue, None si elle n'en a pas"""
+    return QUERY_BUDGETS.get(view_name)
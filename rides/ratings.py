@@ -0,0 +1,103 @@
+"""
+Moyennes des évaluations tenues à jour de façon incrémentale : chaque note
+ajoute ou retire sa valeur par une mise à jour atomique (F()), sans relire
+l'ensemble des évaluations reçues.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Profile, Rating, RatingAggregate
+
+DEFAULT_RATING = 5.0
+
+
+def _update_or_create(model, lookup, **updates):
+    # UPDATE d'abord : la ligne existe presque toujours ; sinon création, en
+    # tolérant qu'un autre processus l'ait créée entre-temps
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup)
+    except IntegrityError:
+        pass
+    model.objects.filter(**lookup).update(**updates)
+
+
+def _apply_delta(user_id, criteria, score_delta, count_delta):
+    # `rating` est assignée en premier : MySQL évalue les affectations de
+    # gauche à droite, les autres bases à partir des valeurs d'origine
+    _update_or_create(
+        Profile, {'user_id': user_id},
+        rating=Coalesce(
+            Cast(F('rating_sum') + score_delta, FloatField()) / NullIf(F('number_of_ratings') + count_delta, 0),
+            Value(DEFAULT_RATING),
+        ),
+        rating_sum=F('rating_sum') + score_delta,
+        number_of_ratings=F('number_of_ratings') + count_delta,
+    )
+    _update_or_create(
+        RatingAggregate, {'user_id': user_id, 'criteria': criteria},
+        rating_sum=F('rating_sum') + score_delta,
+        count=F('count') + count_delta,
+    )
+
+
+def record_rating_change(previous, current):
+    """
+    Reporte l'ajout, la modification ou la suppression d'une note sur les
+    agrégats. `previous` et `current` sont des tuples (to_user_id, criteria,
+    rating), ou None.
+    """
+    if previous == current:
+        return
+    if previous is not None:
+        _apply_delta(previous[0], previous[1], -previous[2], -1)
+    if current is not None:
+        _apply_delta(current[0], current[1], current[2], 1)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    record_rating_change((instance.to_user_id, instance.criteria, instance.rating), None)
+
+
+def rebuild_rating_aggregates(batch_size=1000):
+    """
+    Recalcule tous les agrégats à partir de Rating en quelques requêtes
+    groupées. Renvoie le nombre de profils et de lignes par critère écrits.
+    """
+    per_criteria = list(
+        Rating.objects.values('to_user_id', 'criteria')
+        .annotate(total=Sum('rating'), n=Count('id'))
+        .order_by()
+    )
+    totals = {}
+    for row in per_criteria:
+        user_total, user_count = totals.get(row['to_user_id'], (0, 0))
+        totals[row['to_user_id']] = (user_total + row['total'], user_count + row['n'])
+
+    with transaction.atomic():
+        RatingAggregate.objects.all().delete()
+        RatingAggregate.objects.bulk_create([
+            RatingAggregate(user_id=row['to_user_id'], criteria=row['criteria'], rating_sum=row['total'], count=row['n'])
+            for row in per_criteria
+        ], batch_size=batch_size)
+
+        existing = set(Profile.objects.values_list('user_id', flat=True))
+        Profile.objects.bulk_create(
+            [Profile(user_id=user_id) for user_id in totals.keys() - existing], batch_size=batch_size
+        )
+
+        changed = []
+        fields = ['rating', 'rating_sum', 'number_of_ratings']
+        for profile in Profile.objects.only('id', 'user_id', *fields).iterator(chunk_size=batch_size):
+            rating_sum, count = totals.get(profile.user_id, (0, 0))
+            rating = rating_sum / count if count else DEFAULT_RATING
+            if (profile.rating, profile.rating_sum, profile.number_of_ratings) != (rating, rating_sum, count):
+                profile.rating, profile.rating_sum, profile.number_of_ratings = rating, rating_sum, count
+                changed.append(profile)
+        Profile.objects.bulk_update(changed, fields, batch_size=batch_size)
+    return len(changed), len(per_criteria)
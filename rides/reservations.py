@@ -0,0 +1,75 @@
+"""
+Réservation de places sans survente : chaque décrément est un UPDATE
+conditionnel exécuté par la base, jamais une soustraction faite en Python
+sur une valeur lue auparavant.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Booking, Ride, RideRequest
+from .metrics import TRANSITIONS
+from .search_cache import invalidate_ride
+
+CONFIRMED = 'confirmed'
+NO_SEATS = 'no_seats'
+ALREADY_PROCESSED = 'already_processed'
+
+
+def reserve_seats(ride_id, seats):
+    """
+    Retire `seats` places au trajet si elles sont encore disponibles.
+    Renvoie False, sans rien modifier, s'il n'en reste pas assez.
+    """
+    reserved = Ride.objects.filter(pk=ride_id, available_seats__gte=seats).update(
+        available_seats=F('available_seats') - seats,
+        updated_at=timezone.now(),
+    ) == 1
+    if reserved:
+        invalidate_ride(ride_id)
+    return reserved
+
+
+def _accept(model, instance, seats, accepted_status):
+    with transaction.atomic():
+        # Prise de la demande : un seul appel concurrent la fait passer à l'état accepté
+        claimed = model.objects.filter(pk=instance.pk, status='pending').update(
+            status=accepted_status, updated_at=timezone.now()
+        )
+        if not claimed:
+            return ALREADY_PROCESSED
+        if not reserve_seats(instance.ride_id, seats):
+            transaction.set_rollback(True)
+            return NO_SEATS
+    instance.status = accepted_status
+    TRANSITIONS.inc(kind=model._meta.model_name, from_status='pending', to_status=accepted_status)
+    return CONFIRMED
+
+
+def _reject(model, instance):
+    rejected = model.objects.filter(pk=instance.pk, status='pending').update(
+        status='rejected', updated_at=timezone.now()
+    )
+    if rejected:
+        instance.status = 'rejected'
+        TRANSITIONS.inc(kind=model._meta.model_name, from_status='pending', to_status='rejected')
+    return bool(rejected)
+
+
+def confirm_booking(booking):
+    """Confirme une réservation en attente ; CONFIRMED, NO_SEATS ou ALREADY_PROCESSED"""
+    return _accept(Booking, booking, booking.number_of_seats, 'confirmed')
+
+
+def accept_ride_request(ride_request):
+    """Accepte une demande de trajet en attente ; CONFIRMED, NO_SEATS ou ALREADY_PROCESSED"""
+    return _accept(RideRequest, ride_request, ride_request.number_of_seats, 'accepted')
+
+
+def reject_booking(booking):
+    """Refuse une réservation si elle est toujours en attente"""
+    return _reject(Booking, booking)
+
+
+def reject_ride_request(ride_request):
+    """Refuse une demande de trajet si elle est toujours en attente"""
+    return _reject(RideRequest, ride_request)
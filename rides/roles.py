@@ -0,0 +1,122 @@
+"""
+Rôle (conducteur / passager) et permissions d'un utilisateur, résolus une
+fois par requête et conservés dans le cache partagé. La clé inclut une
+version par utilisateur et une version globale, incrémentées lorsque les
+groupes ou les permissions changent (m2m_changed) et lorsqu'un groupe est
+renommé ou supprimé.
+"""
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .metrics import record_cache
+
+DRIVER_GROUP = 'Conducteurs'
+PASSENGER_GROUP = 'Passagers'
+
+GLOBAL_VERSION_KEY = 'rides:roles:version'
+ROLES_TIMEOUT = 24 * 3600
+
+
+class UserRoles:
+    """Groupes et permissions (« app_label.codename ») d'un utilisateur"""
+
+    __slots__ = ('groups', 'permissions')
+
+    def __init__(self, groups=(), permissions=()):
+        self.groups = frozenset(groups)
+        self.permissions = frozenset(permissions)
+
+    @property
+    def is_driver(self):
+        return DRIVER_GROUP in self.groups
+
+    @property
+    def is_passenger(self):
+        return PASSENGER_GROUP in self.groups
+
+    def has_perm(self, perm):
+        return perm in self.permissions
+
+
+ANONYMOUS_ROLES = UserRoles()
+
+
+def _user_version_key(user_id):
+    return f'rides:roles:version:{user_id}'
+
+
+def _load_roles(user):
+    groups = list(user.groups.values_list('name', flat=True))
+    # Mêmes permissions que ModelBackend : celles de l'utilisateur et de ses groupes
+    user_perms = user.user_permissions.values_list('content_type__app_label', 'codename')
+    group_perms = Group.permissions.through.objects.filter(
+        group__user=user
+    ).values_list('permission__content_type__app_label', 'permission__codename')
+    return UserRoles(groups, {f'{app_label}.{codename}' for app_label, codename in [*user_perms, *group_perms]})
+
+
+def get_user_roles(user):
+    """
+    Rôles d'un utilisateur : mémorisés sur l'objet pour la requête en cours,
+    lus dans le cache sinon, et calculés en base seulement après un changement.
+    """
+    if not user.is_authenticated:
+        return ANONYMOUS_ROLES
+    roles = getattr(user, '_rides_roles', None)
+    if roles is not None:
+        return roles
+
+    user_key = _user_version_key(user.pk)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    key = f'rides:roles:{user.pk}:{versions.get(GLOBAL_VERSION_KEY, 0)}:{versions.get(user_key, 0)}'
+    roles = cache.get(key)
+    if roles is None:
+        record_cache('roles', 0, 1)
+        roles = _load_roles(user)
+        cache.set(key, roles, ROLES_TIMEOUT)
+    else:
+        record_cache('roles', 1)
+    user._rides_roles = roles
+    return roles
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_user_roles(user_ids):
+    for user_id in user_ids:
+        _bump(_user_version_key(user_id))
+
+
+def invalidate_all_roles():
+    _bump(GLOBAL_VERSION_KEY)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set is not None:
+        user_ids = list(pk_set)
+    else:
+        # clear() depuis le groupe ou la permission : utilisateurs inconnus
+        transaction.on_commit(invalidate_all_roles)
+        return
+    transaction.on_commit(lambda: invalidate_user_roles(user_ids))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_permissions_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        transaction.on_commit(invalidate_all_roles)
@@ -0,0 +1,231 @@
+import logging
+import threading
+from decimal import Decimal
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
+from .cities import normalize_city
+from .models import DistanceCache
+from .services import calculate_distance, city_name, resolve_city, UnknownCity
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingError(Exception):
+    """Le fournisseur d'itinéraires n'a pas pu répondre"""
+
+
+class RoutingBackend:
+    """Interface d'un fournisseur de distances routières"""
+
+    name = 'base'
+    # Les réponses méritent-elles d'être conservées dans DistanceCache ?
+    persistent = True
+
+    def road_distance(self, departure_city, arrival_city):
+        """Distance routière en km (Decimal), ou None si la route est inconnue"""
+        raise NotImplementedError
+
+
+class StaticRoutingBackend(RoutingBackend):
+    """Tables et matrice locales (aucun appel réseau)"""
+
+    name = 'static'
+    persistent = False
+
+    def road_distance(self, departure_city, arrival_city):
+        return calculate_distance(departure_city, arrival_city)
+
+
+class HTTPRoutingBackend(RoutingBackend):
+    """
+    Fournisseur HTTP compatible avec l'API Google Distance Matrix. Une seule
+    session par processus : les connexions keep-alive sont réutilisées.
+    """
+
+    name = 'http'
+
+    def __init__(self, url=None, api_key=None, timeout=None, pool_size=10):
+        self.url = url or settings.ROUTING_URL
+        self.api_key = api_key if api_key is not None else settings.GOOGLE_MAPS_API_KEY
+        self.timeout = timeout or settings.ROUTING_TIMEOUT
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def road_distance(self, departure_city, arrival_city):
+        params = {
+            'origins': f'{departure_city}, Maroc',
+            'destinations': f'{arrival_city}, Maroc',
+            'units': 'metric',
+            'key': self.api_key,
+        }
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RoutingError(str(e))
+
+        if payload.get('status') != 'OK':
+            raise RoutingError(payload.get('status', 'UNKNOWN_ERROR'))
+        try:
+            element = payload['rows'][0]['elements'][0]
+        except (KeyError, IndexError):
+            raise RoutingError('Réponse inattendue du fournisseur')
+        if element.get('status') != 'OK':
+            return None
+        meters = element['distance']['value']
+        return (Decimal(meters) / 1000).quantize(Decimal('0.01'))
+
+
+class SingleFlight:
+    """
+    Regroupe les appels concurrents portant sur la même clé : le premier
+    appelant exécute la fonction, les suivants attendent son résultat.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_flights = SingleFlight()
+
+def get_routing_backend():
+    """Fournisseur configuré par ROUTING_BACKEND (instancié une fois par processus)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.ROUTING_BACKEND)()
+    return _backend
+
+
+def reset_routing_backend():
+    global _backend
+    _backend = None
+
+
+def _canonical_slug(name):
+    try:
+        return normalize_city(city_name(resolve_city(name)))
+    except UnknownCity:
+        return normalize_city(name)
+
+
+def _route_key(departure_city, arrival_city):
+    # Les distances sont symétriques : une seule entrée par paire de villes
+    return tuple(sorted((_canonical_slug(departure_city), _canonical_slug(arrival_city))))
+
+
+def _fetch_and_store(departure_city, arrival_city, key):
+    backend = get_routing_backend()
+    try:
+        km = backend.road_distance(departure_city, arrival_city)
+    except RoutingError as e:
+        logger.warning("Fournisseur d'itinéraires indisponible (%s → %s) : %s", departure_city, arrival_city, e)
+        return None
+    if km is None:
+        return None
+    try:
+        with transaction.atomic():
+            DistanceCache.objects.create(
+                departure_slug=key[0],
+                arrival_slug=key[1],
+                distance_km=km,
+                provider=backend.name,
+            )
+    except IntegrityError:
+        # Un autre processus a enregistré la même paire entre-temps
+        pass
+    return km
+
+
+def road_distance(departure_city, arrival_city):
+    """
+    Distance routière entre deux villes : cache persistant, puis fournisseur
+    configuré (un seul appel sortant par paire même sous forte concurrence),
+    puis tables locales en dernier recours. Lève UnknownCity comme
+    calculate_distance si aucune source ne connaît la ville.
+    """
+    backend = get_routing_backend()
+    if not backend.persistent:
+        return backend.road_distance(departure_city, arrival_city)
+
+    key = _route_key(departure_city, arrival_city)
+    if key[0] == key[1]:
+        return Decimal('0')
+    cached = DistanceCache.objects.filter(
+        departure_slug=key[0], arrival_slug=key[1]
+    ).values_list('distance_km', flat=True).first()
+    if cached is not None:
+        return cached
+
+    km = _flights.do(key, lambda: _fetch_and_store(departure_city, arrival_city, key))
+    if km is not None:
+        return km
+    return calculate_distance(departure_city, arrival_city)
+
+
+def road_distances(pairs):
+    """
+    Distances routières d'une liste de paires, dans le même ordre (None pour
+    une ville inconnue). Les paires déjà en cache sont lues en une seule
+    requête ; seules les paires distinctes manquantes passent par road_distance.
+    """
+    pairs = list(pairs)
+    keys = [_route_key(departure_city, arrival_city) for departure_city, arrival_city in pairs]
+    known = {}
+    if get_routing_backend().persistent:
+        wanted = {key for key in keys if key[0] != key[1]}
+        if wanted:
+            rows = DistanceCache.objects.filter(
+                departure_slug__in={key[0] for key in wanted},
+                arrival_slug__in={key[1] for key in wanted},
+            ).values_list('departure_slug', 'arrival_slug', 'distance_km')
+            known = {(departure, arrival): km for departure, arrival, km in rows if (departure, arrival) in wanted}
+
+    distances = []
+    for (departure_city, arrival_city), key in zip(pairs, keys):
+        if key not in known:
+            try:
+                known[key] = road_distance(departure_city, arrival_city)
+            except UnknownCity:
+                known[key] = None
+        distances.append(known[key])
+    return distances
@@ -0,0 +1,82 @@
+"""
+Serveur local imitant l'API Google Distance Matrix, pour développer et
+tester HTTPRoutingBackend sans accès réseau. Les distances viennent des
+tables locales (calculate_distance).
+"""
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .services import calculate_distance, UnknownCity
+
+
+def _city(value):
+    # "Rabat, Maroc" -> "Rabat"
+    return value.rsplit(',', 1)[0].strip()
+
+
+class RoutingStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.delay:
+            time.sleep(server.delay)
+
+        query = parse_qs(urlparse(self.path).query)
+        origin = _city(query.get('origins', [''])[0])
+        destination = _city(query.get('destinations', [''])[0])
+        try:
+            km = calculate_distance(origin, destination)
+            element = {
+                'status': 'OK',
+                'distance': {'text': f'{km} km', 'value': int(km * Decimal(1000))},
+            }
+        except UnknownCity:
+            element = {'status': 'NOT_FOUND'}
+
+        body = json.dumps({
+            'status': 'OK',
+            'origin_addresses': [origin],
+            'destination_addresses': [destination],
+            'rows': [{'elements': [element]}],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RoutingStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, verbose=False):
+        super().__init__((host, port), RoutingStubHandler)
+        self.delay = delay
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/maps/api/distancematrix/json'
+
+    def start(self):
+        """Démarre le serveur dans un thread (pour les tests)"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
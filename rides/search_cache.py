@@ -0,0 +1,113 @@
+"""
+Cache des résultats de recherche de trajets. La clé contient les paramètres
+normalisés, le curseur et les versions dont dépend la recherche : version de
+l'itinéraire (départ → arrivée), de la ville de départ ou d'arrivée seule,
+ou version « toutes villes » pour les recherches larges. Toute modification
+d'un trajet incrémente les versions de son itinéraire ; les entrées
+périmées ne sont simplement plus lues.
+"""
+import hashlib
+import json
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .metrics import record_cache
+from .models import Ride
+
+# Durée de vie maximale : la fraîcheur vient des versions, ce délai borne seulement la mémoire
+SEARCH_TIMEOUT = 3600
+
+# Incrémentée par les traitements en masse (recalcul des prix…) : invalide toutes les recherches
+EPOCH_KEY = 'rides:search:v:epoch'
+ALL_KEY = 'rides:search:v:all'
+
+
+def _route_keys(departure_slug, arrival_slug):
+    return [
+        f'rides:search:v:route:{departure_slug}:{arrival_slug}',
+        f'rides:search:v:from:{departure_slug}',
+        f'rides:search:v:to:{arrival_slug}',
+        ALL_KEY,
+    ]
+
+
+def _dependency_key(departure_slug, arrival_slug):
+    """Version dont dépend une recherche (villes connues, None pour une ville libre ou absente)"""
+    if departure_slug and arrival_slug:
+        return f'rides:search:v:route:{departure_slug}:{arrival_slug}'
+    if departure_slug:
+        return f'rides:search:v:from:{departure_slug}'
+    if arrival_slug:
+        return f'rides:search:v:to:{arrival_slug}'
+    return ALL_KEY
+
+
+def cached_search(params, departure_slug, arrival_slug, compute):
+    """
+    Résultat de compute() pour une recherche, servi depuis le cache tant
+    qu'aucun trajet de l'itinéraire concerné n'a changé. `departure_slug` et
+    `arrival_slug` sont les villes connues filtrées exactement (None sinon).
+    """
+    dependency = _dependency_key(departure_slug, arrival_slug)
+    versions = cache.get_many([EPOCH_KEY, dependency])
+    # La date du jour fait partie de la clé : les trajets passés disparaissent à minuit
+    payload = json.dumps(
+        [params, timezone.localdate().isoformat(), versions.get(EPOCH_KEY, 0), versions.get(dependency, 0)],
+        sort_keys=True, default=str,
+    )
+    key = f'rides:search:{hashlib.sha256(payload.encode()).hexdigest()}'
+    result = cache.get(key)
+    if result is None:
+        record_cache('search', 0, 1)
+        result = compute()
+        cache.set(key, result, SEARCH_TIMEOUT)
+    else:
+        record_cache('search', 1)
+    return result
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def invalidate_route(departure_slug, arrival_slug):
+    """Périme les recherches pouvant contenir un trajet de cet itinéraire (après le commit)"""
+    keys = _route_keys(departure_slug, arrival_slug)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_ride(ride_id):
+    """Comme invalidate_route, pour un trajet modifié par un UPDATE en masse"""
+    def bump():
+        route = Ride.objects.filter(pk=ride_id).values_list('departure_slug', 'arrival_slug').first()
+        if route:
+            _bump(_route_keys(*route))
+    transaction.on_commit(bump)
+
+
+def invalidate_all_searches():
+    transaction.on_commit(lambda: _bump([EPOCH_KEY]))
+
+
+@receiver(post_init, sender=Ride)
+def remember_route(sender, instance, **kwargs):
+    # Itinéraire d'origine, pour périmer aussi l'ancien itinéraire d'un trajet modifié
+    # (lecture directe : ne charge pas un champ différé)
+    values = instance.__dict__
+    instance._search_route = (values.get('departure_slug'), values.get('arrival_slug'))
+
+
+@receiver(post_save, sender=Ride)
+@receiver(post_delete, sender=Ride)
+def ride_changed(sender, instance, **kwargs):
+    routes = {instance._search_route, (instance.departure_slug, instance.arrival_slug)}
+    for departure_slug, arrival_slug in routes:
+        if departure_slug is not None:
+            invalidate_route(departure_slug, arrival_slug)
+    instance._search_route = (instance.departure_slug, instance.arrival_slug)
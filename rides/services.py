@@ -1,46 +1,152 @@
 from decimal import Decimal
+from functools import lru_cache
+from math import asin, cos, radians, sin, sqrt
+from django.conf import settings
+from . import cities
+from .cities import CITY_REGISTRY, normalize_city
+from .graph import CityGraph
+from .matrix import DistanceMatrix
 
-# Distances prédéfinies entre les principales villes marocaines (en km)
-DISTANCES = {
-    ('rabat', 'casablanca'): 87,
-    ('casablanca', 'rabat'): 87,
-    ('rabat', 'fes'): 207,
-    ('fes', 'rabat'): 207,
-    ('rabat', 'tanger'): 250,
-    ('tanger', 'rabat'): 250,
-    ('casablanca', 'marrakech'): 238,
-    ('marrakech', 'casablanca'): 238,
-    ('casablanca', 'agadir'): 460,
-    ('agadir', 'casablanca'): 460,
-    ('casablanca', 'tanger'): 337,
-    ('tanger', 'casablanca'): 337,
-    ('marrakech', 'agadir'): 256,
-    ('agadir', 'marrakech'): 256,
-    ('fes', 'meknes'): 65,
-    ('meknes', 'fes'): 65,
-    ('rabat', 'meknes'): 148,
-    ('meknes', 'rabat'): 148,
-    ('casablanca', 'el jadida'): 96,
-    ('el jadida', 'casablanca'): 96,
-}
+# Rayon terrestre moyen (km)
+EARTH_RADIUS_KM = 6371.0
 
-def calculate_distance(departure_city, arrival_city):
-    """Calcule la distance entre deux villes marocaines"""
-    try:
-        # Normaliser les noms des villes (minuscules)
-        departure = departure_city.lower().strip()
-        arrival = arrival_city.lower().strip()
-        
-        # Chercher la distance dans le dictionnaire
-        distance = DISTANCES.get((departure, arrival))
-        
-        if distance is not None:
-            return Decimal(str(distance))
-        
-        # Si la distance n'est pas trouvée, retourner None
-        print(f"Distance non trouvée pour : {departure} → {arrival}")
+# Une route est en moyenne ~30 % plus longue que la distance à vol d'oiseau
+ROAD_DETOUR_FACTOR = Decimal('1.3')
+
+
+class UnknownCity(ValueError):
+    """Ville absente du registre canonique"""
+
+
+# Nom normalisé ou variante -> identifiant de ville
+_CITY_IDS = {}
+for _city_id, (_name, _lat, _lon, _aliases) in enumerate(CITY_REGISTRY):
+    for _variant in (_name, *_aliases):
+        _CITY_IDS[normalize_city(_variant)] = _city_id
+
+
+@lru_cache(maxsize=4096)
+def resolve_city(name):
+    """Identifiant canonique d'une ville (accents, casse et variantes tolérés)"""
+    city_id = _CITY_IDS.get(normalize_city(name))
+    if city_id is None:
+        raise UnknownCity(name)
+    return city_id
+
+
+def city_name(city_id):
+    return CITY_REGISTRY[city_id][0]
+
+
+_graph = None
+
+def city_graph():
+    """
+    Graphe des plus courts chemins, calculé au démarrage puis recalculé
+    automatiquement si CITY_DISTANCES a été modifiée.
+    """
+    global _graph
+    graph = _graph
+    if graph is None or not graph.is_current(cities.CITY_DISTANCES):
+        graph = _graph = CityGraph(cities.MOROCCAN_CITIES, cities.CITY_DISTANCES, key=normalize_city)
+    return graph
+
+
+_matrix = None
+_matrix_loaded = False
+
+def distance_matrix():
+    """
+    Matrice compilée des localités (mmap), ou None si elle n'a pas été
+    générée. Chargée une seule fois par processus.
+    """
+    global _matrix, _matrix_loaded
+    if not _matrix_loaded:
+        path = getattr(settings, 'DISTANCE_MATRIX_PATH', None)
+        try:
+            _matrix = DistanceMatrix(path) if path else None
+        except (OSError, ValueError):
+            _matrix = None
+        _matrix_loaded = True
+    return _matrix
+
+
+def reset_distance_matrix():
+    """Oublie la matrice chargée (après recompilation ou changement de réglage)"""
+    global _matrix, _matrix_loaded
+    if _matrix is not None:
+        _matrix.close()
+    _matrix, _matrix_loaded = None, False
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def _road_estimate(km):
+    return (Decimal(str(km)) * ROAD_DETOUR_FACTOR).quantize(Decimal('1'))
+
+
+def haversine_km(city1_id, city2_id):
+    """Distance à vol d'oiseau entre deux villes du registre"""
+    _, lat1, lon1, _ = CITY_REGISTRY[city1_id]
+    _, lat2, lon2, _ = CITY_REGISTRY[city2_id]
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def _matrix_distance(departure_city, arrival_city):
+    matrix = distance_matrix()
+    if matrix is None:
         return None
-        
-    except Exception as e:
-        print(f"Erreur lors du calcul de la distance : {str(e)}")
-        return None 
\ No newline at end of file
+    i, j = matrix.locality_id(departure_city), matrix.locality_id(arrival_city)
+    if i is None or j is None:
+        return None
+    km = matrix.distance_between(i, j)
+    if km is not None:
+        return Decimal(str(round(km, 2)))
+    return _road_estimate(_haversine(*matrix.coordinates(i), *matrix.coordinates(j)))
+
+
+def calculate_distance(departure_city, arrival_city):
+    """
+    Calcule la distance routière (en km) entre deux localités marocaines.
+    Utilise la matrice compilée si elle couvre les deux localités, sinon le
+    plus court chemin du réseau routier connu, ou à défaut la distance à vol
+    d'oiseau majorée. Lève UnknownCity pour une localité inconnue.
+    """
+    km = _matrix_distance(departure_city, arrival_city)
+    if km is not None:
+        return km
+    i, j = resolve_city(departure_city), resolve_city(arrival_city)
+    km = city_graph().distance_between(i, j)
+    if km is not None:
+        return Decimal(str(km))
+    return _road_estimate(haversine_km(i, j))
+
+
+def calculate_distances(pairs):
+    """
+    Distances d'une liste de paires (départ, arrivée), dans le même ordre.
+    Chaque paire distincte n'est calculée qu'une fois ; None pour une
+    localité inconnue au lieu de lever UnknownCity.
+    """
+    known = {}
+    distances = []
+    for departure_city, arrival_city in pairs:
+        key = (normalize_city(departure_city), normalize_city(arrival_city))
+        if key not in known:
+            try:
+                known[key] = calculate_distance(departure_city, arrival_city)
+            except UnknownCity:
+                known[key] = None
+        distances.append(known[key])
+    return distances
+
+
+def get_route(departure_city, arrival_city):
+    """Villes traversées par le plus court chemin connu, ou None"""
+    i, j = resolve_city(departure_city), resolve_city(arrival_city)
+    return city_graph().route_between(i, j)
@@ -0,0 +1,95 @@
+"""
+Serveur SMTP local qui conserve les messages reçus en mémoire, pour
+développer et tester process_outbox sans serveur d'emails réel.
+"""
+import socketserver
+import threading
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connection_count += 1
+        self.reply('220 smtp-sink ESMTP')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                mail_from, recipients = command.split(':', 1)[1].strip(' <>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if address in server.reject:
+                    self.reply('550 Boîte inconnue')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 Fin des données par <CRLF>.<CRLF>')
+                data = []
+                for raw in self.rfile:
+                    if raw in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(raw[1:] if raw.startswith(b'..') else raw)
+                message = b''.join(data)
+                with server.lock:
+                    server.messages.append((mail_from, recipients, message))
+                    if server.stdout:
+                        server.stdout.write(
+                            f"--- {mail_from} → {', '.join(recipients)}\n{message.decode('utf-8', 'replace')}"
+                        )
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Au revoir')
+                return
+            else:
+                self.reply('502 Commande non prise en charge')
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, reject=(), stdout=None):
+        super().__init__((host, port), SMTPSinkHandler)
+        # Flux où afficher chaque message reçu (stdout de la commande smtp_sink)
+        self.stdout = stdout
+        self.lock = threading.Lock()
+        # Adresses refusées (550), pour simuler des échecs d'envoi
+        self.reject = set(reject)
+        self.messages = []
+        self.connection_count = 0
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Démarre le serveur dans un thread (pour les tests)"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
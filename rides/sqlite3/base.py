@@ -0,0 +1,27 @@
+"""
+Moteur SQLite de Django, avec l'option transaction_mode de Django 5.1 :
+OPTIONS = {'transaction_mode': 'IMMEDIATE'} ouvre les blocs atomic() par
+BEGIN IMMEDIATE. Le verrou d'écriture est alors pris dès le début de la
+transaction, en attendant busy_timeout ; avec BEGIN (DEFERRED), une lecture
+suivie d'une écriture (get_or_create, confirm_booking…) échoue aussitôt en
+« database is locked » si un autre écrivain est passé entre les deux.
+À retirer au passage à Django 5.1 (ENGINE django.db.backends.sqlite3).
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Option du moteur, inconnue de sqlite3.connect()
+        mode = (kwargs.pop('transaction_mode', None) or 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'transaction_mode doit être parmi {", ".join(TRANSACTION_MODES)}')
+        self.transaction_mode = mode
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
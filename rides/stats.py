@@ -0,0 +1,96 @@
+"""
+Statistiques de trajets par utilisateur (UserStats), mises à jour par
+incréments atomiques lorsqu'une réservation est terminée ou qu'une
+évaluation est donnée, et reconstructibles en bloc.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Booking, Rating, Ride, UserStats
+from .payment_models import DriverTransaction
+
+
+def _increment(user_id, **deltas):
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    updates['updated_at'] = timezone.now()
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(user_id=user_id)
+    except IntegrityError:
+        # Créée entre-temps par un autre processus
+        pass
+    UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def record_booking_completed(booking, earnings):
+    """
+    Reporte une réservation terminée sur les statistiques du passager et du
+    conducteur. Le trajet n'est compté (avec sa distance) qu'à sa première
+    réservation terminée. À appeler dans la transaction qui termine la réservation.
+    """
+    with transaction.atomic():
+        # Verrou sur le trajet : deux réservations terminées en même temps ne le comptent qu'une fois
+        driver_id, distance = Ride.objects.select_for_update().filter(
+            pk=booking.ride_id
+        ).values_list('driver_id', 'distance_km').get()
+        distance = distance or 0
+        first_completion = not Booking.objects.filter(
+            ride_id=booking.ride_id, status='completed'
+        ).exclude(pk=booking.pk).exists()
+
+        _increment(booking.passenger_id, passenger_trips=1, passenger_distance_km=distance)
+        driver_deltas = {'passengers_carried': booking.number_of_seats, 'earnings': earnings}
+        if first_completion:
+            driver_deltas.update(driver_trips=1, driver_distance_km=distance)
+        _increment(driver_id, **driver_deltas)
+
+
+@receiver(post_save, sender=Rating)
+def rating_given(sender, instance, created, **kwargs):
+    if created:
+        _increment(instance.from_user_id, reviews_given=1)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_removed(sender, instance, **kwargs):
+    UserStats.objects.filter(user_id=instance.from_user_id, reviews_given__gt=0).update(
+        reviews_given=F('reviews_given') - 1
+    )
+
+
+def rebuild_user_stats(batch_size=1000):
+    """Recalcule toutes les statistiques en quelques requêtes groupées ; renvoie le nombre de lignes"""
+    stats = {}
+
+    def row(user_id):
+        if user_id not in stats:
+            stats[user_id] = UserStats(user_id=user_id)
+        return stats[user_id]
+
+    completed = Booking.objects.filter(status='completed').order_by()
+    for values in completed.values('passenger_id').annotate(n=Count('id'), km=Sum('ride__distance_km')):
+        user_stats = row(values['passenger_id'])
+        user_stats.passenger_trips, user_stats.passenger_distance_km = values['n'], values['km'] or 0
+    for values in completed.values('ride__driver_id').annotate(seats=Sum('number_of_seats')):
+        row(values['ride__driver_id']).passengers_carried = values['seats']
+
+    driven = Ride.objects.filter(
+        Exists(Booking.objects.filter(ride=OuterRef('pk'), status='completed'))
+    ).order_by().values('driver_id').annotate(n=Count('id'), km=Sum('distance_km'))
+    for values in driven:
+        user_stats = row(values['driver_id'])
+        user_stats.driver_trips, user_stats.driver_distance_km = values['n'], values['km'] or 0
+
+    for values in DriverTransaction.objects.order_by().values('user_id').annotate(total=Sum('amount')):
+        row(values['user_id']).earnings = values['total']
+    for values in Rating.objects.order_by().values('from_user_id').annotate(n=Count('id')):
+        row(values['from_user_id']).reviews_given = values['n']
+
+    with transaction.atomic():
+        UserStats.objects.all().delete()
+        UserStats.objects.bulk_create(stats.values(), batch_size=batch_size)
+    return len(stats)
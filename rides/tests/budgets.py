@@ -0,0 +1,38 @@
+"""
+Aide aux tests de budget de requêtes (rides.query_budgets) : une vue est
+mesurée sur deux volumes de données et doit rester dans son budget avec le
+même nombre de requêtes, c'est-à-dire en O(1) requêtes.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..query_budgets import QUERY_BUDGETS
+
+
+class QueryBudgetMixin:
+    # Le grand volume dépasse une page (RIDES_PER_PAGE, MY_RIDES_PER_PAGE)
+    small_size = 2
+    large_size = 25
+
+    def count_queries(self, request):
+        """Requêtes SQL d'un appel à `request`, cache vidé"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        return [query['sql'] for query in context.captured_queries]
+
+    def assertQueryBudget(self, view_name, request, grow):
+        """
+        Vérifie le budget de `view_name` avant et après l'ajout de données ;
+        grow(count) ajoute `count` éléments de chaque sorte affichée par la vue.
+        """
+        budget = QUERY_BUDGETS[view_name]
+        grow(self.small_size)
+        small = self.count_queries(request)
+        grow(self.large_size - self.small_size)
+        large = self.count_queries(request)
+        details = '\n'.join(large)
+        self.assertLessEqual(len(small), budget, f'{view_name} : {len(small)} requêtes pour un budget de {budget}')
+        self.assertLessEqual(len(large), budget, f'{view_name} : {len(large)} requêtes pour un budget de {budget}\n{details}')
+        self.assertEqual(len(small), len(large), f'{view_name} : le nombre de requêtes croît avec les données\n{details}')
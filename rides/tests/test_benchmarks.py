@@ -0,0 +1,45 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from ..benchmarks import SCENARIOS, run_benchmarks
+from ..dataset import generate_dataset
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        list(generate_dataset(users=20, rides=150, seed=3, chunk_size=100, prefix='bench-'))
+
+    def test_every_view_measured(self):
+        """Test que chaque scénario produit percentiles, requêtes et pic mémoire"""
+        results = {result.view: result for result in run_benchmarks(iterations=3, warmup=0)}
+        self.assertEqual(set(results), set(SCENARIOS))
+        for result in results.values():
+            self.assertLessEqual(result.p50_ms, result.p99_ms)
+            self.assertGreater(result.queries, 0)
+            self.assertGreater(result.peak_kb, 0)
+
+class CompareBenchmarksTests(TestCase):
+    def write(self, directory, name, p50, queries):
+        path = Path(directory) / name
+        path.write_text(json.dumps({
+            'meta': {'rides': 1000},
+            'results': {'ride_list': {'p50_ms': p50, 'p90_ms': p50 * 2, 'peak_kb': 100, 'queries': queries}},
+        }))
+        return str(path)
+
+    def test_regression_detected(self):
+        """Test que la comparaison échoue au-delà du seuil ou si le nombre de requêtes augmente"""
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = self.write(directory, 'baseline.json', 10.0, 4)
+            call_command('compare_benchmarks', baseline, self.write(directory, 'ok.json', 11.0, 4),
+                         threshold=0.2, stdout=io.StringIO())
+            with self.assertRaisesMessage(CommandError, 'ride_list p50_ms'):
+                call_command('compare_benchmarks', baseline, self.write(directory, 'slow.json', 13.0, 4),
+                             threshold=0.2, stdout=io.StringIO())
+            with self.assertRaisesMessage(CommandError, 'ride_list queries 4 → 5'):
+                call_command('compare_benchmarks', baseline, self.write(directory, 'n1.json', 10.0, 5),
+                             threshold=0.2, stdout=io.StringIO())
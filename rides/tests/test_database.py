@@ -0,0 +1,34 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from ..contention import run_contention
+from ..database import sqlite_pragmas
+from ..sqlite3.base import DatabaseWrapper
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied(self):
+        """Test que chaque connexion SQLite reçoit les réglages configurés"""
+        connection.ensure_connection()
+        raw = connection.connection
+        self.assertEqual(raw.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(raw.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(raw.execute('PRAGMA busy_timeout').fetchone()[0], 20000)
+        with override_settings(SQLITE_BUSY_TIMEOUT=0.5, SQLITE_MMAP_SIZE=0):
+            self.assertIn(('busy_timeout', 500), sqlite_pragmas())
+
+    def test_transaction_mode(self):
+        """Test l'option transaction_mode du moteur"""
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'OPTIONS': {'transaction_mode': 'lazy'}})
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.get_connection_params()
+
+class ConcurrentWritersTests(TransactionTestCase):
+    # Les groupes créés par migration sont restaurés après le vidage de la base
+    serialized_rollback = True
+
+    def test_no_lock_errors(self):
+        """Test que des écrivains concurrents ne perdent aucune écriture avec les réglages configurés"""
+        result = run_contention(threads=4, operations=5)
+        self.assertEqual(result.operations, 20)
+        self.assertEqual(result.errors, 0)
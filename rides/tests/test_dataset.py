@@ -0,0 +1,60 @@
+import io
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from ..dataset import generate_dataset
+from ..models import Booking, Profile, Rating, RatingAggregate, Ride
+from ..payment_models import DriverTransaction, PaymentTransaction
+
+User = get_user_model()
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, prefix, seed=7):
+        list(generate_dataset(users=30, rides=200, seed=seed, chunk_size=40, prefix=prefix))
+        users = User.objects.filter(username__startswith=prefix)
+        rides = Ride.objects.filter(driver__username__startswith=prefix).order_by('pk')
+        return users, rides
+
+    def test_dataset_is_consistent(self):
+        """Test les volumes et la cohérence des tables dépendantes"""
+        users, rides = self.generate('a-')
+        self.assertEqual(users.count(), 30)
+        self.assertEqual(rides.count(), 200)
+        self.assertFalse(rides.filter(departure_slug='').exists())
+        self.assertFalse(rides.filter(price__isnull=True).exists())
+
+        completed = Booking.objects.filter(status='completed')
+        self.assertGreater(completed.count(), 0)
+        self.assertEqual(PaymentTransaction.objects.count(), completed.count())
+        self.assertEqual(DriverTransaction.objects.count(), completed.count())
+        self.assertFalse(Booking.objects.filter(ride__status='draft').exists())
+        self.assertEqual(Rating.objects.values('criteria').distinct().count(), len(Rating.RATING_CRITERIA))
+
+        # Agrégats recalculés après l'insertion en masse
+        driver = Rating.objects.values_list('to_user', flat=True).first()
+        self.assertEqual(Profile.objects.get(user=driver).number_of_ratings, Rating.objects.filter(to_user=driver).count())
+        self.assertTrue(RatingAggregate.objects.exists())
+
+    def test_same_seed_same_data(self):
+        """Test qu'une même graine produit les mêmes trajets"""
+        fields = ('departure_city', 'arrival_city', 'departure_date', 'departure_time', 'status', 'price')
+        _, first = self.generate('a-')
+        _, second = self.generate('b-')
+        _, other = self.generate('c-', seed=8)
+        self.assertEqual(list(first.values_list(*fields)), list(second.values_list(*fields)))
+        self.assertNotEqual(list(first.values_list(*fields)), list(other.values_list(*fields)))
+
+    def test_command_refuses_existing_prefix(self):
+        """Test la commande et le refus d'un préfixe déjà utilisé"""
+        out = io.StringIO()
+        call_command('generate_dataset', users=10, rides=20, prefix='cmd-', stdout=out)
+        self.assertIn('trajets : 20/20', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', users=10, rides=20, prefix='cmd-', stdout=out)
+
+    def test_create_test_data(self):
+        """Test que la commande de données de démonstration crée ses trajets"""
+        call_command('create_test_data', stdout=io.StringIO())
+        self.assertEqual(Ride.objects.filter(driver__username='conducteur_test').count(), 3)
+        self.assertFalse(Ride.objects.filter(price__isnull=True).exists())
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .. import fragments
+from ..models import Profile, Rating, Ride
+
+User = get_user_model()
+
+class RideCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.driver = User.objects.create_user(username='driver', password='driverpass123', first_name='Karim')
+        self.other = User.objects.create_user(username='other', password='otherpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.create(user=self.driver)
+            tomorrow = timezone.now().date() + timedelta(days=1)
+            self.rides = [
+                Ride.objects.create(
+                    driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+                    departure_date=tomorrow, departure_time='10:00',
+                    price=50, available_seats=3, status='confirmed'
+                )
+                for driver in (self.driver, self.other)
+            ]
+
+    def render_cards(self):
+        render = mock.patch.object(fragments, 'render_to_string', wraps=fragments.render_to_string)
+        with render as rendered:
+            cards = fragments.ride_cards(self.rides)
+        return cards, rendered.call_count
+
+    def test_cards_cached(self):
+        """Test que les cartes déjà rendues sont lues sans requête ni rendu"""
+        cards, rendered = self.render_cards()
+        self.assertEqual(rendered, 2)
+        self.assertIn('Karim', cards[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render_cards(), (cards, 0))
+
+    def test_only_changed_cards_rendered(self):
+        """Test qu'une modification du trajet ou du conducteur ne rend que les cartes concernées"""
+        self.render_cards()
+        self.rides[1].available_seats = 2
+        self.rides[1].save()
+        cards, rendered = self.render_cards()
+        self.assertEqual(rendered, 1)
+        self.assertIn('2 places', cards[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(from_user=self.other, to_user=self.driver, ride=self.rides[0], rating=3, criteria='punctuality')
+        cards, rendered = self.render_cards()
+        self.assertEqual(rendered, 1)
+        self.assertIn('3,0', cards[0])
+
+    def test_login_keeps_cards(self):
+        """Test que la connexion du conducteur (last_login) ne périme pas ses cartes"""
+        self.render_cards()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(username='driver', password='driverpass123')
+        self.assertEqual(self.render_cards()[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.driver.first_name = 'Karima'
+            self.driver.save(update_fields=['first_name', 'last_login'])
+        cards, rendered = self.render_cards()
+        self.assertEqual(rendered, 1)
+        self.assertIn('Karima', cards[0])
+
+    def test_ride_list_uses_cards(self):
+        """Test que la liste publique affiche les cartes en cache"""
+        response = self.client.get(reverse('rides:ride_list'))
+        self.assertContains(response, 'Karim')
+        self.assertEqual(len(response.context['cards']), 2)
@@ -0,0 +1,57 @@
+import json
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..instrumentation import RequestProfile
+from ..models import Ride
+
+User = get_user_model()
+
+class RequestProfileTests(TestCase):
+    def test_duplicate_queries_flagged(self):
+        """Test qu'une même requête répétée avec des valeurs différentes est signalée"""
+        users = [User.objects.create_user(username=f'user{i}') for i in range(3)]
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            for user in users:
+                User.objects.filter(pk=user.pk).exists()
+            Ride.objects.count()
+        self.assertEqual(profile.query_count, 4)
+        duplicates = profile.duplicates(3)
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0]['count'], 3)
+        self.assertIn('auth_user', duplicates[0]['sql'])
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+class RequestInstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        driver = User.objects.create_user(username='driver', password='driverpass123')
+        Ride.objects.create(
+            driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=timezone.now().date() + timedelta(days=1), departure_time='10:00',
+            price=50, available_seats=3, status='confirmed'
+        )
+
+    def test_request_logged_as_json(self):
+        """Test qu'une requête mesurée produit une ligne JSON par nom de vue"""
+        with self.assertLogs('rides.instrumentation') as logs:
+            self.client.get(reverse('rides:ride_list'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'rides:ride_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['query_budget'], 4)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['db_ms'])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_disabled_by_default(self):
+        """Test qu'aucune mesure n'est écrite lorsque l'échantillonnage est nul"""
+        with self.assertNoLogs('rides.instrumentation'):
+            self.client.get(reverse('rides:ride_list'))
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, TestCase
+from django.urls import resolve, reverse
+from ..loadtest import parse_mix, run_load, seed_load_data
+from ..models import Booking
+
+class LoadScenarioTests(LiveServerTestCase):
+    # Les groupes créés par migration sont restaurés après le vidage de la base
+    serialized_rollback = True
+
+    def test_purchase_funnel_under_contention(self):
+        """Test le tunnel complet joué par plusieurs passagers sur des trajets à une place"""
+        data = seed_load_data(drivers=2, passengers=4, rides=4, seats=1)
+        report = run_load(self.live_server_url, data, workers=4, duration=60, iterations=3, mix={'purchase': 1}, seed=1)
+
+        self.assertEqual(report.scenarios, 12)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(report.exceptions, {})
+        self.assertEqual((report.oversold, report.inconsistent), ([], []))
+        self.assertEqual(
+            [step.step for step in report.steps],
+            ['search', 'ride_detail', 'booking_request', 'booking_action', 'initiate_payment', 'validate_payment'],
+        )
+        self.assertGreater(report.outcomes['paid'], 0)
+        self.assertEqual(Booking.objects.filter(status='completed').count(), report.outcomes['paid'])
+
+class LoadHelpersTests(TestCase):
+    def test_parse_mix(self):
+        """Test la lecture du mélange de scénarios"""
+        self.assertEqual(parse_mix('browse=4, purchase'), {'browse': 4.0, 'purchase': 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix('checkout=1')
+        with self.assertRaises(ValueError):
+            parse_mix('browse=0')
+
+    def test_payment_urls_reachable(self):
+        """Test que les URL du paiement ne sont pas masquées par celle de booking_action"""
+        self.assertEqual(resolve(reverse('rides:initiate_payment', args=[1])).view_name, 'rides:initiate_payment')
+        self.assertEqual(resolve(reverse('rides:validate_payment', args=[1])).view_name, 'rides:validate_payment')
+
+    def test_remote_server_requires_shared_database(self):
+        """Test que --url est refusé sans --shared-database, avant toute création de données"""
+        users = get_user_model().objects.count()
+        with self.assertRaisesMessage(CommandError, '--shared-database'):
+            call_command('load_test', url='http://127.0.0.1:1', iterations=1)
+        self.assertEqual(get_user_model().objects.count(), users)
@@ -0,0 +1,94 @@
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from ..metrics import EMAILS, _store, collect
+from ..middleware import MetricsMiddleware
+from ..models import Booking, Ride
+from ..reservations import confirm_booking, reject_booking
+
+User = get_user_model()
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(METRICS_DIR=directory.name, METRICS_ALLOWED_IPS=['127.0.0.1'])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def counter(self, name, *labels):
+        counters, _ = collect()
+        return counters.get((name, labels), 0)
+
+    def test_metrics_summed_across_processes(self):
+        """Test que /metrics additionne les fichiers des autres processus"""
+        before = self.counter('rides_emails_total', 'sent')
+        (self.directory / 'other-worker.json').write_text(json.dumps({
+            'counters': [['rides_emails_total', ['sent'], 5]],
+            'histograms': [['rides_request_queries', ['other:view'], [0, 1, 0, 0, 0, 0, 0, 0, 0, 2, 1]]],
+        }))
+        self.assertEqual(self.counter('rides_emails_total', 'sent'), before + 5)
+
+        response = self.client.get(reverse('rides:metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE rides_request_duration_seconds histogram', body)
+        self.assertIn('rides_request_queries_bucket{view="other:view",le="2"} 1', body)
+        self.assertIn('rides_request_queries_count{view="other:view"} 1', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='scraper-token')
+    def test_metrics_access_restricted(self):
+        """Test que /metrics est réservé aux adresses autorisées, au jeton du collecteur et au staff"""
+        url = reverse('rides:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scraper-token').status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+        User.objects.create_user(username='staff', password='staffpass123', is_staff=True)
+        self.client.login(username='staff', password='staffpass123')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_flush_errors_do_not_propagate(self):
+        """Test qu'un répertoire de métriques inutilisable ne fait pas échouer les requêtes métier"""
+        blocker = self.directory / 'not-a-directory'
+        blocker.write_text('')
+        with override_settings(METRICS_DIR=str(blocker)), self.assertLogs('rides.metrics', 'WARNING'):
+            _store.flush()
+            EMAILS.inc(result='sent')
+
+    def test_request_and_transition_metrics(self):
+        """Test les histogrammes par vue et les compteurs de changements d'état"""
+        driver = User.objects.create_user(username='driver', password='driverpass123')
+        passenger = User.objects.create_user(username='passenger', password='passengerpass123')
+        ride = Ride.objects.create(
+            driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=timezone.now().date() + timedelta(days=1), departure_time='10:00',
+            price=50, available_seats=3, status='confirmed'
+        )
+        confirmed = self.counter('rides_state_transitions_total', 'booking', 'pending', 'confirmed')
+        rejected = self.counter('rides_state_transitions_total', 'booking', 'pending', 'rejected')
+        confirm_booking(Booking.objects.create(passenger=passenger, ride=ride, number_of_seats=1))
+        reject_booking(Booking.objects.create(passenger=driver, ride=ride, number_of_seats=1))
+        self.assertEqual(self.counter('rides_state_transitions_total', 'booking', 'pending', 'confirmed'), confirmed + 1)
+        self.assertEqual(self.counter('rides_state_transitions_total', 'booking', 'pending', 'rejected'), rejected + 1)
+
+        self.client.get(reverse('rides:ride_list'))
+        _, histograms = collect()
+        self.assertGreaterEqual(histograms[('rides_request_duration_seconds', ('rides:ride_list',))][-1], 1)
+        self.assertGreater(self.counter('rides_cache_requests_total', 'search', 'miss'), 0)
+
+    def test_unhandled_exceptions_counted(self):
+        """Test le comptage par vue et par type des exceptions non gérées"""
+        request = RequestFactory().get(reverse('rides:ride_list'))
+        request.resolver_match = resolve(request.path)
+        before = self.counter('rides_exceptions_total', 'rides:ride_list', 'IntegrityError')
+        MetricsMiddleware(lambda request: None).process_exception(request, IntegrityError())
+        self.assertEqual(self.counter('rides_exceptions_total', 'rides:ride_list', 'IntegrityError'), before + 1)
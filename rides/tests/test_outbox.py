@@ -0,0 +1,109 @@
+import io
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Booking, EmailOutbox, Ride
+from ..outbox import MAX_ATTEMPTS, claim_batch, deliver_batch, enqueue_email, process_outbox
+from ..smtp_sink import SMTPSinkServer
+
+User = get_user_model()
+
+class SMTPSinkMixin:
+    def setUp(self):
+        super().setUp()
+        self.sink = SMTPSinkServer(reject={'bounce@example.com'}).start()
+        self.addCleanup(self.sink.stop)
+        self.use_smtp(self.sink.port)
+
+    def use_smtp(self, port):
+        settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=port, EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_TIMEOUT=2,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+class EmailOutboxTests(SMTPSinkMixin, TestCase):
+    def test_batch_uses_one_connection(self):
+        """Test l'envoi d'un lot sur une seule connexion SMTP et le report d'un échec"""
+        for address in ('a@example.com', 'bounce@example.com', 'b@example.com'):
+            enqueue_email('Sujet', 'Corps', [address])
+        results = list(process_outbox(batch_size=10))
+
+        self.assertEqual([tuple(result) for result in results], [(2, 1, 0)])
+        self.assertEqual(self.sink.connection_count, 1)
+        self.assertEqual([recipients for _, recipients, _ in self.sink.messages], [['a@example.com'], ['b@example.com']])
+        bounced = EmailOutbox.objects.get(recipients=['bounce@example.com'])
+        self.assertEqual((bounced.status, bounced.attempts), ('pending', 1))
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        """Test l'abandon d'un email après le nombre maximal de tentatives"""
+        email = enqueue_email('Sujet', 'Corps', ['bounce@example.com'])
+        EmailOutbox.objects.filter(pk=email.pk).update(attempts=MAX_ATTEMPTS - 1)
+        self.assertEqual(tuple(next(process_outbox())), (0, 0, 1))
+        self.assertEqual(EmailOutbox.objects.get().status, 'failed')
+
+    def test_unreachable_server(self):
+        """Test que tout le lot est reporté si le serveur est injoignable"""
+        self.sink.stop()
+        enqueue_email('Sujet', 'Corps', ['a@example.com'])
+        self.assertEqual(tuple(next(process_outbox())), (0, 1, 0))
+        self.assertEqual(EmailOutbox.objects.get().status, 'pending')
+
+    def test_claim_is_exclusive(self):
+        """Test qu'un email réservé ne l'est pas une seconde fois avant la fin du bail"""
+        enqueue_email('Sujet', 'Corps', ['a@example.com'])
+        self.assertEqual(len(claim_batch()), 1)
+        self.assertEqual(claim_batch(), [])
+        EmailOutbox.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_batch()), 1)
+
+    def test_expired_claim_does_not_overwrite_new_owner(self):
+        """Test qu'un processus dont le bail a expiré ne marque pas envoyé un email repris par un autre"""
+        enqueue_email('Sujet', 'Corps', ['a@example.com'])
+        stale = claim_batch(lease_seconds=-1)
+        fresh = claim_batch()
+        self.assertEqual(tuple(deliver_batch(stale)), (1, 0, 0))
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.claim_token), ('sending', fresh[0].claim_token))
+
+    def test_sink_writes_to_given_stream(self):
+        """Test que le serveur SMTP local affiche les messages reçus sur le flux fourni"""
+        out = io.StringIO()
+        self.sink.stdout = out
+        enqueue_email('Sujet', 'Corps', ['a@example.com'])
+        list(process_outbox())
+        self.assertIn('→ a@example.com', out.getvalue())
+
+class TransactionalEnqueueTests(TestCase):
+    def test_rolled_back_with_business_change(self):
+        """Test qu'un email n'est pas enregistré si la transaction est annulée"""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue_email('Sujet', 'Corps', ['a@example.com'])
+                raise RuntimeError
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_booking_confirmation_is_queued(self):
+        """Test que la confirmation d'une réservation n'envoie rien pendant la requête"""
+        driver = User.objects.create_user(username='driver', password='driverpass123')
+        passenger = User.objects.create_user(username='passenger', email='p@example.com', password='passengerpass123')
+        ride = Ride.objects.create(
+            driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=timezone.now().date() + timedelta(days=1), departure_time='10:00',
+            price=50, available_seats=3, status='confirmed'
+        )
+        booking = Booking.objects.create(passenger=passenger, ride=ride, number_of_seats=1)
+        self.client.login(username='driver', password='driverpass123')
+        self.client.get(reverse('rides:booking_action', args=[booking.pk, 'confirm']))
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.subject, email.recipients), ('Réservation confirmée', ['p@example.com']))
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta, time
+from ..models import Ride
+from ..pagination import KeysetPaginator, encode_cursor, decode_cursor, InvalidCursor
+
+User = get_user_model()
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(username='driver', password='driverpass123')
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        # Plusieurs trajets à la même date/heure pour vérifier le départage par id
+        for i in range(25):
+            Ride.objects.create(
+                driver=self.driver,
+                departure_city='Casablanca',
+                arrival_city='Rabat',
+                departure_date=tomorrow + timedelta(days=i // 10),
+                departure_time=time(8 + i % 3, 0),
+                price=50,
+                available_seats=3,
+                status='confirmed'
+            )
+        self.queryset = Ride.objects.filter(status='confirmed')
+        self.expected = list(self.queryset.order_by('departure_date', 'departure_time', 'id'))
+
+    def test_forward_and_backward_traversal(self):
+        """Test que le parcours par curseurs couvre tous les trajets dans l'ordre"""
+        paginator = KeysetPaginator(self.queryset, 10)
+        page = paginator.get_page()
+        seen = list(page)
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(page)
+            pages.append(page)
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Test qu'un curseur invalide renvoie la première page"""
+        paginator = KeysetPaginator(self.queryset, 10)
+        page = paginator.get_page('not-a-cursor')
+        self.assertEqual(list(page), self.expected[:10])
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+        self.assertEqual(decode_cursor(encode_cursor([1, 'a'], 'prev')), ([1, 'a'], 'prev'))
+
+    def test_count_is_capped(self):
+        """Test que le comptage reste borné au-delà du plafond"""
+        page = KeysetPaginator(self.queryset, 10, count_cap=20).get_page()
+        self.assertEqual(page.estimated_count, 20)
+        self.assertFalse(page.count_is_exact)
+
+    def test_deep_page_query_count(self):
+        """Test qu'une page profonde coûte autant de requêtes que la première"""
+        paginator = KeysetPaginator(self.queryset, 10)
+        last = paginator.get_page(encode_cursor(paginator._serialize(self.expected[19])))
+        with self.assertNumQueries(2):
+            paginator.get_page(last.previous_cursor)
+
+    def test_ride_list_cursor_links(self):
+        """Test que la liste publique expose des liens par curseur"""
+        response = self.client.get(reverse('rides:ride_list'), {'departure': 'Casa'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['rides']), 10)
+        self.assertIn('cursor=', response.context['next_url'])
+        self.assertIn('departure=Casa', response.context['next_url'])
+        self.assertIsNone(response.context['previous_url'])
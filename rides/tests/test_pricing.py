@@ -0,0 +1,169 @@
+import io
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import PricingSettings, Ride
+from ..pricing import (
+    acquire_reprice_lock, get_pricing_settings, invalidate_pricing, quote_price, release_reprice_lock, reprice_rides,
+    split_amount,
+)
+
+User = get_user_model()
+
+class PricingEngineTests(TestCase):
+    def setUp(self):
+        invalidate_pricing()
+        self.addCleanup(invalidate_pricing)
+
+    def test_defaults_without_settings(self):
+        """Test les valeurs par défaut du modèle en l'absence de paramètres"""
+        quote = quote_price(Decimal('87'))
+        self.assertEqual(quote.price, Decimal('43.50'))
+        self.assertEqual(quote.driver_profit, Decimal('34.80'))
+        self.assertEqual(quote.admin_profit, Decimal('8.70'))
+
+    def test_exact_split_and_minimum(self):
+        """Test le prix minimum et une répartition dont la somme est exacte"""
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingSettings.objects.create(
+                base_price_per_km=Decimal('0.33'),
+                driver_profit_percentage=Decimal('66.67'),
+                admin_profit_percentage=Decimal('33.33'),
+                min_price=Decimal('20.00'),
+            )
+        quote = quote_price(Decimal('101'))
+        self.assertEqual(quote.price, Decimal('33.33'))
+        self.assertEqual(quote.driver_profit + quote.admin_profit, quote.price)
+        self.assertEqual(quote_price(10).price, Decimal('20.00'))
+        self.assertEqual(sum(split_amount(Decimal('99.99'))), Decimal('99.99'))
+
+    def test_admin_share_is_derived(self):
+        """Test que la part de la plateforme est le complément de celle du conducteur, sans saisie possible"""
+        pricing = PricingSettings.objects.create(
+            base_price_per_km=Decimal('1.00'), driver_profit_percentage=Decimal('70'), admin_profit_percentage=Decimal('20'),
+        )
+        self.assertEqual(PricingSettings.objects.get(pk=pricing.pk).admin_profit_percentage, Decimal('30'))
+
+        User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('admin:rides_pricingsettings_change', args=[pricing.pk]))
+        self.assertNotIn('admin_profit_percentage', response.context['adminform'].form.fields)
+
+    def test_cached_until_settings_change(self):
+        """Test que les paramètres sont servis sans requête jusqu'à leur modification"""
+        with self.captureOnCommitCallbacks(execute=True):
+            pricing = PricingSettings.objects.create(base_price_per_km=Decimal('1.00'))
+        get_pricing_settings()
+        with self.assertNumQueries(0):
+            self.assertEqual(quote_price(50).price, Decimal('50.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pricing.base_price_per_km = Decimal('2.00')
+            pricing.save()
+        self.assertEqual(quote_price(50).price, Decimal('100.00'))
+
+    def test_latest_settings_win(self):
+        """Test que les derniers paramètres modifiés sont appliqués"""
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingSettings.objects.create(base_price_per_km=Decimal('1.00'))
+            PricingSettings.objects.create(base_price_per_km=Decimal('3.00'))
+        self.assertEqual(get_pricing_settings().base_price_per_km, Decimal('3.00'))
+
+class RepriceRidesTests(TestCase):
+    def setUp(self):
+        invalidate_pricing()
+        self.addCleanup(invalidate_pricing)
+        driver = User.objects.create_user(username='driver', password='driverpass123')
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        self.rides = [
+            Ride.objects.create(
+                driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+                departure_date=tomorrow if status != 'completed' else tomorrow - timedelta(days=3),
+                departure_time='10:00', distance_km=Decimal('87'), available_seats=3, status=status
+            )
+            for status in ('draft', 'confirmed', 'confirmed', 'cancelled', 'completed')
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingSettings.objects.create(base_price_per_km=Decimal('1.00'))
+
+    def test_reprice_in_chunks(self):
+        """Test le recalcul par lots des seuls trajets à venir modifiables"""
+        progress = list(reprice_rides(chunk_size=2))
+        self.assertEqual([p.scanned for p in progress], [2, 3])
+        self.assertEqual(progress[-1].updated, 3)
+        prices = [Ride.objects.get(pk=ride.pk).price for ride in self.rides]
+        self.assertEqual(prices, [Decimal('87.00')] * 3 + [Decimal('43.50')] * 2)
+
+    def test_resume_after_id(self):
+        """Test la reprise d'un traitement après un identifiant"""
+        progress = list(reprice_rides(start_after=self.rides[0].pk))
+        self.assertEqual(progress[-1].updated, 2)
+        self.assertEqual(Ride.objects.get(pk=self.rides[0].pk).price, Decimal('43.50'))
+
+    def test_command_reports_throughput(self):
+        """Test la commande de recalcul"""
+        out = io.StringIO()
+        call_command('reprice_rides', chunk_size=10, stdout=out)
+        self.assertIn('trajets/s', out.getvalue())
+        self.assertIn('3 trajet(s) recalculé(s) sur 3', out.getvalue())
+
+    def test_command_refuses_concurrent_run(self):
+        """Test qu'un seul recalcul tourne à la fois"""
+        self.assertTrue(acquire_reprice_lock('test'))
+        self.addCleanup(release_reprice_lock)
+        with self.assertRaises(CommandError):
+            call_command('reprice_rides', stdout=io.StringIO())
+        release_reprice_lock()
+        call_command('reprice_rides', stdout=io.StringIO())
+        self.assertTrue(acquire_reprice_lock('test'))
+
+    def test_admin_action_starts_background_job(self):
+        """Test que l'action d'administration lance un seul recalcul, hors de la requête"""
+        User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        older = PricingSettings.objects.create(base_price_per_km=Decimal('2.00'))
+        PricingSettings.objects.filter(pk=older.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        active = PricingSettings.objects.order_by('-updated_at', '-pk').first()
+        url = reverse('admin:rides_pricingsettings_changelist')
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.addCleanup(release_reprice_lock)
+        finished = threading.Event()
+
+        with override_settings(REPRICE_LOG_DIR=Path(log_dir.name)), mock.patch('rides.admin.subprocess.Popen') as popen:
+            popen.return_value.wait.side_effect = lambda: finished.wait(5)
+            self.client.post(url, {'action': 'reprice_future_rides', '_selected_action': [older.pk]})
+            popen.assert_not_called()
+            response = self.client.post(
+                url, {'action': 'reprice_future_rides', '_selected_action': [active.pk]}, follow=True
+            )
+            self.assertContains(response, 'Recalcul lancé en arrière-plan')
+            self.assertNotContains(response, log_dir.name)
+            response = self.client.post(
+                url, {'action': 'reprice_future_rides', '_selected_action': [active.pk]}, follow=True
+            )
+            self.assertContains(response, 'déjà en cours')
+        self.assertEqual(popen.call_count, 1)
+        self.assertIn('--lock-held', popen.call_args.args[0])
+        self.assertEqual(len(list(Path(log_dir.name).glob('reprice-*.log'))), 1)
+        prices = [Ride.objects.get(pk=ride.pk).price for ride in self.rides]
+        self.assertNotIn(Decimal('87.00'), prices)
+
+        # Fin du processus : le thread qui l'attend libère le verrou
+        finished.set()
+        for _ in range(50):
+            if acquire_reprice_lock('test'):
+                break
+            time.sleep(0.05)
+        else:
+            self.fail('Verrou du recalcul non libéré')
@@ -0,0 +1,70 @@
+import io
+import tempfile
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def profiles(self, view='rides.ride_list'):
+        return list((self.directory / view).glob('*.folded'))
+
+    def test_sampled_request_writes_stacks(self):
+        """Test qu'une requête échantillonnée produit un fichier de piles par nom de vue"""
+        with override_settings(PROFILING_DIR=str(self.directory), PROFILING_SAMPLE_RATE=1.0):
+            self.client.get(reverse('rides:ride_list'))
+        [path] = self.profiles()
+        lines = path.read_text().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any('(ride_list)' in line for line in lines))
+        stack, value = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(value), 0)
+
+    def test_header_reserved_to_staff(self):
+        """Test que l'en-tête de profilage n'est honoré que pour le staff"""
+        user = User.objects.create_user(username='user', password='userpass123')
+        self.client.force_login(user)
+        with override_settings(PROFILING_DIR=str(self.directory)):
+            response = self.client.get(reverse('rides:ride_list'), HTTP_X_PROFILE='1')
+            self.assertNotIn('X-Profile', response)
+            self.assertEqual(self.profiles(), [])
+
+            user.is_staff = True
+            user.save()
+            response = self.client.get(reverse('rides:ride_list'), HTTP_X_PROFILE='1')
+        self.assertEqual(response['X-Profile'], self.profiles()[0].name)
+
+    def test_unwritable_directory_keeps_response(self):
+        """Test qu'un répertoire de profils inutilisable ne fait pas échouer la requête profilée"""
+        blocker = self.directory / 'not-a-directory'
+        blocker.write_text('')
+        self.client.force_login(User.objects.create_user(username='staff', password='staffpass123', is_staff=True))
+        with override_settings(PROFILING_DIR=str(blocker)), self.assertLogs('rides.profiling', 'WARNING'):
+            response = self.client.get(reverse('rides:ride_list'), HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+
+    def test_merge_command_reports_hot_functions(self):
+        """Test la fusion des profils et le classement des fonctions"""
+        view = self.directory / 'rides.my_rides'
+        view.mkdir()
+        (view / 'a.folded').write_text('main;query 3000\nmain;render 1000\n')
+        (view / 'b.folded').write_text('main;query 2000\nmain 500\n')
+        merged = self.directory / 'merged.folded'
+        out = io.StringIO()
+        call_command('merge_profiles', dir=str(self.directory), view='rides:my_rides', top=2,
+                     output=str(merged), stdout=out)
+        report = out.getvalue().splitlines()
+        self.assertIn('2 requête(s) profilée(s), 6.5 ms au total', report[0])
+        self.assertTrue(report[2].endswith('query'))
+        self.assertIn('5.0', report[2])
+        self.assertEqual(len(report), 4)
+        self.assertIn('main;query 5000', merged.read_text())
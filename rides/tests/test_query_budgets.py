@@ -0,0 +1,250 @@
+import json
+from datetime import timedelta
+from itertools import count
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import (
+    Booking, EmailVerificationToken, Profile, Rating, Ride, RideReport, RideRequest, UserStats, Vehicle,
+)
+from ..payment_models import PaymentTransaction
+from ..pricing import invalidate_pricing
+from ..roles import DRIVER_GROUP
+from .budgets import QueryBudgetMixin
+
+User = get_user_model()
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.sequence = count()
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        drivers = Group.objects.get(name=DRIVER_GROUP)
+        # Les permissions n'existent pas encore lors de la migration 0009
+        drivers.permissions.add(Permission.objects.get(codename='add_ride'))
+        self.driver = self.create_user('driver')
+        self.driver.groups.add(drivers)
+        self.passenger = self.create_user('passenger')
+        self.ride = self.create_ride(self.driver)
+        Booking.objects.create(ride=self.ride, passenger=self.passenger)
+
+    def create_user(self, prefix):
+        user = User.objects.create_user(username=f'{prefix}{next(self.sequence)}', first_name='Prénom', last_name='Nom')
+        Profile.objects.create(user=user)
+        return user
+
+    def create_ride(self, driver, status='confirmed', **kwargs):
+        vehicle = Vehicle.objects.create(
+            driver=driver, brand='Dacia', model='Logan', color='Gris',
+            license_plate=f'{next(self.sequence)}-A-1', number_of_seats=4
+        )
+        return Ride.objects.create(
+            driver=driver, vehicle=vehicle, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=self.tomorrow, departure_time='10:00', price=50, available_seats=4,
+            status=status, **kwargs
+        )
+
+    def grow(self, size):
+        for _ in range(size):
+            other = self.create_user('other')
+            ride = self.create_ride(self.driver)
+            other_ride = self.create_ride(other)
+            self.pending_booking = Booking.objects.create(ride=ride, passenger=other)
+            Booking.objects.create(ride=self.ride, passenger=other, status='confirmed')
+            Booking.objects.create(ride=other_ride, passenger=self.passenger, status='confirmed')
+            Booking.objects.create(ride=other_ride, passenger=self.driver, status='confirmed')
+            Rating.objects.create(from_user=other, to_user=self.driver, ride=ride, rating=4)
+            RideReport.objects.create(
+                ride=other_ride, reporter=self.passenger, reported_user=other,
+                report_type='other', description='Retard'
+            )
+            RideReport.objects.create(
+                ride=other_ride, reporter=other, reported_user=self.passenger,
+                report_type='other', description='Retard'
+            )
+
+    def get(self, user, view_name, *args):
+        if user:
+            self.client.force_login(user)
+        return lambda: self.client.get(reverse(view_name, args=args))
+
+    def grow_with(self, make):
+        """grow() puis création de l'objet consommé par la requête mesurée (self.target)"""
+        def grow(size):
+            self.grow(size)
+            self.target = make()
+        return grow
+
+    def grow_cold_pricing(self, size):
+        # Paramètres de tarification relus à chaque mesure, comme dans un processus neuf
+        self.grow(size)
+        invalidate_pricing()
+
+    def completed_booking(self):
+        return Booking.objects.create(ride=self.ride, passenger=self.create_user('other'), status='completed')
+
+    def test_ride_list(self):
+        """Test le budget de la liste publique des trajets"""
+        self.assertQueryBudget('rides:ride_list', self.get(None, 'rides:ride_list'), self.grow)
+
+    def test_ride_search(self):
+        """Test le budget de la recherche de trajets"""
+        self.assertQueryBudget('rides:ride_search', self.get(self.passenger, 'rides:ride_search'), self.grow)
+
+    def test_ride_detail_as_driver(self):
+        """Test le budget du détail d'un trajet pour son conducteur"""
+        self.assertQueryBudget('rides:ride_detail', self.get(self.driver, 'rides:ride_detail', self.ride.pk), self.grow)
+
+    def test_ride_detail_as_passenger(self):
+        """Test le budget du détail d'un trajet pour un passager"""
+        self.assertQueryBudget('rides:ride_detail', self.get(self.passenger, 'rides:ride_detail', self.ride.pk), self.grow)
+
+    def test_ride_create(self):
+        """Test le budget du formulaire de création d'un trajet"""
+        self.assertQueryBudget('rides:ride_create', self.get(self.driver, 'rides:ride_create'), self.grow)
+
+    def test_ride_edit(self):
+        """Test le budget du formulaire de modification d'un trajet"""
+        self.assertQueryBudget('rides:ride_edit', self.get(self.driver, 'rides:ride_edit', self.ride.pk), self.grow)
+
+    def test_ride_delete(self):
+        """Test le budget de la confirmation de suppression d'un trajet"""
+        self.assertQueryBudget('rides:ride_delete', self.get(self.driver, 'rides:ride_delete', self.ride.pk), self.grow)
+
+    def test_my_rides_as_driver(self):
+        """Test le budget de « Mes trajets » pour un conducteur"""
+        self.assertQueryBudget('rides:my_rides', self.get(self.driver, 'rides:my_rides'), self.grow)
+
+    def test_my_rides_as_passenger(self):
+        """Test le budget de « Mes trajets » pour un passager"""
+        self.assertQueryBudget('rides:my_rides', self.get(self.passenger, 'rides:my_rides'), self.grow)
+
+    def test_profile(self):
+        """Test le budget du profil"""
+        self.assertQueryBudget('rides:profile', self.get(self.driver, 'rides:profile'), self.grow)
+
+    def test_report_ride(self):
+        """Test le budget du formulaire de signalement"""
+        self.assertQueryBudget('rides:report_ride', self.get(self.passenger, 'rides:report_ride', self.ride.pk), self.grow)
+
+    def test_my_reports(self):
+        """Test le budget de la liste des signalements"""
+        self.assertQueryBudget('rides:my_reports', self.get(self.passenger, 'rides:my_reports'), self.grow)
+
+    def test_booking_action(self):
+        """Test le budget de la confirmation d'une réservation (la dernière créée par grow)"""
+        self.client.force_login(self.driver)
+        self.assertQueryBudget('rides:booking_action', lambda: self.client.get(
+            reverse('rides:booking_action', args=[self.pending_booking.pk, 'confirm'])
+        ), self.grow)
+
+    def test_vehicle_list(self):
+        """Test le budget de la liste des véhicules (un par trajet créé par grow)"""
+        self.assertQueryBudget('rides:vehicle_list', self.get(self.driver, 'rides:vehicle_list'), self.grow)
+
+    def test_vehicle_create(self):
+        """Test le budget du formulaire d'ajout d'un véhicule"""
+        self.assertQueryBudget('rides:vehicle_create', self.get(self.driver, 'rides:vehicle_create'), self.grow)
+
+    def test_vehicle_edit(self):
+        """Test le budget du formulaire de modification d'un véhicule"""
+        self.assertQueryBudget(
+            'rides:vehicle_edit', self.get(self.driver, 'rides:vehicle_edit', self.ride.vehicle_id), self.grow
+        )
+
+    def test_vehicle_delete(self):
+        """Test le budget de la confirmation de suppression d'un véhicule"""
+        self.assertQueryBudget(
+            'rides:vehicle_delete', self.get(self.driver, 'rides:vehicle_delete', self.ride.vehicle_id), self.grow
+        )
+
+    def test_booking_request(self):
+        """Test le budget du formulaire de réservation"""
+        ride = self.create_ride(self.driver)
+        self.assertQueryBudget('rides:booking_request', self.get(self.passenger, 'rides:booking_request', ride.pk), self.grow)
+
+    def test_request_action(self):
+        """Test le budget de l'acceptation d'une demande de trajet"""
+        self.client.force_login(self.driver)
+        grow = self.grow_with(lambda: RideRequest.objects.create(
+            ride=self.ride, passenger=self.create_user('other'), number_of_seats=1
+        ))
+        self.assertQueryBudget('rides:request_action', lambda: self.client.get(
+            reverse('rides:request_action', args=[self.target.pk, 'accept'])
+        ), grow)
+
+    def test_ride_validate(self):
+        """Test le budget de la validation d'un trajet brouillon"""
+        self.client.force_login(self.driver)
+        grow = self.grow_with(lambda: self.create_ride(self.driver, status='draft'))
+        self.assertQueryBudget('rides:ride_validate', lambda: self.client.post(
+            reverse('rides:ride_validate', args=[self.target.pk]), {'action': 'confirm'}
+        ), grow)
+
+    def test_rate_ride(self):
+        """Test le budget du formulaire d'évaluation d'un trajet terminé"""
+        self.client.force_login(self.driver)
+        self.assertQueryBudget('rides:rate_ride', lambda: self.client.get(
+            reverse('rides:rate_ride', args=[self.target.pk])
+        ), self.grow_with(self.completed_booking))
+
+    def test_initiate_payment(self):
+        """Test le budget de l'ouverture d'un paiement (création de la transaction et du code)"""
+        passenger = self.create_user('payer')
+        self.client.force_login(passenger)
+        grow = self.grow_with(lambda: Booking.objects.create(
+            ride=self.create_ride(self.driver), passenger=passenger, status='confirmed'
+        ))
+        self.assertQueryBudget('rides:initiate_payment', lambda: self.client.get(
+            reverse('rides:initiate_payment', args=[self.target.pk])
+        ), grow)
+
+    def test_validate_payment(self):
+        """Test le budget de la validation d'un paiement par le conducteur"""
+        # Lignes de statistiques déjà présentes : seule leur mise à jour est mesurée
+        UserStats.objects.create(user=self.driver)
+        UserStats.objects.create(user=self.passenger)
+
+        def make():
+            booking = Booking.objects.create(
+                ride=self.create_ride(self.driver), passenger=self.passenger, status='confirmed'
+            )
+            payment = PaymentTransaction.objects.create(booking=booking, amount=50)
+            self.code = payment.generate_validation_code()
+            # Partage du conducteur recalculé avec des paramètres relus, comme dans un processus neuf
+            invalidate_pricing()
+            return booking
+
+        self.client.force_login(self.driver)
+        self.assertQueryBudget('rides:validate_payment', lambda: self.client.post(
+            reverse('rides:validate_payment', args=[self.target.pk]), {'validation_code': self.code}
+        ), self.grow_with(make))
+
+    def test_verify_email(self):
+        """Test le budget de la vérification d'une adresse email"""
+        self.client.force_login(self.passenger)
+        grow = self.grow_with(lambda: EmailVerificationToken.objects.create(user=self.create_user('new')))
+        self.assertQueryBudget('rides:verify_email', lambda: self.client.get(
+            reverse('rides:verify_email', args=[self.target.token])
+        ), grow)
+
+    def test_get_cities(self):
+        """Test le budget de l'autocomplétion des villes"""
+        self.client.force_login(self.passenger)
+        self.assertQueryBudget('rides:get_cities', lambda: self.client.get(reverse('rides:get_cities'), {'q': 'ra'}), self.grow)
+
+    def test_calculate_price(self):
+        """Test le budget du devis d'un trajet"""
+        self.client.force_login(self.passenger)
+        self.assertQueryBudget('rides:calculate_price', lambda: self.client.get(
+            reverse('rides:calculate_price'), {'departure_city': 'Casablanca', 'arrival_city': 'Rabat'}
+        ), self.grow_cold_pricing)
+
+    def test_calculate_prices(self):
+        """Test le budget des devis groupés"""
+        self.client.force_login(self.passenger)
+        routes = [['Casablanca', 'Rabat'], ['Fès', 'Meknès', 2]]
+        self.assertQueryBudget('rides:calculate_prices', lambda: self.client.post(
+            reverse('rides:calculate_prices'), json.dumps(routes), content_type='application/json'
+        ), self.grow_cold_pricing)
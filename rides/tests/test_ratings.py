@@ -0,0 +1,81 @@
+import io
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Profile, Rating, RatingAggregate, Ride, UserStats
+from ..ratings import rebuild_rating_aggregates
+
+User = get_user_model()
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(username='driver', password='driverpass123')
+        Profile.objects.create(user=self.driver)
+        self.passengers = [
+            User.objects.create_user(username=f'passenger{i}', password='passengerpass123') for i in range(3)
+        ]
+        self.ride = Ride.objects.create(
+            driver=self.driver, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=timezone.now().date() - timedelta(days=1), departure_time='10:00',
+            price=50, available_seats=3, status='completed'
+        )
+
+    def rate(self, passenger, rating, criteria='general'):
+        return Rating.objects.create(
+            from_user=passenger, to_user=self.driver, ride=self.ride, rating=rating, criteria=criteria
+        )
+
+    def test_incremental_averages(self):
+        """Test la mise à jour incrémentale des moyennes à l'ajout, la modification et la suppression"""
+        self.rate(self.passengers[0], 5)
+        self.rate(self.passengers[1], 3)
+        punctuality = self.rate(self.passengers[0], 2, 'punctuality')
+
+        profile = Profile.objects.get(user=self.driver)
+        self.assertEqual((profile.rating_sum, profile.number_of_ratings), (10, 3))
+        self.assertAlmostEqual(profile.rating, 10 / 3)
+        self.assertEqual(RatingAggregate.objects.get(user=self.driver, criteria='general').average, 4.0)
+
+        punctuality.rating = 4
+        punctuality.save()
+        self.assertEqual(RatingAggregate.objects.get(user=self.driver, criteria='punctuality').average, 4.0)
+
+        punctuality.delete()
+        profile.refresh_from_db()
+        self.assertEqual((profile.rating_sum, profile.number_of_ratings, profile.rating), (8, 2, 4.0))
+        self.assertEqual(RatingAggregate.objects.get(user=self.driver, criteria='punctuality').count, 0)
+
+    def test_no_full_scan_on_save(self):
+        """Test que l'ajout d'une note ne relit pas les évaluations existantes"""
+        for passenger in self.passengers[:2]:
+            self.rate(passenger, 4)
+        UserStats.objects.create(user=self.passengers[2])
+        # INSERT + UPDATE profil + UPDATE critère, dans un savepoint, puis UPDATE des statistiques de l'auteur
+        with self.assertNumQueries(6):
+            self.rate(self.passengers[2], 4)
+
+    def test_rebuild(self):
+        """Test la reconstruction des agrégats à partir de Rating"""
+        self.rate(self.passengers[0], 5)
+        self.rate(self.passengers[1], 2, 'comfort')
+        Profile.objects.filter(user=self.driver).update(rating=1.0, rating_sum=0, number_of_ratings=0)
+        RatingAggregate.objects.all().delete()
+
+        self.assertEqual(rebuild_rating_aggregates(), (1, 2))
+        profile = Profile.objects.get(user=self.driver)
+        self.assertEqual((profile.rating, profile.rating_sum, profile.number_of_ratings), (3.5, 7, 2))
+        self.assertEqual(RatingAggregate.objects.get(user=self.driver, criteria='comfort').average, 2.0)
+        out = io.StringIO()
+        call_command('rebuild_rating_aggregates', stdout=out)
+        self.assertIn('0 profil(s) corrigé(s)', out.getvalue())
+
+    def test_profile_shows_criteria(self):
+        """Test l'affichage des moyennes par critère sur le profil"""
+        self.rate(self.passengers[0], 4, 'comfort')
+        self.client.login(username='driver', password='driverpass123')
+        response = self.client.get(reverse('rides:profile'))
+        self.assertContains(response, 'Confort')
+        self.assertContains(response, '4,0 / 5')
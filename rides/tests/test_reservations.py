@@ -0,0 +1,98 @@
+import threading
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Booking, Ride, RideRequest
+from ..reservations import ALREADY_PROCESSED, CONFIRMED, NO_SEATS, confirm_booking, reject_booking
+
+User = get_user_model()
+
+def create_ride(driver, seats):
+    return Ride.objects.create(
+        driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+        departure_date=timezone.now().date() + timedelta(days=1), departure_time='10:00',
+        price=50, available_seats=seats, status='confirmed'
+    )
+
+class SeatReservationTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(username='driver', password='driverpass123')
+        self.passenger = User.objects.create_user(username='passenger', password='passengerpass123')
+        self.ride = create_ride(self.driver, 2)
+
+    def test_confirm_and_no_seats(self):
+        """Test la confirmation puis le refus propre d'une réservation sans places"""
+        booking = Booking.objects.create(passenger=self.passenger, ride=self.ride, number_of_seats=2)
+        self.assertEqual(confirm_booking(booking), CONFIRMED)
+        self.assertEqual(confirm_booking(booking), ALREADY_PROCESSED)
+        self.assertFalse(reject_booking(booking))
+
+        other = User.objects.create_user(username='other', password='otherpass123')
+        late = Booking.objects.create(passenger=other, ride=self.ride, number_of_seats=1)
+        self.assertEqual(confirm_booking(late), NO_SEATS)
+        late.refresh_from_db()
+        self.assertEqual(late.status, 'pending')
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 0)
+
+    def test_check_constraint(self):
+        """Test que la base refuse un nombre de places négatif"""
+        with self.assertRaises(IntegrityError):
+            Ride.objects.filter(pk=self.ride.pk).update(available_seats=-1)
+
+    def test_request_action_accept(self):
+        """Test l'acceptation d'une demande de trajet par le conducteur"""
+        ride_request = RideRequest.objects.create(ride=self.ride, passenger=self.passenger, number_of_seats=2)
+        self.client.login(username='driver', password='driverpass123')
+        self.client.get(reverse('rides:request_action', args=[ride_request.pk, 'accept']))
+        ride_request.refresh_from_db()
+        self.ride.refresh_from_db()
+        self.assertEqual(ride_request.status, 'accepted')
+        self.assertEqual(self.ride.available_seats, 0)
+
+    def test_duplicate_booking_request(self):
+        """Test qu'une réservation en double n'entraîne pas d'erreur serveur"""
+        Booking.objects.create(passenger=self.passenger, ride=self.ride, number_of_seats=1)
+        self.client.login(username='passenger', password='passengerpass123')
+        response = self.client.post(reverse('rides:booking_request', args=[self.ride.pk]), {'number_of_seats': 1})
+        self.assertRedirects(response, reverse('rides:ride_detail', args=[self.ride.pk]), fetch_redirect_response=False)
+        self.assertEqual(Booking.objects.count(), 1)
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_parallel_confirmations_never_oversell(self):
+        """Test que des centaines de confirmations simultanées ne vendent pas plus de places qu'il n'y en a"""
+        seats, attempts = 10, 200
+        driver = User.objects.create_user(username='driver', password='driverpass123')
+        ride = create_ride(driver, seats)
+        User.objects.bulk_create([User(username=f'passenger{i}') for i in range(attempts)])
+        Booking.objects.bulk_create([
+            Booking(passenger=passenger, ride=ride, number_of_seats=1)
+            for passenger in User.objects.filter(username__startswith='passenger')
+        ])
+        bookings = list(Booking.objects.all())
+        results = []
+        barrier = threading.Barrier(20)
+
+        def worker(chunk):
+            try:
+                barrier.wait()
+                for booking in chunk:
+                    results.append(confirm_booking(booking))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(bookings[i::20],)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ride.refresh_from_db()
+        self.assertEqual(len(results), attempts)
+        self.assertEqual(results.count(CONFIRMED), seats)
+        self.assertEqual(results.count(NO_SEATS), attempts - seats)
+        self.assertEqual(ride.available_seats, 0)
+        self.assertEqual(Booking.objects.filter(status='confirmed').count(), seats)
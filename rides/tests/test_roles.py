@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..roles import DRIVER_GROUP, get_user_roles
+
+User = get_user_model()
+
+class UserRolesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group, _ = Group.objects.get_or_create(name=DRIVER_GROUP)
+        self.group.permissions.add(Permission.objects.get(codename='add_ride'))
+        self.user = User.objects.create_user(username='driver', password='driverpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        # Nouvel objet, comme au début d'une nouvelle requête
+        return User.objects.get(pk=self.user.pk)
+
+    def test_warm_roles_cost_no_query(self):
+        """Test que rôle et permissions ne coûtent aucune requête une fois en cache"""
+        roles = get_user_roles(self.fresh_user())
+        self.assertTrue(roles.is_driver)
+        self.assertTrue(roles.has_perm('rides.add_ride'))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(get_user_roles(user).is_driver)
+            self.assertTrue(user.has_perm('rides.add_ride'))
+            self.assertFalse(user.has_perm('rides.delete_booking'))
+
+    def test_group_change_invalidates(self):
+        """Test qu'un changement de groupe ou de permissions est pris en compte"""
+        get_user_roles(self.fresh_user())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertFalse(get_user_roles(self.fresh_user()).is_driver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.add(self.user)
+            self.group.permissions.add(Permission.objects.get(codename='delete_ride'))
+        self.assertTrue(self.fresh_user().has_perm('rides.delete_ride'))
+
+    def test_group_rename_invalidates(self):
+        """Test que renommer le groupe des conducteurs est pris en compte sans attendre l'expiration"""
+        self.assertTrue(get_user_roles(self.fresh_user()).is_driver)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.name = 'Anciens conducteurs'
+            self.group.save()
+        self.assertFalse(get_user_roles(self.fresh_user()).is_driver)
+
+    def test_superuser_has_all_permissions(self):
+        """Test qu'un superutilisateur garde toutes les permissions, comme avec ModelBackend"""
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.assertEqual(admin.get_all_permissions(), {
+            f'{app_label}.{codename}'
+            for app_label, codename in Permission.objects.values_list('content_type__app_label', 'codename')
+        })
+
+    def test_views_skip_group_queries(self):
+        """Test qu'une requête chaude n'interroge plus les groupes ni les permissions"""
+        self.client.login(username='driver', password='driverpass123')
+        url = reverse('rides:vehicle_list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'auth_group' in q['sql'] or 'auth_permission' in q['sql']])
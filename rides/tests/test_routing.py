@@ -0,0 +1,84 @@
+import threading
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from ..models import DistanceCache, Ride
+from ..routing import HTTPRoutingBackend, RoutingError, road_distance, road_distances, reset_routing_backend
+from ..routing_stub import RoutingStubServer
+
+HTTP_BACKEND = 'rides.routing.HTTPRoutingBackend'
+
+class RoutingStubMixin:
+    stub_delay = 0.0
+
+    def setUp(self):
+        super().setUp()
+        self.stub = RoutingStubServer(delay=self.stub_delay).start()
+        self.addCleanup(self.stub.stop)
+        settings_override = override_settings(ROUTING_BACKEND=HTTP_BACKEND, ROUTING_URL=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_routing_backend()
+        self.addCleanup(reset_routing_backend)
+
+class HTTPRoutingBackendTests(RoutingStubMixin, TestCase):
+    def test_http_backend_parses_distance_matrix(self):
+        """Test la lecture d'une réponse au format Distance Matrix"""
+        backend = HTTPRoutingBackend(url=self.stub.url, api_key='test')
+        self.assertEqual(backend.road_distance('Casablanca', 'Rabat'), Decimal('87.00'))
+        self.assertIsNone(backend.road_distance('Casablanca', 'Atlantis'))
+
+    def test_http_backend_unreachable(self):
+        """Test qu'un fournisseur injoignable lève RoutingError"""
+        backend = HTTPRoutingBackend(url='http://127.0.0.1:9/', api_key='test', timeout=0.5)
+        with self.assertRaises(RoutingError):
+            backend.road_distance('Casablanca', 'Rabat')
+
+    def test_distance_cache(self):
+        """Test que la distance est mise en cache en base après le premier appel"""
+        self.assertEqual(road_distance('Fès', 'Meknès'), Decimal('65.00'))
+        self.assertEqual(road_distance('meknes', 'Fez'), Decimal('65.00'))
+        self.assertEqual(self.stub.request_count, 1)
+        self.assertEqual(DistanceCache.objects.get().provider, 'http')
+
+    def test_batch_distances(self):
+        """Test qu'un lot lit le cache en une requête et n'interroge que les paires manquantes"""
+        road_distance('Casablanca', 'Rabat')
+        pairs = [('Rabat', 'Casablanca'), ('Fès', 'Meknès'), ('meknes', 'fes'), ('Casablanca', 'Atlantis')]
+        self.assertEqual(road_distances(pairs), [Decimal('87.00'), Decimal('65.00'), Decimal('65.00'), None])
+        self.assertEqual(self.stub.request_count, 3)
+
+    def test_ride_priced_on_cached_distance(self):
+        """Test qu'un trajet enregistré sans prix utilise la même distance que les devis"""
+        DistanceCache.objects.create(departure_slug='casablanca', arrival_slug='rabat', distance_km=Decimal('90'), provider='http')
+        driver = get_user_model().objects.create_user(username='driver', password='driverpass123')
+        ride = Ride.objects.create(
+            driver=driver, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=date(2030, 1, 1), departure_time='10:00', available_seats=3
+        )
+        self.assertEqual(ride.distance_km, Decimal('90'))
+        self.assertEqual(self.stub.request_count, 0)
+
+class RequestCoalescingTests(RoutingStubMixin, TransactionTestCase):
+    stub_delay = 0.3
+
+    def test_concurrent_lookups_make_one_request(self):
+        """Test que N demandes simultanées pour la même paire font un seul appel sortant"""
+        results = []
+
+        def lookup():
+            try:
+                results.append(road_distance('Casablanca', 'Marrakech'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=lookup) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [Decimal('238.00')] * 20)
+        self.assertEqual(self.stub.request_count, 1)
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Ride
+from ..reservations import reserve_seats
+
+User = get_user_model()
+
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.driver = User.objects.create_user(username='driver', password='driverpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ride = self.create_ride('Casablanca', 'Rabat')
+        self.url = reverse('rides:ride_list')
+        self.params = {'departure': 'Casablanca', 'arrival': 'Rabat'}
+
+    def create_ride(self, departure, arrival):
+        return Ride.objects.create(
+            driver=self.driver, departure_city=departure, arrival_city=arrival,
+            departure_date=timezone.now().date() + timedelta(days=1), departure_time='10:00',
+            price=50, available_seats=3, status='confirmed'
+        )
+
+    def search(self):
+        return list(self.client.get(self.url, self.params).context['rides'])
+
+    def test_warm_search_makes_no_query(self):
+        """Test qu'une recherche déjà en cache ne touche pas la base"""
+        self.assertEqual(self.search(), [self.ride])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search(), [self.ride])
+
+    def test_new_ride_invalidates_route(self):
+        """Test qu'un nouveau trajet sur l'itinéraire apparaît immédiatement"""
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self.create_ride('Casablanca', 'Rabat')
+        self.assertEqual(self.search(), [self.ride, other])
+
+    def test_reservation_invalidates_route(self):
+        """Test que les places restantes sont à jour après une réservation"""
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(reserve_seats(self.ride.pk, 2))
+        self.assertEqual(self.search()[0].available_seats, 1)
+
+    def test_other_route_keeps_cache(self):
+        """Test qu'un trajet sur un autre itinéraire ne périme pas la recherche"""
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_ride('Fès', 'Meknès')
+        with self.assertNumQueries(0):
+            self.search()
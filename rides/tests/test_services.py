@@ -0,0 +1,111 @@
+import csv
+import io
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from ..cities import MOROCCAN_CITIES, CITY_DISTANCES
+from ..matrix import DistanceMatrix
+from ..services import calculate_distance, get_route, city_graph, resolve_city, reset_distance_matrix, UnknownCity
+
+@override_settings(DISTANCE_MATRIX_PATH=None)
+class DistanceServiceTests(SimpleTestCase):
+    def setUp(self):
+        reset_distance_matrix()
+        self.addCleanup(reset_distance_matrix)
+
+    def test_all_pairs_resolved(self):
+        """Test que toutes les paires de villes ont une distance"""
+        for city1 in MOROCCAN_CITIES:
+            for city2 in MOROCCAN_CITIES:
+                self.assertIsInstance(calculate_distance(city1, city2), Decimal)
+
+    def test_aliases_and_accents(self):
+        """Test la résolution des variantes orthographiques"""
+        self.assertEqual(resolve_city('fes'), resolve_city('Fès'))
+        self.assertEqual(resolve_city('Fez'), resolve_city('FÈS'))
+        self.assertEqual(resolve_city('tangier'), resolve_city('Tanger'))
+        self.assertEqual(calculate_distance('meknes', 'fes'), Decimal('65'))
+        with self.assertRaises(UnknownCity):
+            calculate_distance('Casablanca', 'Paris')
+
+    def test_route_via_intermediate_cities(self):
+        """Test le calcul d'un trajet via des villes intermédiaires"""
+        route = get_route('Oujda', 'Agadir')
+        self.assertEqual(route[0], 'Oujda')
+        self.assertEqual(route[-1], 'Agadir')
+        legs = sum(calculate_distance(a, b) for a, b in zip(route, route[1:]))
+        self.assertEqual(calculate_distance('oujda', 'AGADIR'), legs)
+        self.assertEqual(calculate_distance('Casablanca', 'Rabat'), Decimal('87'))
+
+    def test_rebuild_when_table_changes(self):
+        """Test que le graphe est recalculé après modification de la table"""
+        graph = city_graph()
+        self.assertIs(city_graph(), graph)
+        CITY_DISTANCES[('Oujda', 'Agadir')] = 900
+        try:
+            self.assertIsNot(city_graph(), graph)
+            self.assertEqual(calculate_distance('Agadir', 'Oujda'), Decimal('900'))
+        finally:
+            del CITY_DISTANCES[('Oujda', 'Agadir')]
+        self.assertTrue(city_graph().is_current(CITY_DISTANCES))
+
+    def test_haversine_fallback(self):
+        """Test l'estimation à vol d'oiseau quand aucune route n'est connue"""
+        saved = dict(CITY_DISTANCES)
+        CITY_DISTANCES.clear()
+        try:
+            estimate = calculate_distance('Casablanca', 'Rabat')
+        finally:
+            CITY_DISTANCES.update(saved)
+        # ~87 km à vol d'oiseau, majorés de 30 %
+        self.assertTrue(Decimal('100') < estimate < Decimal('130'), estimate)
+
+class DistanceMatrixTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        with open(self.tmp / 'localities.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'latitude', 'longitude', 'aliases'])
+            writer.writerow(['Casablanca', 33.5731, -7.5898, 'Casa'])
+            writer.writerow(['Rabat', 34.0209, -6.8416, ''])
+            writer.writerow(['Témara', 33.9287, -6.9066, ''])
+            writer.writerow(['Ifrane', 33.5228, -5.1110, ''])
+        with open(self.tmp / 'distances.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['from', 'to', 'km'])
+            writer.writerow(['Casablanca', 'Témara', 75])
+            writer.writerow(['Témara', 'Rabat', 14])
+        self.addCleanup(reset_distance_matrix)
+
+    def compile(self, dtype):
+        output = self.tmp / f'distances-{dtype}.bin'
+        call_command(
+            'compile_distance_matrix', str(self.tmp / 'localities.csv'), str(self.tmp / 'distances.csv'),
+            output=str(output), dtype=dtype, stdout=io.StringIO()
+        )
+        return output
+
+    def test_compiled_matrix_lookups(self):
+        """Test la lecture en mmap d'une matrice compilée (uint16 et float32)"""
+        for dtype in ('uint16', 'float32'):
+            matrix = DistanceMatrix(self.compile(dtype))
+            self.addCleanup(matrix.close)
+            casa, rabat, ifrane = matrix.locality_id('casa'), matrix.locality_id('RABAT'), matrix.locality_id('Ifrane')
+            self.assertEqual(matrix.distance_between(casa, rabat), 89)
+            self.assertEqual(matrix.distance_between(rabat, rabat), 0)
+            self.assertIsNone(matrix.distance_between(casa, ifrane))
+
+    def test_service_uses_matrix(self):
+        """Test que le service de distance consulte la matrice si elle existe"""
+        output = self.compile('uint16')
+        with override_settings(DISTANCE_MATRIX_PATH=output):
+            reset_distance_matrix()
+            self.assertEqual(calculate_distance('Temara', 'Casablanca'), Decimal('75'))
+            # Distance inconnue dans la matrice : estimation à vol d'oiseau
+            self.assertGreater(calculate_distance('Ifrane', 'Casablanca'), Decimal('200'))
+            # Ville absente de la matrice : réseau routier du registre
+            self.assertEqual(calculate_distance('Fès', 'Meknès'), Decimal('65'))
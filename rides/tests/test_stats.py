@@ -0,0 +1,70 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Booking, Rating, Ride, UserStats
+from ..payment_models import PaymentTransaction
+from ..stats import rebuild_user_stats
+
+User = get_user_model()
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.driver = User.objects.create_user(username='driver', password='driverpass123')
+        self.passengers = [User.objects.create_user(username=f'passenger{i}', password='pass12345') for i in range(2)]
+        self.ride = self.create_ride()
+
+    def create_ride(self):
+        return Ride.objects.create(
+            driver=self.driver, departure_city='Casablanca', arrival_city='Rabat',
+            departure_date=timezone.now().date() - timedelta(days=1), departure_time='10:00',
+            distance_km=Decimal('87'), price=Decimal('50.00'), available_seats=4, status='confirmed'
+        )
+
+    def complete(self, passenger, ride, seats=1):
+        booking = Booking.objects.create(passenger=passenger, ride=ride, number_of_seats=seats, status='confirmed')
+        payment = PaymentTransaction.objects.create(booking=booking, amount=ride.price * seats, validation_code='123456')
+        self.assertTrue(payment.validate_payment('123456'))
+        return booking
+
+    def test_incremental_stats(self):
+        """Test la mise à jour des statistiques à chaque réservation terminée"""
+        booking = self.complete(self.passengers[0], self.ride, seats=2)
+        self.complete(self.passengers[1], self.ride)
+        Rating.objects.create(from_user=self.passengers[0], to_user=self.driver, ride=self.ride, rating=5)
+
+        driver = UserStats.objects.get(user=self.driver)
+        self.assertEqual((driver.driver_trips, driver.driver_distance_km, driver.passengers_carried), (1, Decimal('87'), 3))
+        self.assertEqual(driver.earnings, Decimal('120.00'))
+        passenger = UserStats.objects.get(user=booking.passenger)
+        self.assertEqual((passenger.passenger_trips, passenger.passenger_distance_km, passenger.reviews_given), (1, Decimal('87'), 1))
+
+    def test_rebuild_matches_incremental(self):
+        """Test que la reconstruction donne les mêmes valeurs que les incréments"""
+        self.complete(self.passengers[0], self.ride)
+        self.complete(self.passengers[1], self.create_ride(), seats=2)
+        fields = ['user_id', 'passenger_trips', 'passenger_distance_km', 'driver_trips',
+                  'driver_distance_km', 'passengers_carried', 'earnings', 'reviews_given']
+        incremental = list(UserStats.objects.order_by('user_id').values_list(*fields))
+        self.assertEqual(rebuild_user_stats(), 3)
+        self.assertEqual(list(UserStats.objects.order_by('user_id').values_list(*fields)), incremental)
+
+    def test_profile_query_count_is_constant(self):
+        """Test que la page de profil ne dépend pas de l'historique de l'utilisateur"""
+        self.client.login(username='driver', password='driverpass123')
+        url = reverse('rides:profile')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for _ in range(5):
+            self.complete(self.passengers[0], self.create_ride())
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(len(before), len(after))
+        self.assertEqual(response.context['stats'].passengers_carried, 5)
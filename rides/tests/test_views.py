@@ -1,9 +1,14 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
+import json
 from datetime import timedelta
-from ..models import Ride, RideRequest
+from django.core.cache import cache
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..models import Booking, Ride, RideRequest
 
 User = get_user_model()
 
@@ -223,4 +228,152 @@ class RideRequestViewsTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'rides/my_rides.html')
         self.assertContains(response, 'Paris')
-        self.assertContains(response, 'Lyon') 
\ No newline at end of file
+        self.assertContains(response, 'Lyon')
+
+
+class RideSearchTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(
+            username='driver',
+            email='driver@example.com',
+            password='driverpass123'
+        )
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.ride = Ride.objects.create(
+            driver=self.driver,
+            departure_city='Fès',
+            arrival_city='Meknès',
+            departure_date=self.tomorrow,
+            departure_time='10:00',
+            price=40,
+            available_seats=3,
+            status='confirmed'
+        )
+
+    def test_slugs_filled_on_save(self):
+        """Test que les colonnes normalisées sont remplies à l'enregistrement"""
+        self.assertEqual(self.ride.departure_slug, 'fes')
+        self.assertEqual(self.ride.arrival_slug, 'meknes')
+        self.ride.arrival_city = 'Ksar El Kébir'
+        self.ride.save(update_fields=['arrival_city'])
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.arrival_slug, 'ksar-el-kebir')
+
+    def test_search_ignores_accents_and_case(self):
+        """Test que la recherche trouve « Fès » en tapant « FES » ou « fe »"""
+        for params in ({'departure': 'FES'}, {'departure': 'fe'}, {'arrival': 'Meknes'}, {'q': 'meknès'}):
+            response = self.client.get(reverse('rides:ride_list'), params)
+            self.assertEqual(list(response.context['rides']), [self.ride], params)
+
+        response = self.client.get(reverse('rides:ride_list'), {'departure': 'Meknes'})
+        self.assertEqual(list(response.context['rides']), [])
+
+@override_settings(QUOTE_API_TOKENS=['partner-token'])
+class BatchQuoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('rides:calculate_prices')
+        User.objects.create_user(username='passenger', password='passengerpass123')
+        self.client.login(username='passenger', password='passengerpass123')
+
+    def post(self, payload, client=None, **headers):
+        client = client or self.client
+        return client.post(self.url, json.dumps(payload), content_type='application/json', **headers)
+
+    def test_batch_quotes(self):
+        """Test le calcul de plusieurs devis en une requête, dans l'ordre demandé"""
+        response = self.post({'routes': [
+            {'departure_city': 'Casablanca', 'arrival_city': 'Rabat', 'seats': 2},
+            ['rabat', 'Casablanca'],
+            ['Casablanca', 'Atlantis', 1],
+        ]})
+        self.assertEqual(response.status_code, 200)
+        quotes = response.json()['quotes']
+        self.assertEqual(quotes[0]['distance_km'], 87.0)
+        self.assertEqual(quotes[0]['price'], 43.5)
+        self.assertEqual(quotes[0]['total_price'], 87.0)
+        self.assertEqual(quotes[1]['seats'], 1)
+        self.assertEqual(quotes[1]['price'], 43.5)
+        self.assertIn('error', quotes[2])
+
+    def test_batch_validation(self):
+        """Test le refus des lots invalides ou trop grands"""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([['Casablanca', 'Rabat', 9]]).status_code, 400)
+        self.assertEqual(self.post([['Casablanca', 'Rabat']] * 201).status_code, 413)
+
+    def test_requires_login_or_api_token(self):
+        """Test que l'API est refusée aux anonymes et ouverte aux partenaires munis d'un jeton"""
+        routes = [['Casablanca', 'Rabat']]
+        anonymous = Client()
+        self.assertEqual(self.post(routes, anonymous).status_code, 401)
+        self.assertEqual(self.post(routes, anonymous, HTTP_AUTHORIZATION='Bearer wrong-token').status_code, 401)
+        self.assertEqual(self.post(routes, anonymous, HTTP_AUTHORIZATION='Bearer partner-token').status_code, 200)
+
+    def test_session_requires_csrf_token(self):
+        """Test que l'appel depuis une session reste protégé contre le CSRF"""
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='passenger', password='passengerpass123')
+        self.assertEqual(self.post([['Casablanca', 'Rabat']], client).status_code, 403)
+
+    def test_cache(self):
+        """Test qu'un lot identique est servi depuis le cache, sans cache partagé"""
+        routes = [['Fès', 'Meknès', 1], ['Tanger', 'Tétouan', 3]]
+        partner = Client(HTTP_AUTHORIZATION='Bearer partner-token')
+        first = self.post(routes, partner)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertIn('max-age=300', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            second = self.post(routes, partner)
+        self.assertEqual(second.content, first.content)
+
+class MyRidesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.driver = User.objects.create_user(username='driver', password='driverpass123')
+        self.driver.groups.add(Group.objects.get_or_create(name='Conducteurs')[0])
+        self.passengers = [User.objects.create_user(username=f'passenger{i}', password='pass12345') for i in range(3)]
+        self.day = timezone.now().date()
+
+    def add_rides(self, count):
+        for i in range(count):
+            ride = Ride.objects.create(
+                driver=self.driver, departure_city='Casablanca', arrival_city='Rabat',
+                departure_date=self.day + timedelta(days=i), departure_time='10:00',
+                price=50, available_seats=2, status='confirmed'
+            )
+            for passenger, status in zip(self.passengers, ('confirmed', 'pending', 'rejected')):
+                Booking.objects.create(ride=ride, passenger=passenger, number_of_seats=1, status=status)
+
+    def get_page(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('rides:my_rides'), params)
+        return response, len(queries)
+
+    def test_constant_query_count(self):
+        """Test que le nombre de requêtes ne dépend pas du nombre de trajets"""
+        self.client.login(username='driver', password='driverpass123')
+        self.add_rides(2)
+        self.get_page()
+        _, few = self.get_page()
+        self.add_rides(40)
+        response, many = self.get_page()
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.context['rides_as_driver']), 20)
+        self.assertEqual(response.context['rides_as_driver'].object_list[0].confirmed_seats, 1)
+        self.assertContains(response, '+1 en attente')
+
+    def test_sections_paginate_independently(self):
+        """Test que chaque section a son propre curseur"""
+        self.add_rides(25)
+        self.client.login(username='driver', password='driverpass123')
+        response, _ = self.get_page()
+        next_url = response.context['driver_pagination']['next_url']
+        self.assertIn('driver_cursor=', next_url)
+        self.assertIn('pending_cursor=', response.context['pending_pagination']['next_url'])
+
+        second, _ = self.get_page(driver_cursor=next_url.split('driver_cursor=')[1])
+        dates = [ride.departure_date for ride in second.context['rides_as_driver']]
+        self.assertEqual(dates, [self.day + timedelta(days=i) for i in range(4, -1, -1)])
+        self.assertEqual(len(second.context['pending_bookings']), 20)
@@ -8,6 +8,8 @@ urlpatterns = [
     # Liste et recherche des trajets
     path('', views.ride_list, name='ride_list'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    # Métriques Prometheus
+    path('metrics', views.metrics, name='metrics'),
     path('search/', views.ride_search, name='ride_search'),
     
     # Création et gestion des trajets
@@ -18,8 +20,10 @@ urlpatterns = [
     path('<int:pk>/validate/', views.ride_validate, name='ride_validate'),
     path('request/<int:pk>/<str:action>/', views.request_action, name='request_action'),
     
-    # Gestion des réservations
+    # Gestion des réservations (paiement avant booking_action, dont <action> les masquerait)
     path('<int:ride_id>/book/', views.booking_request, name='booking_request'),
+    path('booking/<int:booking_id>/payment/', payment_views.initiate_payment, name='initiate_payment'),
+    path('booking/<int:booking_id>/validate-payment/', payment_views.validate_payment, name='validate_payment'),
     path('booking/<int:booking_id>/<str:action>/', views.booking_action, name='booking_action'),
     
     # Vue personnelle des trajets
@@ -46,6 +50,5 @@ urlpatterns = [
     path('vehicles/<int:pk>/delete/', views.vehicle_delete, name='vehicle_delete'),
     path('api/cities/', views.get_cities, name='get_cities'),
     path('api/calculate-price/', views.calculate_ride_price, name='calculate_price'),
-    path('booking/<int:booking_id>/payment/', payment_views.initiate_payment, name='initiate_payment'),
-    path('booking/<int:booking_id>/validate-payment/', payment_views.validate_payment, name='validate_payment'),
+    path('api/calculate-prices/', views.calculate_ride_prices, name='calculate_prices'),
 ] 
\ No newline at end of file
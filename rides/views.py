@@ -2,12 +2,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.contrib.auth import login
-from django.core.paginator import Paginator
-from django.db.models import Q, F
-from django.http import HttpResponseForbidden, JsonResponse
+from django.db.models import Q, F, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.urls import reverse
 from django.utils import timezone
-from .models import Ride, RideRequest, Booking, Vehicle, Rating, Profile, EmailVerificationToken, PricingSettings, RideReport
+from django.utils.cache import patch_cache_control
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.core.cache import cache
+from .models import Ride, RideRequest, Booking, Vehicle, Rating, Profile, EmailVerificationToken, PricingSettings, RideReport, UserStats
 from .forms import RideForm, RideRequestForm, SignUpForm, BookingForm, VehicleForm, RatingForm, ProfileForm, RideReportForm
 from django.contrib.auth.models import Group
 from django.core.mail import send_mail
@@ -15,44 +20,108 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.db import models
-from .services import calculate_distance
+from .services import UnknownCity
+from .routing import road_distance, road_distances
+import hashlib
+import json
+import secrets
 from decimal import Decimal, ROUND_UP
 from django.db.utils import IntegrityError
-from .cities import MOROCCAN_CITIES, get_distance, calculate_price
+from django.db import transaction
+from .cities import MOROCCAN_CITIES, normalize_city
+from .pricing import apply_pricing, pricing_version, quote_price, quote_prices
+from .pagination import KeysetPaginator
+from .search_cache import cached_search
+from .fragments import ride_cards
+from .metrics import EMAILS, render_metrics
+from .outbox import enqueue_email
+from .reservations import CONFIRMED, NO_SEATS, accept_ride_request, confirm_booking, reject_booking, reject_ride_request
+
+RIDES_PER_PAGE = 10
+MY_RIDES_PER_PAGE = 20
+
+def _cursor_url(request, cursor, param='cursor'):
+    """Construit l'URL d'une page en conservant les filtres de recherche"""
+    params = request.GET.copy()
+    params.pop('page', None)
+    params[param] = cursor
+    return f'?{params.urlencode()}'
+
+def _paginate_section(request, queryset, ordering, param):
+    """Page d'une section paginée indépendamment, avec ses liens précédent/suivant"""
+    page = KeysetPaginator(queryset, MY_RIDES_PER_PAGE, ordering, count_cap=None).get_page(request.GET.get(param))
+    return {
+        'page': page,
+        'next_url': _cursor_url(request, page.next_cursor, param) if page.has_next() else None,
+        'previous_url': _cursor_url(request, page.previous_cursor, param) if page.has_previous() else None,
+    }
 
-def ride_list(request):
-    rides = Ride.objects.filter(
-        departure_date__gte=timezone.now().date(),
-        status='confirmed'
-    ).select_related('driver').order_by('departure_date', 'departure_time')
-    
-    # Recherche
-    query = request.GET.get('q')
-    if query:
-        rides = rides.filter(
-            Q(departure_city__icontains=query) |
-            Q(arrival_city__icontains=query)
+KNOWN_CITY_SLUGS = {normalize_city(city) for city in MOROCCAN_CITIES}
+
+def _city_q(field, value):
+    """
+    Filtre indexable sur une colonne de ville normalisée : égalité si la saisie
+    correspond à une ville connue, recherche par préfixe sinon.
+    """
+    slug = normalize_city(value)
+    if slug in KNOWN_CITY_SLUGS:
+        return Q(**{field: slug})
+    return Q(**{f'{field}__startswith': slug})
+
+def _known_slug(value):
+    slug = normalize_city(value or '')
+    return slug if slug in KNOWN_CITY_SLUGS else None
+
+def _search_rides(query, departure_city, arrival_city, date_filter, cursor):
+    """Page de trajets à venir correspondant à la recherche, servie depuis le cache si possible"""
+    def compute():
+        rides = Ride.objects.filter(
+            departure_date__gte=timezone.now().date(),
+            status='confirmed'
         )
+        
+        # Recherche
+        if query:
+            rides = rides.filter(
+                _city_q('departure_slug', query) |
+                _city_q('arrival_slug', query)
+            )
+
+        # Filtres
+        if departure_city:
+            rides = rides.filter(_city_q('departure_slug', departure_city))
+        if arrival_city:
+            rides = rides.filter(_city_q('arrival_slug', arrival_city))
+        if date_filter:
+            rides = rides.filter(departure_date=date_filter)
+
+        # Pagination par curseur (coût constant quelle que soit la profondeur)
+        return KeysetPaginator(rides, RIDES_PER_PAGE).get_page(cursor)
+
+    params = {
+        'q': normalize_city(query or ''),
+        'departure': normalize_city(departure_city or ''),
+        'arrival': normalize_city(arrival_city or ''),
+        'date': date_filter or '',
+        'cursor': cursor or '',
+    }
+    # Une recherche libre (q) peut porter sur n'importe quel itinéraire
+    if query:
+        return cached_search(params, None, None, compute)
+    return cached_search(params, _known_slug(departure_city), _known_slug(arrival_city), compute)
 
-    # Filtres
+def ride_list(request):
+    query = request.GET.get('q')
     departure_city = request.GET.get('departure')
     arrival_city = request.GET.get('arrival')
     date_filter = request.GET.get('date')
-
-    if departure_city:
-        rides = rides.filter(departure_city__icontains=departure_city)
-    if arrival_city:
-        rides = rides.filter(arrival_city__icontains=arrival_city)
-    if date_filter:
-        rides = rides.filter(departure_date=date_filter)
-
-    # Pagination
-    paginator = Paginator(rides, 10)
-    page = request.GET.get('page')
-    rides = paginator.get_page(page)
+    rides = _search_rides(query, departure_city, arrival_city, date_filter, request.GET.get('cursor'))
 
     return render(request, 'rides/ride_list.html', {
         'rides': rides,
+        'cards': ride_cards(rides),
+        'next_url': _cursor_url(request, rides.next_cursor) if rides.has_next() else None,
+        'previous_url': _cursor_url(request, rides.previous_cursor) if rides.has_previous() else None,
         'query': query,
         'departure_city': departure_city,
         'arrival_city': arrival_city,
@@ -63,7 +132,7 @@ def ride_list(request):
 def dashboard(request):
     """Tableau de bord personnalisé selon le rôle de l'utilisateur"""
     context = {
-        'is_driver': request.user.groups.filter(name='Conducteurs').exists()
+        'is_driver': request.roles.is_driver
     }
     
     if context['is_driver']:
@@ -93,17 +162,13 @@ def ride_search(request):
     arrival = request.GET.get('arrival', '')
     date = request.GET.get('date')
 
-    rides = Ride.objects.filter(status='scheduled')
-    
-    if departure:
-        rides = rides.filter(departure_city__icontains=departure)
-    if arrival:
-        rides = rides.filter(arrival_city__icontains=arrival)
-    if date:
-        rides = rides.filter(departure_date=date)
+    rides = _search_rides(None, departure, arrival, date, request.GET.get('cursor'))
 
     context = {
         'rides': rides,
+        'cards': ride_cards(rides),
+        'next_url': _cursor_url(request, rides.next_cursor) if rides.has_next() else None,
+        'previous_url': _cursor_url(request, rides.previous_cursor) if rides.has_previous() else None,
         'departure': departure,
         'arrival': arrival,
         'date': date
@@ -115,7 +180,7 @@ def ride_search(request):
 def ride_create(request):
     """Création d'un nouveau trajet (conducteurs uniquement)"""
     # Vérifier si l'utilisateur est un conducteur
-    if not request.user.groups.filter(name='Conducteurs').exists():
+    if not request.roles.is_driver:
         messages.error(request, 'Seuls les conducteurs peuvent créer des trajets.')
         return redirect('rides:ride_list')
         
@@ -126,17 +191,16 @@ def ride_create(request):
             ride.driver = request.user
             
             # Calculer la distance et le prix
-            distance = get_distance(ride.departure_city, ride.arrival_city)
-            if distance:
+            try:
+                distance = road_distance(ride.departure_city, ride.arrival_city)
+            except UnknownCity:
+                messages.error(request, 'Impossible de calculer la distance entre ces villes. Veuillez vérifier les adresses.')
+            else:
                 ride.distance_km = distance
-                ride.price = calculate_price(distance)
-                ride.driver_profit = round(ride.price * 0.8, 2)  # 80% pour le conducteur
-                ride.admin_profit = round(ride.price * 0.2, 2)   # 20% pour la plateforme
+                apply_pricing(ride)
                 ride.save()
                 messages.success(request, 'Votre trajet a été créé avec succès.')
                 return redirect('rides:ride_detail', pk=ride.pk)
-            else:
-                messages.error(request, 'Impossible de calculer la distance entre ces villes. Veuillez vérifier les adresses.')
     else:
         form = RideForm()
     
@@ -168,19 +232,24 @@ def ride_edit(request, pk):
 @login_required
 def ride_detail(request, pk):
     """Détails d'un trajet avec possibilité de réservation"""
-    ride = get_object_or_404(Ride.objects.select_related('driver', 'vehicle'), pk=pk)
+    ride = get_object_or_404(Ride.objects.select_related('driver__profile', 'vehicle'), pk=pk)
     user_booking = None
+    driver_bookings = None
     
     if request.user != ride.driver:
         user_booking = Booking.objects.filter(
             ride=ride,
             passenger=request.user
         ).first()
+    else:
+        # Réservations du trajet et leurs passagers en une requête
+        driver_bookings = list(ride.bookings.select_related('passenger'))
 
     context = {
         'ride': ride,
         'user_booking': user_booking,
-        'is_driver': request.user.groups.filter(name='Conducteurs').exists(),
+        'driver_bookings': driver_bookings,
+        'is_driver': request.roles.is_driver,
     }
     return render(request, 'rides/ride_detail.html', context)
 
@@ -213,20 +282,20 @@ def request_action(request, pk, action):
         return redirect('rides:ride_detail', pk=ride_request.ride.pk)
     
     if action == 'accept':
-        # Vérifier qu'il y a assez de places disponibles
-        if ride_request.ride.available_seats >= ride_request.seats:
-            ride_request.status = 'accepted'
-            ride_request.ride.available_seats = F('available_seats') - ride_request.seats
-            ride_request.ride.save()
-            ride_request.save()
+        # Réservation atomique des places : pas de survente sous accès concurrents
+        result = accept_ride_request(ride_request)
+        if result == CONFIRMED:
             messages.success(request, 'La demande de réservation a été acceptée.')
-        else:
+        elif result == NO_SEATS:
             messages.error(request, 'Il n\'y a plus assez de places disponibles.')
+        else:
+            messages.error(request, 'Cette demande a déjà été traitée.')
     
     elif action == 'reject':
-        ride_request.status = 'rejected'
-        ride_request.save()
-        messages.success(request, 'La demande de réservation a été refusée.')
+        if reject_ride_request(ride_request):
+            messages.success(request, 'La demande de réservation a été refusée.')
+        else:
+            messages.error(request, 'Cette demande a déjà été traitée.')
     
     return redirect('rides:ride_detail', pk=ride_request.ride.pk)
 
@@ -234,37 +303,60 @@ def request_action(request, pk, action):
 def my_rides(request):
     """Vue des trajets personnels avec séparation conducteur/passager"""
     context = {
-        'is_driver': request.user.groups.filter(name='Conducteurs').exists()
+        'is_driver': request.roles.is_driver
     }
 
     if context['is_driver']:
         # Récupérer les véhicules
         context['vehicles'] = Vehicle.objects.filter(driver=request.user)
         
-        # Récupérer les trajets en tant que conducteur
-        context['rides_as_driver'] = (Ride.objects
+        # Trajets en tant que conducteur : places réservées calculées dans la même requête
+        rides_as_driver = (Ride.objects
             .filter(driver=request.user)
             .select_related('vehicle')
-            .prefetch_related('bookings', 'bookings__passenger')
-            .order_by('-departure_date', '-departure_time')
+            .only(
+                'id', 'departure_city', 'arrival_city', 'departure_date', 'departure_time',
+                'available_seats', 'price', 'status', 'vehicle__brand', 'vehicle__model',
+            )
+            .annotate(
+                confirmed_seats=Coalesce(Sum('bookings__number_of_seats', filter=Q(bookings__status__in=['confirmed', 'completed'])), 0),
+                pending_seats=Coalesce(Sum('bookings__number_of_seats', filter=Q(bookings__status='pending')), 0),
+            )
         )
+        driver_section = _paginate_section(request, rides_as_driver, ('-departure_date', '-departure_time', '-id'), 'driver_cursor')
+        context['rides_as_driver'] = driver_section['page']
+        context['driver_pagination'] = driver_section
         
-        # Récupérer les réservations en attente
-        context['pending_bookings'] = (Booking.objects
+        # Réservations en attente, de la plus proche à la plus lointaine
+        pending_bookings = (Booking.objects
             .filter(
                 ride__driver=request.user,
                 status='pending'
             )
             .select_related('ride', 'passenger')
-            .order_by('ride__departure_date')
+            .only(
+                'id', 'number_of_seats', 'ride__id', 'ride__departure_city', 'ride__arrival_city',
+                'ride__departure_date', 'ride__departure_time',
+                'passenger__username', 'passenger__first_name', 'passenger__last_name',
+            )
         )
+        pending_section = _paginate_section(request, pending_bookings, ('ride__departure_date', 'ride__departure_time', 'id'), 'pending_cursor')
+        context['pending_bookings'] = pending_section['page']
+        context['pending_pagination'] = pending_section
 
-    # Récupérer les réservations en tant que passager
-    context['bookings'] = (Booking.objects
+    # Réservations en tant que passager
+    bookings = (Booking.objects
         .filter(passenger=request.user)
-        .select_related('ride', 'ride__driver', 'ride__vehicle')
-        .order_by('-ride__departure_date', '-ride__departure_time')
+        .select_related('ride', 'ride__driver')
+        .only(
+            'id', 'number_of_seats', 'status', 'ride__id', 'ride__departure_city', 'ride__arrival_city',
+            'ride__departure_date', 'ride__departure_time', 'ride__price',
+            'ride__driver__username', 'ride__driver__first_name', 'ride__driver__last_name',
+        )
     )
+    bookings_section = _paginate_section(request, bookings, ('-ride__departure_date', '-ride__departure_time', '-id'), 'booking_cursor')
+    context['bookings'] = bookings_section['page']
+    context['bookings_pagination'] = bookings_section
 
     return render(request, 'rides/my_rides.html', context)
 
@@ -290,6 +382,7 @@ def send_verification_email(user, token):
         [user.email],
         html_message=html_message
     )
+    EMAILS.inc(result='sent')
 
 def signup(request):
     if request.method == 'POST':
@@ -350,24 +443,8 @@ def profile_view(request):
     """Affichage et modification du profil utilisateur"""
     profile, created = Profile.objects.get_or_create(user=request.user)
     
-    # Récupérer tous les trajets passés où l'utilisateur était passager
-    past_rides_as_passenger = Ride.objects.filter(
-        bookings__passenger=request.user,
-        bookings__status='accepted',
-        departure_date__lt=timezone.now().date()
-    ).select_related('driver').order_by('-departure_date', '-departure_time')
-
-    # Si l'utilisateur est un conducteur, récupérer aussi ses trajets passés
-    past_rides_as_driver = []
-    if request.user.groups.filter(name='Conducteurs').exists():
-        past_rides_as_driver = Ride.objects.filter(
-            driver=request.user,
-            departure_date__lt=timezone.now().date()
-        ).order_by('-departure_date', '-departure_time')
-
-    # Statistiques
-    total_rides_as_passenger = past_rides_as_passenger.count()
-    total_rides_as_driver = len(past_rides_as_driver)
+    # Statistiques matérialisées : une seule ligne, quel que soit l'historique
+    stats = UserStats.objects.filter(user=request.user).first() or UserStats(user=request.user)
     
     if request.method == 'POST':
         form = ProfileForm(request.POST, request.FILES, instance=profile)
@@ -381,11 +458,9 @@ def profile_view(request):
     context = {
         'form': form,
         'profile': profile,
-        'is_driver': request.user.groups.filter(name='Conducteurs').exists(),
-        'past_rides_as_passenger': past_rides_as_passenger,
-        'past_rides_as_driver': past_rides_as_driver,
-        'total_rides_as_passenger': total_rides_as_passenger,
-        'total_rides_as_driver': total_rides_as_driver
+        'is_driver': request.roles.is_driver,
+        'stats': stats,
+        'rating_aggregates': request.user.rating_aggregates.filter(count__gt=0).order_by('criteria'),
     }
     return render(request, 'rides/profile.html', context)
 
@@ -419,7 +494,12 @@ def booking_request(request, ride_id):
             
             # Vérifier la disponibilité des places
             if booking.number_of_seats <= ride.available_seats:
-                booking.save()
+                try:
+                    booking.save()
+                except IntegrityError:
+                    # Deux envois simultanés du formulaire : la première réservation l'emporte
+                    messages.warning(request, 'Vous avez déjà une réservation pour ce trajet.')
+                    return redirect('rides:ride_detail', pk=ride_id)
                 messages.success(request, 'Votre demande de réservation a été envoyée au conducteur.')
                 return redirect('rides:ride_detail', pk=ride_id)
             else:
@@ -435,7 +515,7 @@ def booking_request(request, ride_id):
 @login_required
 def booking_action(request, booking_id, action):
     """Action sur une demande de réservation par le conducteur"""
-    booking = get_object_or_404(Booking, pk=booking_id)
+    booking = get_object_or_404(Booking.objects.select_related('ride__driver', 'passenger'), pk=booking_id)
     
     # Vérifier que l'utilisateur est le conducteur
     if request.user != booking.ride.driver:
@@ -448,42 +528,35 @@ def booking_action(request, booking_id, action):
         return redirect('rides:my_rides')
     
     if action == 'confirm':
-        # Vérifier la disponibilité des places
-        if booking.ride.available_seats >= booking.number_of_seats:
-            booking.status = 'confirmed'
-            booking.ride.available_seats -= booking.number_of_seats
-            booking.ride.save()
-            booking.save()
-            
-            # Envoyer un email de confirmation au passager
-            subject = 'Réservation confirmée'
-            message = f'Votre réservation pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} le {booking.ride.departure_date} a été confirmée.'
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [booking.passenger.email],
-                fail_silently=True
-            )
-            
+        with transaction.atomic():
+            # Réservation atomique des places : pas de survente sous accès concurrents
+            result = confirm_booking(booking)
+            if result == CONFIRMED:
+                # Email de confirmation au passager, envoyé par process_outbox
+                subject = 'Réservation confirmée'
+                message = f'Votre réservation pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} le {booking.ride.departure_date} a été confirmée.'
+                enqueue_email(subject, message, [booking.passenger.email])
+        
+        if result == CONFIRMED:
             messages.success(request, 'La réservation a été confirmée.')
-        else:
+        elif result == NO_SEATS:
             messages.error(request, 'Il n\'y a plus assez de places disponibles.')
+        else:
+            messages.error(request, 'Cette réservation a déjà été traitée.')
     
     elif action == 'reject':
-        booking.status = 'rejected'
-        booking.save()
+        with transaction.atomic():
+            # Une réservation confirmée entre-temps par un autre onglet n'est pas écrasée
+            rejected = reject_booking(booking)
+            if rejected:
+                # Email d'information au passager, envoyé par process_outbox
+                subject = 'Réservation refusée'
+                message = f'Votre réservation pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} le {booking.ride.departure_date} a été refusée.'
+                enqueue_email(subject, message, [booking.passenger.email])
         
-        # Envoyer un email d'information au passager
-        subject = 'Réservation refusée'
-        message = f'Votre réservation pour le trajet {booking.ride.departure_city} → {booking.ride.arrival_city} le {booking.ride.departure_date} a été refusée.'
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [booking.passenger.email],
-            fail_silently=True
-        )
+        if not rejected:
+            messages.error(request, 'Cette réservation a déjà été traitée.')
+            return redirect('rides:my_rides')
         
         messages.success(request, 'La réservation a été refusée.')
     
@@ -573,8 +646,8 @@ def report_ride(request, ride_id):
 @login_required
 def my_reports(request):
     """Liste des signalements de l'utilisateur"""
-    reports_made = RideReport.objects.filter(reporter=request.user).order_by('-created_at')
-    reports_received = RideReport.objects.filter(reported_user=request.user).order_by('-created_at')
+    reports_made = RideReport.objects.filter(reporter=request.user).select_related('ride').order_by('-created_at')
+    reports_received = RideReport.objects.filter(reported_user=request.user).select_related('ride').order_by('-created_at')
     
     return render(request, 'rides/my_reports.html', {
         'reports_made': reports_made,
@@ -612,8 +685,8 @@ def ride_validate(request, pk):
 @login_required
 def get_cities(request):
     """API pour l'autocomplétion des villes"""
-    query = request.GET.get('q', '').lower()
-    cities = [city for city in MOROCCAN_CITIES if query in city.lower()]
+    query = normalize_city(request.GET.get('q', ''))
+    cities = [city for city in MOROCCAN_CITIES if query in normalize_city(city)]
     return JsonResponse(cities, safe=False)
 
 @login_required
@@ -627,26 +700,120 @@ def calculate_ride_price(request):
             'error': 'Les villes de départ et d\'arrivée sont requises'
         }, status=400)
     
-    distance = get_distance(departure_city, arrival_city)
-    if distance is None:
+    try:
+        distance = road_distance(departure_city, arrival_city)
+    except UnknownCity:
         return JsonResponse({
             'error': 'Impossible de calculer la distance entre ces villes'
         }, status=400)
     
-    price = calculate_price(distance)
+    quote = quote_price(distance)
     
     return JsonResponse({
-        'distance_km': distance,
-        'price': price,
-        'driver_profit': round(price * 0.8, 2),  # 80% pour le conducteur
-        'platform_fee': round(price * 0.2, 2),   # 20% pour la plateforme
+        'distance_km': float(quote.distance_km),
+        'price': float(quote.price),
+        'driver_profit': float(quote.driver_profit),
+        'platform_fee': float(quote.admin_profit),
         'currency': 'DH'
     })
 
+MAX_QUOTE_BATCH = 200
+MAX_QUOTE_SEATS = 8
+QUOTE_CACHE_TIMEOUT = 300
+
+def _parse_quote_route(item):
+    """(départ, arrivée, places) depuis un objet ou un tableau [départ, arrivée, places]"""
+    if isinstance(item, dict):
+        departure_city, arrival_city, seats = item.get('departure_city'), item.get('arrival_city'), item.get('seats', 1)
+    elif isinstance(item, list) and len(item) in (2, 3):
+        departure_city, arrival_city, seats = (item + [1])[:3]
+    else:
+        raise ValueError
+    if not isinstance(departure_city, str) or not isinstance(arrival_city, str):
+        raise ValueError
+    if not departure_city.strip() or not arrival_city.strip():
+        raise ValueError
+    if isinstance(seats, bool) or not isinstance(seats, int) or not 1 <= seats <= MAX_QUOTE_SEATS:
+        raise ValueError
+    return departure_city.strip(), arrival_city.strip(), seats
+
+def _has_bearer_token(request, tokens):
+    """Vrai si la requête porte l'un des jetons (en-tête Authorization: Bearer …)"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return False
+    return any(secrets.compare_digest(token.strip(), allowed) for allowed in tokens if allowed)
+
+@csrf_exempt
+@require_POST
+def calculate_ride_prices(request):
+    """
+    Calcule en une seule requête les prix estimés d'une liste de trajets.
+    Corps JSON : {"routes": [{"departure_city": ..., "arrival_city": ..., "seats": 1}, ...]}
+    (ou directement la liste, éventuellement sous forme de tableaux).
+    Réservé aux utilisateurs connectés (jeton CSRF vérifié) et aux partenaires
+    munis d'un jeton d'API, qui n'ont pas de session et donc pas de CSRF.
+    """
+    if not _has_bearer_token(request, settings.QUOTE_API_TOKENS):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentification requise'}, status=401)
+        rejected = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+        if rejected:
+            return rejected
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Corps JSON invalide'}, status=400)
+    items = payload.get('routes') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'Une liste de trajets est requise'}, status=400)
+    if len(items) > MAX_QUOTE_BATCH:
+        return JsonResponse({
+            'error': f'Au plus {MAX_QUOTE_BATCH} trajets par requête'
+        }, status=413)
+
+    routes = []
+    for index, item in enumerate(items):
+        try:
+            routes.append(_parse_quote_route(item))
+        except ValueError:
+            return JsonResponse({
+                'error': f'Trajet n°{index + 1} invalide : villes de départ et d\'arrivée et 1 à {MAX_QUOTE_SEATS} places requises'
+            }, status=400)
+
+    # Même lot de trajets et mêmes paramètres de tarification : même réponse
+    digest = hashlib.sha256(json.dumps(routes).encode()).hexdigest()
+    cache_key = f'rides:quotes:{pricing_version()}:{digest}'
+    body = cache.get(cache_key)
+    if body is None:
+        distances = road_distances([(departure_city, arrival_city) for departure_city, arrival_city, _ in routes])
+        quotes = []
+        for (departure_city, arrival_city, seats), quote in zip(routes, quote_prices(distances)):
+            result = {'departure_city': departure_city, 'arrival_city': arrival_city, 'seats': seats}
+            if quote is None:
+                result['error'] = 'Impossible de calculer la distance entre ces villes'
+            else:
+                result.update({
+                    'distance_km': float(quote.distance_km),
+                    'price': float(quote.price),
+                    'total_price': float(quote.price * seats),
+                    'driver_profit': float(quote.driver_profit),
+                    'platform_fee': float(quote.admin_profit),
+                })
+            quotes.append(result)
+        body = json.dumps({'quotes': quotes, 'currency': 'DH'})
+        cache.set(cache_key, body, QUOTE_CACHE_TIMEOUT)
+
+    # Réponse à un POST : jamais stockée par un cache partagé
+    response = HttpResponse(body, content_type='application/json')
+    patch_cache_control(response, private=True, max_age=QUOTE_CACHE_TIMEOUT)
+    return response
+
 @login_required
 def vehicle_list(request):
     """Liste des véhicules du conducteur"""
-    if not request.user.groups.filter(name='Conducteurs').exists():
+    if not request.roles.is_driver:
         messages.error(request, 'Cette page est réservée aux conducteurs.')
         return redirect('rides:dashboard')
     
@@ -656,7 +823,7 @@ def vehicle_list(request):
 @login_required
 def vehicle_create(request):
     """Ajout d'un nouveau véhicule"""
-    if not request.user.groups.filter(name='Conducteurs').exists():
+    if not request.roles.is_driver:
         messages.error(request, 'Cette action est réservée aux conducteurs.')
         return redirect('rides:dashboard')
     
@@ -721,4 +888,19 @@ def vehicle_delete(request, pk):
         messages.success(request, 'Le véhicule a été supprimé avec succès.')
         return redirect('rides:vehicle_list')
     
-    return render(request, 'rides/vehicle_confirm_delete.html', {'vehicle': vehicle}) 
\ No newline at end of file
+    return render(request, 'rides/vehicle_confirm_delete.html', {'vehicle': vehicle}) 
+
+def metrics(request):
+    """
+    Métriques de l'application au format Prometheus, tous processus confondus.
+    Réservées aux adresses de METRICS_ALLOWED_IPS, au jeton METRICS_TOKEN
+    (Authorization: Bearer …) et aux membres du staff.
+    """
+    allowed = (
+        request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        or _has_bearer_token(request, [settings.METRICS_TOKEN])
+        or request.user.is_staff
+    )
+    if not allowed:
+        return HttpResponseForbidden('Accès réservé')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')